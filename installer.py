@@ -40,7 +40,7 @@ class InstallManager:
                 d.mkdir(parents=True, exist_ok=True)
 
             # Copy source files
-            files = ["hyprdisplays.py", "hyprdisplays-daemon.py"]
+            files = ["hyprdisplays.py", "hyprdisplays-daemon.py", "hyprdisplays-audit.py", "hyprdisplays_drm.py", "hyprdisplays_apply.py", "hyprdisplays_layout.py", "hyprdisplays_profiles.py", "hyprdisplays_config.py", "hyprdisplays_trace.py"]
             for f in files:
                 src = self.project_root / "src" / f
                 dst = INSTALL_DIR / f
@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+HyprDisplays Audit - Offline checks over many saved profile files
+
+Reads hyprdisplays_profiles.json files collected from other machines and
+reports layout problems (overlaps, monitors cut off from the rest),
+scales Hyprland would not accept and malformed modes. Files are checked
+in a process pool and folded into the totals as they finish, so memory
+stays bounded however many files are given. No Hyprland needed.
+"""
+
+import json
+import os
+import sys
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from pathlib import Path
+
+from hyprdisplays_apply import parse_mode, valid_scales
+from hyprdisplays_layout import profile_rects, validate_layout
+
+PROFILES_FILENAME = "hyprdisplays_profiles.json"
+
+# Problem examples kept per file, and files listed in the summary
+MAX_EXAMPLES = 3
+MAX_WORST_FILES = 10
+
+def audit_monitor(name, config):
+    """Problems with one saved monitor entry, as (kind, message) pairs"""
+    if config.get('disabled') or config.get('mirror') or config.get('preferred'):
+        return []
+
+    resolution = config.get('resolution', f"{config.get('width')}x{config.get('height')}")
+    mode = parse_mode(f"{resolution}@{config.get('refresh_rate', 60)}")
+    if mode is None or mode[0] <= 0 or mode[1] <= 0:
+        return [('malformed_mode', f"{name}: malformed mode {resolution}@{config.get('refresh_rate')}")]
+
+    try:
+        scale = float(config.get('scale', 1.0))
+    except (TypeError, ValueError):
+        return [('unsupported_scale', f"{name}: scale {config.get('scale')!r} is not a number")]
+    if not any(abs(scale - s) < 1e-6 for s in valid_scales(mode[0], mode[1])):
+        return [('unsupported_scale', f"{name}: scale {scale:g} not valid for {mode[0]}x{mode[1]}")]
+    return []
+
+def new_summary(path):
+    """Empty per-file summary"""
+    return {
+        'path': str(path),
+        'error': None,
+        'profiles': 0,
+        'monitors': 0,
+        'problems': Counter(),
+        'examples': [],
+        'scales': Counter()
+    }
+
+def audit_file(path):
+    """Check every profile in one file
+
+    Runs in a worker process and returns only a small summary, never the
+    file contents.
+    """
+    summary = new_summary(path)
+    try:
+        with open(path, 'r') as f:
+            data = json.load(f)
+        profiles = data.get('profiles', {})
+        if not isinstance(profiles, dict):
+            raise ValueError("'profiles' is not an object")
+    except (OSError, ValueError, AttributeError) as e:
+        summary['error'] = str(e)
+        return summary
+
+    def problem(kind, message):
+        summary['problems'][kind] += 1
+        if len(summary['examples']) < MAX_EXAMPLES:
+            summary['examples'].append(message)
+
+    for key, entry in profiles.items():
+        monitors = entry.get('monitors', {}) if isinstance(entry, dict) else None
+        if not isinstance(monitors, dict):
+            problem('malformed_profile', f"profile {key[:16]}: no monitor list")
+            continue
+        try:
+            audit_profile(monitors, summary, problem)
+        except Exception as e:
+            # Values of the wrong type (null transform, string x, ...) end up here
+            problem('malformed', f"profile {key[:16]}: {type(e).__name__}: {e}")
+
+    return summary
+
+def audit_profile(monitors, summary, problem):
+    """Check one profile's monitors, reporting through problem(kind, message)"""
+    summary['profiles'] += 1
+    summary['monitors'] += len(monitors)
+
+    malformed = set()
+    for name, config in monitors.items():
+        if not isinstance(config, dict):
+            problem('malformed_mode', f"{name}: entry is not an object")
+            malformed.add(name)
+            continue
+        if not (config.get('disabled') or config.get('mirror') or config.get('preferred')):
+            summary['scales'][str(config.get('scale', 1.0))] += 1
+        for kind, message in audit_monitor(name, config):
+            problem(kind, message)
+            if kind == 'malformed_mode':
+                malformed.add(name)
+
+    usable = {name: config for name, config in monitors.items() if name not in malformed}
+    report = validate_layout(profile_rects(usable))
+    for a, b in report['overlaps']:
+        problem('overlap', f"{a} overlaps {b}")
+    for island in report['islands'][1:]:
+        problem('gap', f"{', '.join(island)} not touching the rest of the layout")
+
+def iter_profile_files(paths):
+    """Yield profile files from files, directories (searched recursively) or '-' (stdin list)"""
+    for path in paths:
+        if path == '-':
+            for line in sys.stdin:
+                if line.strip():
+                    yield line.strip()
+        elif os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                for filename in files:
+                    if filename.endswith('.json'):
+                        yield os.path.join(root, filename)
+        else:
+            yield path
+
+class AuditStats:
+    """Running totals, updated one file summary at a time"""
+    def __init__(self):
+        self.files = 0
+        self.failed = []
+        self.profiles = 0
+        self.monitors = 0
+        self.problems = Counter()
+        self.files_with_problems = 0
+        self.scales = Counter()
+        self.worst = []  # (problem count, path), at most MAX_WORST_FILES
+
+    def add(self, summary):
+        self.files += 1
+        if summary['error']:
+            if len(self.failed) < MAX_WORST_FILES:
+                self.failed.append((summary['path'], summary['error']))
+            self.problems['unreadable'] += 1
+            return
+        self.profiles += summary['profiles']
+        self.monitors += summary['monitors']
+        self.problems.update(summary['problems'])
+        self.scales.update(summary['scales'])
+
+        count = sum(summary['problems'].values())
+        if count:
+            self.files_with_problems += 1
+            self.worst.append((count, summary['path']))
+            self.worst.sort(reverse=True)
+            del self.worst[MAX_WORST_FILES:]
+
+    def to_dict(self):
+        return {
+            'files': self.files,
+            'profiles': self.profiles,
+            'monitors': self.monitors,
+            'files_with_problems': self.files_with_problems,
+            'problems': dict(self.problems),
+            'common_scales': dict(self.scales.most_common(10)),
+            'worst_files': [{'path': path, 'problems': count} for count, path in self.worst],
+            'unreadable': [{'path': path, 'error': error} for path, error in self.failed]
+        }
+
+    def print_summary(self):
+        print(f"\nAudited {self.files} file(s): {self.profiles} profile(s), {self.monitors} monitor entries")
+        print(f"  Files with problems: {self.files_with_problems}")
+        for kind, count in self.problems.most_common():
+            print(f"  {kind}: {count}")
+        if self.scales:
+            common = ', '.join(f"{scale} ({count})" for scale, count in self.scales.most_common(5))
+            print(f"  Most used scales: {common}")
+        if self.worst:
+            print(f"\nFiles with the most problems:")
+            for count, path in self.worst:
+                print(f"  {count:5d}  {path}")
+        if self.failed:
+            print(f"\nUnreadable files:")
+            for path, error in self.failed:
+                print(f"  {path}: {error}")
+
+def run_audit(paths, workers=None, verbose=False):
+    """Audit all files in a process pool, folding results in as they finish
+
+    At most a few tasks per worker are in flight at once, so neither the
+    list of files nor the results are ever held in full.
+    """
+    stats = AuditStats()
+    files = iter_profile_files(paths)
+    workers = workers or os.cpu_count() or 1
+
+    def report(summary):
+        stats.add(summary)
+        if verbose and (summary['error'] or summary['problems']):
+            print(f"{summary['path']}:")
+            if summary['error']:
+                print(f"  Error: {summary['error']}")
+            for example in summary['examples']:
+                print(f"  {example}")
+
+    def collect(future, path):
+        try:
+            summary = future.result()
+        except Exception as e:
+            # A file that breaks the checks themselves is a finding, not the end of the audit
+            summary = new_summary(path)
+            summary['problems']['malformed'] += 1
+            summary['examples'].append(f"{type(e).__name__}: {e}")
+        report(summary)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        in_flight = {}  # future -> path
+        for path in files:
+            in_flight[pool.submit(audit_file, path)] = path
+            if len(in_flight) >= workers * 4:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    collect(future, in_flight.pop(future))
+        for future, path in in_flight.items():
+            collect(future, path)
+    return stats
+
+def main():
+    """Main entry point"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='HyprDisplays Profile Audit')
+    parser.add_argument('paths', nargs='*', default=[str(Path.home() / ".config" / "hypr" / PROFILES_FILENAME)],
+                      help='Profile files or directories to search (- reads paths from stdin)')
+    parser.add_argument('--workers', type=int,
+                      help='Worker processes (default: number of CPUs)')
+    parser.add_argument('--json', action='store_true',
+                      help='Print the statistics as JSON')
+    parser.add_argument('--verbose', action='store_true',
+                      help='Print the problems of each file as it is checked')
+
+    args = parser.parse_args()
+
+    stats = run_audit(args.paths, args.workers, args.verbose)
+    if args.json:
+        print(json.dumps(stats.to_dict(), indent=2))
+    else:
+        stats.print_summary()
+    sys.exit(1 if stats.files_with_problems or stats.failed else 0)
+
+if __name__ == '__main__':
+    main()
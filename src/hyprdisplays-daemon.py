@@ -7,12 +7,27 @@ when displays are connected/disconnected. No GUI required.
 """
 
 import json
+import os
+import select
+import shutil
 import subprocess
+import tempfile
 import time
 import sys
 from pathlib import Path
 from datetime import datetime
 
+from hyprdisplays_drm import SYSFS_DRM, DrmConnectorSource, open_uevent_monitor
+from hyprdisplays_profiles import (ProfileIndex, monitor_identity, identity_key, find_profile_key, migrate_profiles,
+                                   mark_profile_used)
+from hyprdisplays_apply import (plan_apply, format_plan, monitor_differs, validate_modes, verify_applied,
+                                logical_size, snapshot_monitors, hyprctl_monitors, hyprctl_batch, hyprctl_keyword_monitor,
+                                hyprctl_workspaces, workspace_commands)
+from hyprdisplays_trace import (TraceRecorder, RecordingConnectorSource, TracePlayer, ReplayConnectorSource,
+                                ReplayLid)
+from hyprdisplays_layout import (LAYOUT_GOALS, solve_layout, profile_rects, validate_layout,
+                                 describe_layout_problems)
+
 class ConfigurationManager:
     """Manages saved monitor configurations based on connected monitors"""
     def __init__(self):
@@ -20,6 +35,11 @@ class ConfigurationManager:
         self.profiles_path = self.config_dir / "hyprdisplays_profiles.json"
         self.config_dir.mkdir(parents=True, exist_ok=True)
         self.profiles = self.load_profiles()
+        # Older files key profiles by the full identity string; the GUI writes
+        # the migrated form back, the daemon only reads
+        migrate_profiles(self.profiles)
+        # System-wide profiles merged under the user's own
+        self.profile_index = ProfileIndex(self.profiles_path)
     
     def load_profiles(self):
         """Load saved monitor profiles"""
@@ -32,58 +52,230 @@ class ConfigurationManager:
                 return {"profiles": {}, "history": []}
         return {"profiles": {}, "history": []}
     
-    def get_monitor_fingerprint(self, monitors_info):
-        """Create a unique fingerprint for a set of monitors"""
-        monitor_ids = []
-        for monitor in monitors_info:
-            make = monitor.get('make', '').strip()
-            model = monitor.get('model', '').strip()
-            serial = monitor.get('serial', '').strip()
-            name = monitor.get('name', 'unknown')
-            
-            if make or model or serial:
-                monitor_id = f"{name}|{make}|{model}|{serial}"
-            else:
-                monitor_id = name
-            
-            monitor_ids.append(monitor_id)
+    def get_profiles(self):
+        """Merged system and user profiles, rebuilt only when a layer changed on disk
+        
+        Also picks up profiles the GUI saved while the daemon was running.
+        """
+        signature = self.profile_index.layer_signature()
+        if signature != self.profile_index.signature:
+            if self.profile_index.user_changed(signature):
+                self.profiles = self.load_profiles()
+                migrate_profiles(self.profiles)
+            self.profile_index.rebuild(self.profiles, signature)
+        return self.profile_index.profiles
+    
+    def get_monitor_fingerprint(self, monitors_info, use_edid=True):
+        """Create a compact fingerprint (identity digest) for a set of monitors"""
+        return identity_key(monitor_identity(monitors_info, use_edid))
+    
+    def find_profile(self, monitors_info):
+        """Key of the saved profile for this monitor setup, or None"""
+        profiles = self.get_profiles()
+        key = find_profile_key(profiles, monitor_identity(monitors_info))
         
-        sorted_ids = sorted(monitor_ids)
-        fingerprint = ";;".join(sorted_ids)
-        return fingerprint
+        if key is None:
+            # Profiles saved before EDID identities were used
+            key = find_profile_key(profiles, monitor_identity(monitors_info, use_edid=False))
+        return key
     
-    def load_configuration(self, monitors_info):
-        """Load saved configuration for this monitor setup"""
-        fingerprint = self.get_monitor_fingerprint(monitors_info)
+    def load_configuration(self, monitors_info, record_use=True):
+        """Load saved configuration for this monitor setup
+        
+        A hit is recorded as a use of the profile unless record_use is False.
+        """
+        profiles = self.get_profiles()
+        key = self.find_profile(monitors_info)
         
-        if fingerprint in self.profiles.get("profiles", {}):
-            config = self.profiles["profiles"][fingerprint]
+        if key is not None:
+            config = profiles[key]
             print(f"[{datetime.now().strftime('%H:%M:%S')}] Found saved configuration")
-            print(f"  Fingerprint: {fingerprint[:60]}...")
+            print(f"  Fingerprint: {key}{' (system profile)' if self.profile_index.is_system(key) else ''}")
             print(f"  Saved at: {config.get('saved_at', 'unknown')}")
+            if record_use:
+                self.mark_used(key)
             return config.get("monitors", {})
         
         print(f"[{datetime.now().strftime('%H:%M:%S')}] No saved configuration found")
         return None
+    
+    def mark_used(self, key):
+        """Stamp a user profile as just applied, for least-recently-used eviction
+        
+        System profiles are read-only and never evicted, so they are skipped.
+        """
+        if self.profile_index.is_system(key):
+            return
+        try:
+            mark_profile_used(self.profiles_path, key)
+        except Exception as e:
+            print(f"  Warning: Could not record profile use: {e}")
+    
+    def load_workspaces(self, monitors_info):
+        """Saved workspace-to-monitor bindings for this monitor setup, if any"""
+        key = self.find_profile(monitors_info)
+        if key is None:
+            return {}
+        return self.get_profiles()[key].get("workspaces", {})
+
+ACPI_LID_DIR = Path("/proc/acpi/button/lid")
+
+# Connector prefixes of built-in laptop panels
+INTERNAL_PANEL_PREFIXES = ('eDP', 'LVDS', 'DSI')
+
+# How often to re-read the lid state while waiting for events (seconds)
+LID_POLL_INTERVAL = 0.5
+
+class SleepWatcher:
+    """Watches logind's PrepareForSleep signal through `gdbus monitor`
+    
+    Args:
+        bus_address: D-Bus address to watch instead of the system bus,
+            e.g. a private bus started for testing
+    """
+    def __init__(self, bus_address=None):
+        cmd = ['gdbus', 'monitor',
+               '--dest', 'org.freedesktop.login1',
+               '--object-path', '/org/freedesktop/login1']
+        cmd += ['--address', bus_address] if bus_address else ['--system']
+        self.process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        os.set_blocking(self.process.stdout.fileno(), False)
+        self.buffer = b''
+        self.closed = False
+    
+    def fileno(self):
+        return self.process.stdout.fileno()
+    
+    def read_resumed(self):
+        """Consume pending monitor output
+        
+        Returns:
+            True if a PrepareForSleep(false) - i.e. a resume - was seen
+        """
+        try:
+            data = os.read(self.fileno(), 4096)
+        except BlockingIOError:
+            return False
+        if not data:
+            # gdbus exited (no bus, no permission); stop selecting on it
+            self.closed = True
+            return False
+        
+        self.buffer += data
+        *lines, self.buffer = self.buffer.split(b'\n')
+        return any(b'PrepareForSleep (false' in line for line in lines)
+    
+    def close(self):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=1)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+        self.process.stdout.close()
+
+class LidSwitch:
+    """Laptop lid state read from /proc/acpi/button/lid/*/state"""
+    def __init__(self, proc_root=ACPI_LID_DIR):
+        self.state_files = sorted(Path(proc_root).glob('*/state'))
+        self.state = self.read_state()
+    
+    def read_state(self):
+        """Return 'open', 'closed' or None if no lid is present"""
+        for state_file in self.state_files:
+            try:
+                text = state_file.read_text()
+            except OSError:
+                continue
+            if 'closed' in text:
+                return 'closed'
+            if 'open' in text:
+                return 'open'
+        return None
+    
+    def changed(self):
+        """Re-read the lid state, returning True if it changed"""
+        state = self.read_state()
+        if state != self.state:
+            self.state = state
+            return True
+        return False
+    
+    @property
+    def closed(self):
+        return self.state == 'closed'
+
+class TransitionPredictor:
+    """Counts which monitor set tends to follow which
+    
+    Seeded from the saved profile history (newest first) and updated with
+    every transition the daemon sees while running.
+    """
+    def __init__(self, history=None):
+        self.counts = {}
+        keys = [item.get('fingerprint') for item in reversed(history or []) if item.get('fingerprint')]
+        for prev, new in zip(keys, keys[1:]):
+            self.observe(prev, new)
+    
+    def observe(self, prev, new):
+        if prev and new and prev != new:
+            following = self.counts.setdefault(prev, {})
+            following[new] = following.get(new, 0) + 1
+    
+    def predict(self, fingerprint):
+        """Most frequent successor of fingerprint, or None"""
+        following = self.counts.get(fingerprint)
+        if not following:
+            return None
+        return max(following, key=following.get)
+
+def is_internal_panel(monitor_name):
+    return monitor_name.startswith(INTERNAL_PANEL_PREFIXES)
 
 class MonitorDaemon:
     """Background daemon for monitor detection"""
     
-    def __init__(self, check_interval=3):
+    def __init__(self, check_interval=3, sysfs_root=SYSFS_DRM, bus_address=None,
+                 watch_lid=True, lid_root=ACPI_LID_DIR, auto_layout=None, lid_disables_panel=False):
         self.config_manager = ConfigurationManager()
         self.check_interval = check_interval
         self.last_fingerprint = None
         self.running = True
+        self.drm_source = DrmConnectorSource(sysfs_root)
+        self.uevents = None
+        self.bus_address = bus_address
+        self.sleep_watcher = None
+        lid = LidSwitch(lid_root) if watch_lid else None
+        self.lid = lid if lid and lid.state else None
+        # Switch internal panels off on lid close (opt-in: bindl lid-switch rules
+        # in the user's config usually do this already)
+        self.lid_disables_panel = lid_disables_panel
+        # Internal panels the daemon switched off because the lid closed
+        self.lid_disabled = set()
+        # Newer monitor state that cancelled an apply in progress
+        self.pending_monitors_info = None
+        # Layout goal for monitor sets without a profile (None keeps Hyprland's placement)
+        self.auto_layout = auto_layout
+        # Likely next monitor set, with its command batch built ahead of the hotplug
+        self.predictor = TransitionPredictor(self.config_manager.profiles.get('history'))
+        self.prefetched = None
+        # Last seen state of every output, for mode checks on monitors not connected now
+        self.known_displays = {}
+        # Trace recorder while recording (--record-trace)
+        self.trace = None
         print(f"[{datetime.now().strftime('%H:%M:%S')}] HyprDisplays Daemon started")
         print(f"  Check interval: {check_interval} seconds")
         print(f"  Profiles: {self.config_manager.profiles_path}")
     
-    def get_monitors_info(self):
-        """Get current monitor information from Hyprland"""
+    def get_displays_data(self):
+        """Get the full monitor state (`hyprctl monitors all -j`)"""
+        return hyprctl_monitors()
+    
+    def get_monitors_info(self, connectors=None, displays_data=None):
+        """Get current monitor information from Hyprland, with EDID identities"""
         try:
-            result = subprocess.run(['hyprctl', 'monitors', 'all', '-j'], 
-                                  capture_output=True, text=True, check=True)
-            displays_data = json.loads(result.stdout)
+            if displays_data is None:
+                displays_data = self.get_displays_data()
             
             monitors_info = []
             for d in displays_data:
@@ -95,52 +287,396 @@ class MonitorDaemon:
                     'description': d.get('description', '')
                 })
             
-            return monitors_info
+            return self.drm_source.enrich(monitors_info, connectors)
         except Exception as e:
             print(f"[{datetime.now().strftime('%H:%M:%S')}] Error getting monitors: {e}")
             return []
     
-    def apply_configuration(self, saved_config):
-        """Apply a saved configuration"""
+    def validate_modes(self, saved_config, displays_data):
+        """Swap saved modes the monitors no longer offer for the closest supported ones"""
+        validated, substitutions = validate_modes(saved_config, displays_data)
+        for sub in substitutions:
+            print(f"  {sub['field'].capitalize()} {sub['requested']} not supported on {sub['monitor']}, using {sub['substituted']}")
+        return validated
+    
+    def check_layout(self, profile, displays_data=None):
+        """Report overlapping or disconnected monitors in a profile
+        
+        Problems are only reported; the profile is still applied as saved.
+        
+        Returns:
+            List of problem descriptions (empty if the layout is sound)
+        """
+        problems = describe_layout_problems(validate_layout(profile_rects(profile, displays_data)))
+        for problem in problems:
+            print(f"  Layout problem: {problem}")
+        return problems
+    
+    def check_superseded(self, fingerprint):
+        """Check whether the monitor set changed since an apply started
+        
+        A newer state is stored in self.pending_monitors_info so the caller
+        can start its plan straight away.
+        
+        Returns:
+            True if the apply for fingerprint should be cancelled
+        """
+        if self.uevents:
+            # Cheap path: only re-query Hyprland when the kernel saw a hotplug
+            readable, _, _ = select.select([self.uevents], [], [], 0)
+            if not readable or not self.uevents.read_events():
+                return False
+            monitors_info = self.wait_for_hyprland()
+        else:
+            monitors_info = self.get_monitors_info()
+        
+        if not monitors_info:
+            return False
+        if self.config_manager.get_monitor_fingerprint(monitors_info) == fingerprint:
+            return False
+        self.pending_monitors_info = monitors_info
+        return True
+    
+    def apply_configuration(self, saved_config, fingerprint=None, displays_data=None, workspaces=None):
+        """Apply a saved configuration as a cancellable pipeline
+        
+        The planner orders the per-monitor steps and drops monitors that
+        already match; afterwards the state is read back and only outputs
+        that did not land are re-sent. When fingerprint is given, the monitor set is
+        re-checked before every step and the remaining steps are dropped as
+        soon as a newer state arrives. Saved workspace bindings are sent in
+        the same batch as the last step, so they cost no extra round trip.
+        
+        Returns:
+            True if every output verified, False on error or cancellation
+        """
         try:
+            if displays_data is None:
+                displays_data = self.get_displays_data()
+            saved_config = self.validate_modes(saved_config, displays_data)
+            plan = plan_apply(saved_config, displays_data)
+            workspace_moves = self.get_workspace_moves(workspaces, saved_config)
+            if not plan and not workspace_moves:
+                print(f"  All monitors already match, nothing to apply")
+                return True
+            
             applied_count = 0
-            for monitor_name, config in saved_config.items():
-                if config.get('disabled'):
-                    cmd = f"{monitor_name},disabled"
-                else:
-                    resolution = config.get('resolution', f"{config.get('width')}x{config.get('height')}")
-                    refresh = config.get('refresh_rate', 60)
-                    x = config.get('x', 0)
-                    y = config.get('y', 0)
-                    scale = config.get('scale', 1.0)
-                    transform = config.get('transform', 0)
-                    
-                    cmd = f"{monitor_name},{resolution}@{refresh},{x}x{y},{scale},transform,{transform}"
-                    
-                    if config.get('hdr') or config.get('bitdepth') == 10:
-                        cmd += ",bitdepth,10"
-                        
-                    if config.get('vrr') == 1:
-                        cmd += ",vrr,1"
+            for index, step in enumerate(plan):
+                if fingerprint and self.check_superseded(fingerprint):
+                    skipped = [s['monitor'] for s in plan[index:]]
+                    print(f"[{datetime.now().strftime('%H:%M:%S')}] Apply superseded by newer monitor state")
+                    print(f"  Cancelled {len(skipped)} remaining step(s): {', '.join(skipped)}")
+                    return False
                 
-                result = subprocess.run(['hyprctl', 'keyword', 'monitor', cmd], 
-                                      capture_output=True, text=True, check=False)
+                if index == len(plan) - 1 and workspace_moves:
+                    ok = hyprctl_batch([f"keyword monitor {step['command']}"] + workspace_moves)
+                    workspace_moves = []
+                else:
+                    ok = hyprctl_keyword_monitor(step['command'])
                 
-                if result.returncode == 0:
+                if ok:
                     applied_count += 1
                 else:
-                    print(f"  Warning: Failed to configure {monitor_name}")
+                    print(f"  Warning: Failed to configure {step['monitor']}")
             
-            print(f"[{datetime.now().strftime('%H:%M:%S')}] Applied configuration to {applied_count} monitor(s)")
-            return True
+            if workspace_moves and not hyprctl_batch(workspace_moves):
+                print(f"  Warning: Failed to move workspaces")
+            
+            # A zero exit code only means Hyprland parsed the rule; read the state back
+            _, failed = verify_applied(saved_config, self.get_displays_data)
+            for name, changes in failed.items():
+                print(f"  Warning: {name} did not reach the saved state ({', '.join(changes)})")
+            
+            print(f"[{datetime.now().strftime('%H:%M:%S')}] Applied configuration to {applied_count} monitor(s), "
+                  f"{len(failed)} not verified")
+            return not failed
             
         except Exception as e:
             print(f"[{datetime.now().strftime('%H:%M:%S')}] Error applying configuration: {e}")
             return False
     
-    def check_and_apply(self):
-        """Check for monitor changes and apply configuration if needed"""
-        monitors_info = self.get_monitors_info()
+    def get_workspace_moves(self, workspaces, saved_config):
+        """Dispatches moving saved workspaces that are on the wrong monitor"""
+        if not workspaces:
+            return []
+        try:
+            workspaces_data = hyprctl_workspaces()
+        except Exception as e:
+            print(f"  Warning: Could not read workspaces: {e}")
+            return []
+        moves = workspace_commands(workspaces, saved_config, workspaces_data)
+        if moves:
+            print(f"  Restoring {len(moves)} workspace(s) to their saved monitors")
+        return moves
+    
+    def wait_for_event(self, timeout):
+        """Sleep up to timeout seconds, waking early on hotplug, resume or lid change
+        
+        Returns:
+            'hotplug', 'resume', 'lid', or None on timeout
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            
+            if self.lid and self.lid.changed():
+                return 'lid'
+            
+            if self.sleep_watcher and self.sleep_watcher.closed:
+                self.sleep_watcher.close()
+                self.sleep_watcher = None
+            sources = [s for s in (self.uevents, self.sleep_watcher) if s]
+            wait = min(remaining, LID_POLL_INTERVAL) if self.lid else remaining
+            if not sources:
+                time.sleep(wait)
+                continue
+            
+            readable, _, _ = select.select(sources, [], [], wait)
+            # Other subsystems share the uevent socket; keep waiting unless it was drm
+            if self.uevents in readable and self.uevents.read_events():
+                return 'hotplug'
+            if self.sleep_watcher in readable and self.sleep_watcher.read_resumed():
+                return 'resume'
+    
+    def get_lid_overrides(self, monitor_names, saved_config):
+        """Config overrides for internal panels while the lid is closed
+        
+        Only with lid_disables_panel, and only if an external monitor stays enabled.
+        """
+        if not self.lid_disables_panel or not self.lid or not self.lid.closed:
+            return {}
+        
+        saved_config = saved_config or {}
+        internal = [n for n in monitor_names if is_internal_panel(n)]
+        external_enabled = any(not is_internal_panel(n) and not saved_config.get(n, {}).get('disabled')
+                               for n in monitor_names)
+        if not internal or not external_enabled:
+            return {}
+        return {name: {'disabled': True} for name in internal}
+    
+    def build_provisional_profile(self, displays_data, overrides=None):
+        """Auto-arrange the active monitors for a set without a saved profile
+        
+        Modes, scales and rotations stay as Hyprland picked them; only the
+        positions come from the layout solver. Nothing is saved.
+        """
+        overrides = overrides or {}
+        current = {d['name']: d for d in displays_data}
+        profile = {name: config for name, config in snapshot_monitors(displays_data).items()
+                   if not config.get('disabled') and not config.get('mirror') and name not in overrides}
+        
+        sizes = {name: logical_size(current[name].get('width', 0), current[name].get('height', 0),
+                                    config['scale'], config['transform'])
+                 for name, config in profile.items()}
+        primary = next((d['name'] for d in displays_data if d.get('focused') and d['name'] in profile), None)
+        
+        for name, (x, y) in solve_layout(sizes, self.auto_layout, primary).items():
+            profile[name]['x'] = x
+            profile[name]['y'] = y
+        profile.update(overrides)
+        return profile
+    
+    def apply_provisional(self, overrides, fingerprint):
+        """Apply an auto-arranged layout for the current monitors"""
+        try:
+            displays_data = self.get_displays_data()
+        except Exception as e:
+            print(f"[{datetime.now().strftime('%H:%M:%S')}] Error getting monitors: {e}")
+            return False
+        
+        print(f"  Arranging automatically ({self.auto_layout})...")
+        provisional = self.build_provisional_profile(displays_data, overrides)
+        if self.apply_configuration(provisional, fingerprint, displays_data):
+            print(f"  ✓ Provisional layout applied (not saved)")
+            return True
+        return False
+    
+    def prefetch_next(self, fingerprint):
+        """Pre-build the apply for the monitor set most likely to follow
+        
+        The profile lookup, lid overrides, workspace bindings and layout check
+        run now. Modes and the plan depend on the live state, so they are
+        redone against fresh data when the hotplug arrives.
+        """
+        self.prefetched = None
+        next_fingerprint = self.predictor.predict(fingerprint)
+        entry = self.config_manager.get_profiles().get(next_fingerprint)
+        if not entry:
+            return
+        
+        try:
+            displays_data = self.get_displays_data()
+        except Exception:
+            return
+        self.known_displays.update((d['name'], d) for d in displays_data)
+        
+        monitors = entry.get("monitors", {})
+        # Never seen these outputs: their modes can't be checked, leave it to the normal path
+        if any(name not in self.known_displays for name in monitors):
+            return
+        overrides = self.get_lid_overrides(list(monitors), monitors)
+        target, _ = validate_modes({**monitors, **overrides}, list(self.known_displays.values()))
+        
+        self.prefetched = {
+            'fingerprint': next_fingerprint,
+            'config': {**monitors, **overrides},
+            'overrides': overrides,
+            'lid_state': self.lid.state if self.lid else None,
+            # Where the workspaces are by then is unknown, so every binding is sent
+            'workspaces': workspace_commands(entry.get("workspaces", {}), target),
+            'problems': describe_layout_problems(validate_layout(profile_rects(target)))
+        }
+        print(f"  Prefetched likely next setup")
+    
+    def apply_prefetched(self, fingerprint):
+        """Send the prefetched configuration if it was built for this monitor set
+        
+        Modes and the plan are rebuilt from the current state, so the
+        batch matches what the monitors offer now.
+        
+        Returns:
+            True if it was applied, False if the normal path has to run
+        """
+        prefetched, self.prefetched = self.prefetched, None
+        if not prefetched or prefetched['fingerprint'] != fingerprint:
+            return False
+        # Lid overrides were baked in at prefetch time
+        if (self.lid.state if self.lid else None) != prefetched['lid_state']:
+            return False
+        try:
+            displays_data = self.get_displays_data()
+        except Exception:
+            return False
+        
+        print(f"  Applying prefetched configuration...")
+        for problem in prefetched['problems']:
+            print(f"  Layout problem: {problem}")
+        target = self.validate_modes(prefetched['config'], displays_data)
+        plan = plan_apply(target, displays_data)
+        batch = [f"keyword monitor {step['command']}" for step in plan] + prefetched['workspaces']
+        if batch and not hyprctl_batch(batch):
+            return False
+        self.config_manager.mark_used(fingerprint)
+        
+        _, failed = verify_applied(target, self.get_displays_data)
+        for name, changes in failed.items():
+            print(f"  Warning: {name} did not reach the saved state ({', '.join(changes)})")
+        print(f"[{datetime.now().strftime('%H:%M:%S')}] Applied configuration to {len(plan)} monitor(s), "
+              f"{len(failed)} not verified")
+        if not failed:
+            print(f"  ✓ Configuration applied successfully")
+        self.lid_disabled = set(prefetched['overrides'])
+        return True
+    
+    def verify_and_repair(self):
+        """Check the live layout against the saved profile and re-apply only what differs
+        
+        Used after resume and lid changes, where the fingerprint is unchanged
+        but Hyprland may have lost or rearranged outputs.
+        """
+        try:
+            displays_data = self.get_displays_data()
+        except Exception as e:
+            print(f"[{datetime.now().strftime('%H:%M:%S')}] Error getting monitors: {e}")
+            return
+        
+        monitors_info = self.get_monitors_info(displays_data=displays_data)
+        if not monitors_info:
+            return
+        
+        # A different monitor set needs the full profile, not a repair
+        if self.config_manager.get_monitor_fingerprint(monitors_info) != self.last_fingerprint:
+            self.check_and_apply(monitors_info)
+            return
+        
+        monitor_names = [m['name'] for m in monitors_info]
+        # Same profile as before the resume or lid change, so it is not a new use
+        saved_config = self.config_manager.load_configuration(monitors_info, record_use=False) or {}
+        target = dict(saved_config)
+        
+        overrides = self.get_lid_overrides(monitor_names, saved_config)
+        # Panels we switched off earlier come back at their preferred mode if unsaved
+        for name in self.lid_disabled - set(overrides):
+            target.setdefault(name, {'preferred': True})
+        target.update(overrides)
+        self.lid_disabled = set(overrides)
+        # Compare against what would actually be sent: a saved mode or scale the
+        # monitor can't do is substituted on every apply and is not drift
+        target = self.validate_modes(target, displays_data)
+        
+        current = {d['name']: d for d in displays_data}
+        drifted = {name: config for name, config in target.items()
+                   if name in current and monitor_differs(config, current[name])}
+        
+        if not drifted:
+            print(f"  Layout verified, nothing to repair")
+            return
+        
+        print(f"  Repairing: {', '.join(drifted)}")
+        self.apply_configuration(drifted, self.last_fingerprint, displays_data)
+        if self.pending_monitors_info is not None:
+            self.check_and_apply()
+    
+    def dry_run(self):
+        """Print the apply plan for the current monitors without sending anything"""
+        try:
+            displays_data = self.get_displays_data()
+        except Exception as e:
+            print(f"[{datetime.now().strftime('%H:%M:%S')}] Error getting monitors: {e}")
+            return
+        
+        monitors_info = self.get_monitors_info(displays_data=displays_data)
+        saved_config = self.config_manager.load_configuration(monitors_info, record_use=False)
+        overrides = self.get_lid_overrides([m['name'] for m in monitors_info], saved_config)
+        if not saved_config and self.auto_layout:
+            print(f"  Using provisional layout ({self.auto_layout})")
+            saved_config = self.build_provisional_profile(displays_data, overrides)
+        if not saved_config and not overrides:
+            return
+        
+        target = self.validate_modes({**(saved_config or {}), **overrides}, displays_data)
+        self.check_layout(target, displays_data)
+        print(f"\nApply plan:")
+        print(format_plan(plan_apply(target, displays_data)))
+    
+    def wait_for_hyprland(self, timeout=2.0, poll_interval=0.1):
+        """After a uevent, poll Hyprland until it reports the connectors the kernel sees
+        
+        Returns:
+            Monitor info from the last poll (possibly stale if timeout hit)
+        """
+        connectors = self.drm_source.scan()
+        connected = self.drm_source.connected_names(connectors)
+        deadline = time.monotonic() + timeout
+        
+        while True:
+            monitors_info = self.get_monitors_info(connectors)
+            # Ignore outputs with no DRM connector (headless, nested)
+            seen = {m['name'] for m in monitors_info if m['name'] in connectors}
+            if seen == connected or time.monotonic() >= deadline:
+                return monitors_info
+            time.sleep(poll_interval)
+    
+    def check_and_apply(self, monitors_info=None):
+        """Check for monitor changes and apply configuration if needed
+        
+        When a newer monitor state cancels the apply in progress, its plan
+        starts immediately instead of waiting for the next event.
+        """
+        while True:
+            if monitors_info is None and self.pending_monitors_info is not None:
+                monitors_info, self.pending_monitors_info = self.pending_monitors_info, None
+            self.apply_if_changed(monitors_info)
+            if self.pending_monitors_info is None:
+                return
+            monitors_info = None
+    
+    def apply_if_changed(self, monitors_info=None):
+        """Apply the saved configuration if the monitor set changed"""
+        if monitors_info is None:
+            monitors_info = self.get_monitors_info()
         
         if not monitors_info:
             return
@@ -152,40 +688,171 @@ class MonitorDaemon:
             monitor_names = [m['name'] for m in monitors_info]
             print(f"\n[{datetime.now().strftime('%H:%M:%S')}] Monitor setup changed!")
             print(f"  Detected monitors: {', '.join(monitor_names)}")
+            self.predictor.observe(self.last_fingerprint, current_fingerprint)
+            
+            # Predicted setup: everything is already built, just send it
+            if self.apply_prefetched(current_fingerprint):
+                self.last_fingerprint = current_fingerprint
+                self.prefetch_next(current_fingerprint)
+                return
             
             # Try to load saved configuration
             saved_config = self.config_manager.load_configuration(monitors_info)
+            overrides = self.get_lid_overrides(monitor_names, saved_config)
+            self.lid_disabled = set(overrides)
+            if overrides:
+                print(f"  Lid closed, disabling: {', '.join(overrides)}")
             
             if saved_config:
+                self.check_layout({**saved_config, **overrides})
                 print(f"  Applying saved configuration...")
-                if self.apply_configuration(saved_config):
+                workspaces = self.config_manager.load_workspaces(monitors_info)
+                if self.apply_configuration({**saved_config, **overrides}, current_fingerprint,
+                                            workspaces=workspaces):
                     print(f"  ✓ Configuration applied successfully")
-                else:
+                elif self.pending_monitors_info is None:
                     print(f"  ✗ Failed to apply configuration")
             else:
                 print(f"  No saved configuration for this setup")
                 print(f"  Use HyprDisplays GUI to configure and save")
+                if self.auto_layout:
+                    self.apply_provisional(overrides, current_fingerprint)
+                elif overrides:
+                    self.apply_configuration(overrides, current_fingerprint)
             
             self.last_fingerprint = current_fingerprint
+            if self.pending_monitors_info is None:
+                self.prefetch_next(current_fingerprint)
     
     def run(self):
         """Main daemon loop"""
         print(f"[{datetime.now().strftime('%H:%M:%S')}] Monitoring for display changes...")
         print(f"  Press Ctrl+C to stop\n")
         
+        # Hotplugs wake the loop immediately; the interval poll stays as a fallback
+        self.uevents = open_uevent_monitor()
+        if self.uevents:
+            print(f"  Listening for DRM hotplug events")
+        
+        # Resume and lid changes keep the fingerprint, so they trigger a repair pass
+        try:
+            self.sleep_watcher = SleepWatcher(self.bus_address)
+        except OSError as e:
+            print(f"  Suspend/resume events unavailable: {e}")
+        if self.lid:
+            print(f"  Watching lid switch (currently {self.lid.state})")
+        
         # Initial check
         self.check_and_apply()
         
         try:
             while self.running:
-                time.sleep(self.check_interval)
-                self.check_and_apply()
+                self.handle_event(self.wait_for_event(self.check_interval))
                 
         except KeyboardInterrupt:
             print(f"\n[{datetime.now().strftime('%H:%M:%S')}] Daemon stopped by user")
         except Exception as e:
             print(f"\n[{datetime.now().strftime('%H:%M:%S')}] Error: {e}")
             sys.exit(1)
+        finally:
+            if self.sleep_watcher:
+                self.sleep_watcher.close()
+            if self.uevents:
+                self.uevents.close()
+            if self.trace:
+                self.trace.close()
+    
+    def handle_event(self, event):
+        """React to one wake-up of the main loop
+        
+        Args:
+            event: 'hotplug', 'resume', 'lid', or None for the interval poll
+        """
+        if self.trace:
+            self.trace.record_event(event, self.lid.state if self.lid else None)
+        
+        if event == 'hotplug':
+            print(f"[{datetime.now().strftime('%H:%M:%S')}] DRM hotplug event")
+            self.check_and_apply(self.wait_for_hyprland())
+        elif event == 'resume':
+            print(f"[{datetime.now().strftime('%H:%M:%S')}] Resumed from suspend, verifying layout")
+            self.wait_for_hyprland()
+            self.verify_and_repair()
+        elif event == 'lid':
+            print(f"[{datetime.now().strftime('%H:%M:%S')}] Lid {self.lid.state}, verifying layout")
+            self.verify_and_repair()
+        else:
+            self.check_and_apply()
+    
+    def start_recording(self, path):
+        """Log every hyprctl exchange, DRM scan and wake-up to a trace file
+        
+        The merged profiles go into the trace header, so a replay elsewhere
+        sees the same saved layouts.
+        """
+        profiles = {"profiles": self.config_manager.get_profiles(),
+                    "history": self.config_manager.profiles.get("history", [])}
+        self.trace = TraceRecorder(path, 'daemon', self.lid.state if self.lid else None, profiles)
+        self.trace.install()
+        self.drm_source = RecordingConnectorSource(self.trace, self.drm_source.sysfs_root)
+        print(f"  Recording trace to {path}")
+    
+    def replay(self, player):
+        """Feed a recorded trace through the main loop and report how long each reaction took
+        
+        Hyprland, sysfs and the lid are answered from the trace, and the
+        profiles come from the trace header (in a scratch copy, so replaying
+        never touches the real profile file). Only daemon traces can be
+        replayed: GUI traces have no DRM scans or wake-up events to drive it.
+        
+        Returns:
+            True if the trace was replayed, False if it can't be
+        """
+        source = player.header.get('source')
+        if source != 'daemon':
+            print(f"[{datetime.now().strftime('%H:%M:%S')}] Cannot replay a {source} trace")
+            print(f"  Only traces from --record-trace have the DRM scans and events a replay needs;")
+            print(f"  GUI traces (HYPRDISPLAYS_TRACE) are for reading the hyprctl exchanges")
+            return False
+        
+        scratch = Path(tempfile.mkdtemp(prefix="hyprdisplays-replay-"))
+        self.config_manager.profiles_path = scratch / "hyprdisplays_profiles.json"
+        with open(self.config_manager.profiles_path, 'w') as f:
+            json.dump(player.header.get('profiles') or {"profiles": {}, "history": []}, f)
+        self.config_manager.profiles = self.config_manager.load_profiles()
+        self.config_manager.profile_index = ProfileIndex(self.config_manager.profiles_path, scratch / "profiles.d")
+        self.predictor = TransitionPredictor(self.config_manager.profiles.get('history'))
+        self.drm_source = ReplayConnectorSource(player)
+        self.lid = ReplayLid(player.header['lid']) if player.header.get('lid') else None
+        
+        events = player.events
+        print(f"[{datetime.now().strftime('%H:%M:%S')}] Replaying {player.header.get('source')} trace "
+              f"from {player.header.get('started')}")
+        print(f"  {len(events)} event(s) over {events[-1][0] if events else 0:.1f}s at {player.speed:g}x speed")
+        
+        timings = []
+        player.begin()
+        try:
+            self.check_and_apply()
+            for index, (t, event, lid_state) in enumerate(events, 1):
+                player.sleep_until(t)
+                player.enter(index)
+                if self.lid and lid_state:
+                    self.lid.state = lid_state
+                sent_before = len(player.sent)
+                started = time.monotonic()
+                self.handle_event(None if event == 'poll' else event)
+                timings.append((t, event, time.monotonic() - started, len(player.sent) - sent_before))
+        finally:
+            player.end()
+            shutil.rmtree(scratch, ignore_errors=True)
+        
+        print(f"\nReplay summary:")
+        for t, event, duration, sent in timings:
+            if event != 'poll' or sent:
+                print(f"  {t:9.3f}s  {event:8s} {duration * 1000:8.1f} ms  {sent} change(s) sent")
+        print(f"  Changes sent: {len(player.sent)} (recorded run: {len(player.recorded_sent)})")
+        return True
 
 def main():
     """Main entry point"""
@@ -196,10 +863,39 @@ def main():
                       help='Check interval in seconds (default: 3)')
     parser.add_argument('--verbose', action='store_true',
                       help='Verbose output')
+    parser.add_argument('--ignore-lid', action='store_true',
+                      help='Do not watch the lid switch (no layout check on lid changes)')
+    parser.add_argument('--lid-disables-panel', action='store_true',
+                      help='Switch the laptop panel off while the lid is closed and an external monitor is on')
+    parser.add_argument('--bus-address',
+                      help='Watch logind on this D-Bus address instead of the system bus')
+    parser.add_argument('--auto-layout', choices=LAYOUT_GOALS,
+                      help='Arrange monitor sets without a saved profile (not saved)')
+    parser.add_argument('--dry-run', action='store_true',
+                      help='Print the apply plan for the current monitors and exit')
+    parser.add_argument('--record-trace', metavar='PATH',
+                      help='Record hyprctl calls, DRM scans and events to a trace file (.gz to compress)')
+    parser.add_argument('--replay-trace', metavar='PATH',
+                      help='Replay a recorded trace instead of watching the real monitors, then exit')
+    parser.add_argument('--replay-speed', type=float, default=1.0,
+                      help='Replay pace relative to the recording (default: 1.0)')
     
     args = parser.parse_args()
     
-    daemon = MonitorDaemon(check_interval=args.interval)
+    daemon = MonitorDaemon(check_interval=args.interval,
+                           bus_address=args.bus_address,
+                           watch_lid=not args.ignore_lid,
+                           auto_layout=args.auto_layout,
+                           lid_disables_panel=args.lid_disables_panel)
+    if args.dry_run:
+        daemon.dry_run()
+        return
+    if args.replay_trace:
+        if not daemon.replay(TracePlayer(args.replay_trace, args.replay_speed)):
+            sys.exit(1)
+        return
+    if args.record_trace:
+        daemon.start_recording(args.record_trace)
     daemon.run()
 
 if __name__ == '__main__':
@@ -9,7 +9,20 @@ import subprocess
 import os
 from pathlib import Path
 from datetime import datetime
-import hashlib
+
+from hyprdisplays_drm import DrmConnectorSource
+from hyprdisplays_profiles import (HISTORY_LIMIT, ProfileIndex, monitor_identity, identity_key, find_profile_key,
+                                   profile_key_for, migrate_profiles, save_profiles_file, export_profiles,
+                                   ProfileSearchIndex, mark_profile_used, last_used)
+from hyprdisplays_config import (ConfigTree, remove_lines, write_if_changed, autoreload_enabled, open_event_socket,
+                                 compile_monitor_rules, monitor_description)
+from hyprdisplays_trace import TraceRecorder
+from hyprdisplays_layout import (LayoutHistory, propagate_resize, profile_rects, validate_layout,
+                                 describe_layout_problems)
+from hyprdisplays_apply import (plan_apply, validate_modes, valid_scales, snap_to_scales, ApplyVerifier,
+                                hyprctl_monitors, snapshot_monitors,
+                                serialize_snapshot, restore_snapshot, hyprctl_batch, hyprctl_keyword_monitor,
+                                hyprctl_workspaces, workspace_bindings, workspace_commands, CoalescingApplier)
 
 class ConfigurationManager:
     """Manages saved monitor configurations based on connected monitors"""
@@ -18,6 +31,16 @@ class ConfigurationManager:
         self.profiles_path = self.config_dir / "hyprdisplays_profiles.json"
         self.config_dir.mkdir(parents=True, exist_ok=True)
         self.profiles = self.load_profiles()
+        # Version the file was at when loaded, and what we changed since
+        self.base_version = self.profiles.get("version", 0)
+        self.changed_keys = set()
+        self.deleted_keys = set()
+        # Older files key profiles by the full identity string
+        if migrate_profiles(self.profiles):
+            self.changed_keys.update(self.profiles["profiles"])
+            self.save_profiles()
+        # System-wide profiles merged under the user's own
+        self.profile_index = ProfileIndex(self.profiles_path)
     
     def load_profiles(self):
         """Load saved monitor profiles"""
@@ -31,106 +54,184 @@ class ConfigurationManager:
         return {"profiles": {}, "history": []}
     
     def save_profiles(self):
-        """Save monitor profiles to disk"""
+        """Save monitor profiles to disk (atomically, merging concurrent saves)"""
         try:
-            with open(self.profiles_path, 'w') as f:
-                json.dump(self.profiles, f, indent=2)
+            self.profiles = save_profiles_file(self.profiles_path, self.profiles, self.base_version,
+                                               self.changed_keys, self.deleted_keys)
+            self.base_version = self.profiles["version"]
+            self.changed_keys.clear()
+            self.deleted_keys.clear()
         except Exception as e:
             print(f"Error saving profiles: {e}")
     
-    def get_monitor_fingerprint(self, monitors_info):
-        """Create a unique fingerprint for a set of monitors
+    def get_profiles(self):
+        """Merged system and user profiles, rebuilt only when a layer changed on disk"""
+        signature = self.profile_index.layer_signature()
+        if signature != self.profile_index.signature:
+            if self.profile_index.user_changed(signature):
+                self.profiles = self.load_profiles()
+                self.base_version = self.profiles.get("version", 0)
+                migrate_profiles(self.profiles)
+            self.profile_index.rebuild(self.profiles, signature)
+        return self.profile_index.profiles
+    
+    def get_monitor_identity(self, monitors_info, use_edid=True):
+        """Canonical identity of a set of monitors (stored once per profile)
         
         Args:
             monitors_info: List of dicts with keys: name, make, model, serial
+                (plus optional edid_make, edid_model, edid_serial)
+            use_edid: Fill empty make/model/serial from the EDID values
+        """
+        return monitor_identity(monitors_info, use_edid)
+    
+    def get_monitor_fingerprint(self, monitors_info, use_edid=True):
+        """Create a compact fingerprint for a set of monitors
         
         Returns:
-            String fingerprint that uniquely identifies this monitor setup
+            Fixed-length digest of the monitor set's identity
         """
-        # Create detailed identifier for each monitor
-        monitor_ids = []
-        for monitor in monitors_info:
-            # Use make, model, serial to uniquely identify the physical monitor
-            # Fall back to name if details not available
-            make = monitor.get('make', '').strip()
-            model = monitor.get('model', '').strip()
-            serial = monitor.get('serial', '').strip()
-            name = monitor.get('name', 'unknown')
-            
-            # Create identifier: name|make|model|serial
-            # This allows differentiating between same connector but different physical monitors
-            if make or model or serial:
-                # Use detailed info if available
-                monitor_id = f"{name}|{make}|{model}|{serial}"
-            else:
-                # Fall back to just name (for monitors without detailed info)
-                monitor_id = name
-            
-            monitor_ids.append(monitor_id)
-        
-        # Sort to ensure consistency regardless of detection order
-        sorted_ids = sorted(monitor_ids)
-        fingerprint = ";;".join(sorted_ids)
-        return fingerprint
+        return identity_key(monitor_identity(monitors_info, use_edid))
     
-    def save_configuration(self, monitors_info, monitor_configs):
+    def save_configuration(self, monitors_info, monitor_configs, workspaces=None):
         """Save current configuration for this monitor setup
         
         Args:
             monitors_info: List of dicts with monitor details (name, make, model, serial)
             monitor_configs: Dict mapping monitor names to their configurations
+            workspaces: Optional dict mapping workspace selectors to monitor names,
+                restored together with the monitors
+        
+        Returns:
+            Key the profile was stored under
         """
-        fingerprint = self.get_monitor_fingerprint(monitors_info)
+        identity = self.get_monitor_identity(monitors_info)
+        key = profile_key_for(self.profiles["profiles"], identity)
         
         # Prepare config data
+        saved_at = datetime.now().isoformat()
         config_data = {
+            "identity": identity,
             "monitors": monitor_configs,
-            "saved_at": datetime.now().isoformat(),
+            "saved_at": saved_at,
+            "last_used": saved_at,
             "monitors_info": monitors_info  # Save the full monitor details
         }
+        if self.profiles["profiles"].get(key, {}).get("pinned"):
+            config_data["pinned"] = True
+        if workspaces:
+            config_data["workspaces"] = workspaces
         
         # Save to profiles
-        self.profiles["profiles"][fingerprint] = config_data
+        self.profiles["profiles"][key] = config_data
+        self.changed_keys.add(key)
         
-        # Add to history
+        # Add to history (the identity lives in the profile, the key is enough here)
         history_entry = {
-            "fingerprint": fingerprint,
-            "monitors_info": monitors_info,
+            "fingerprint": key,
             "saved_at": config_data["saved_at"]
         }
         
         if "history" not in self.profiles:
             self.profiles["history"] = []
         
-        # Keep only last 50 history entries
+        # Keep only the most recent history entries
         self.profiles["history"].insert(0, history_entry)
-        self.profiles["history"] = self.profiles["history"][:50]
+        self.profiles["history"] = self.profiles["history"][:HISTORY_LIMIT]
         
         self.save_profiles()
-        print(f"Saved configuration for fingerprint: {fingerprint}")
+        print(f"Saved configuration for fingerprint: {key}")
         print(f"  Monitors: {[m.get('name') for m in monitors_info]}")
-        return fingerprint
+        return key
     
-    def load_configuration(self, monitors_info):
+    def find_profile(self, monitors_info):
+        """Key of the saved profile for this monitor setup, or None"""
+        profiles = self.get_profiles()
+        key = find_profile_key(profiles, self.get_monitor_identity(monitors_info))
+        
+        if key is None:
+            # Profiles saved before EDID identities were used
+            key = find_profile_key(profiles, self.get_monitor_identity(monitors_info, use_edid=False))
+        return key
+    
+    def load_configuration(self, monitors_info, record_use=True):
         """Load saved configuration for this monitor setup
         
         Args:
             monitors_info: List of dicts with monitor details (name, make, model, serial)
+            record_use: Record the hit as a use of the profile (for eviction)
         
         Returns:
             Dict of monitor configurations if found, None otherwise
         """
-        fingerprint = self.get_monitor_fingerprint(monitors_info)
+        profiles = self.get_profiles()
+        key = self.find_profile(monitors_info)
         
-        if fingerprint in self.profiles.get("profiles", {}):
-            config = self.profiles["profiles"][fingerprint]
-            print(f"Found saved configuration for fingerprint: {fingerprint}")
+        if key is not None:
+            config = profiles[key]
+            source = " (system profile)" if self.profile_index.is_system(key) else ""
+            print(f"Found saved configuration for fingerprint: {key}{source}")
             print(f"  Saved at: {config.get('saved_at', 'unknown')}")
+            if record_use and not self.profile_index.is_system(key):
+                try:
+                    mark_profile_used(self.profiles_path, key)
+                except Exception as e:
+                    print(f"Error recording profile use: {e}")
             return config.get("monitors", {})
         
-        print(f"No saved configuration found for fingerprint: {fingerprint}")
+        print(f"No saved configuration found for fingerprint: {self.get_monitor_fingerprint(monitors_info)}")
         return None
     
+    def load_workspaces(self, monitors_info):
+        """Saved workspace-to-monitor bindings for this monitor setup, if any"""
+        key = self.find_profile(monitors_info)
+        if key is None:
+            return {}
+        return self.get_profiles()[key].get("workspaces", {})
+    
+    def delete_profiles(self, keys):
+        """Remove saved profiles and their history entries
+        
+        System profiles are read-only and are left alone.
+        
+        Returns:
+            Keys that were deleted
+        """
+        deleted = [key for key in keys if key in self.profiles["profiles"]]
+        for key in deleted:
+            del self.profiles["profiles"][key]
+            self.changed_keys.discard(key)
+            self.deleted_keys.add(key)
+        
+        if deleted:
+            gone = set(deleted)
+            self.profiles["history"] = [item for item in self.profiles.get("history", [])
+                                        if item.get("fingerprint") not in gone]
+            self.save_profiles()
+            print(f"Deleted {len(deleted)} profile(s)")
+        return deleted
+    
+    def set_pinned(self, keys, pinned):
+        """Pin profiles so eviction never removes them, or unpin them
+        
+        Returns:
+            Keys that were changed (system profiles can't be pinned)
+        """
+        changed = []
+        for key in keys:
+            entry = self.profiles["profiles"].get(key)
+            if entry is None or bool(entry.get("pinned")) == pinned:
+                continue
+            if pinned:
+                entry["pinned"] = True
+            else:
+                entry.pop("pinned", None)
+            self.changed_keys.add(key)
+            changed.append(key)
+        if changed:
+            self.save_profiles()
+        return changed
+    
     def get_history(self, limit=10):
         """Get configuration history"""
         return self.profiles.get("history", [])[:limit]
@@ -261,6 +362,13 @@ class MonitorRow(Gtk.Box):
                 return 0
         self.sorted_resolutions = sorted(self.modes_map.keys(), key=sort_res, reverse=True)
         
+        # Precompute the scales Hyprland accepts for each resolution, so typed
+        # values can be snapped instead of silently replaced by the compositor
+        self.scale_table = {}
+        for res in self.sorted_resolutions:
+            w, h = map(int, res.split('x'))
+            self.scale_table[res] = valid_scales(w, h)
+        
         # Mirroring Option
         self.settings_box.append(self.create_label("Display Mode"))
         self.mirror_combo = Gtk.ComboBoxText()
@@ -313,7 +421,8 @@ class MonitorRow(Gtk.Box):
         self.scale_spin.set_adjustment(Gtk.Adjustment(value=display.scale, lower=0.5, upper=3.0, step_increment=0.1))
         self.scale_spin.set_digits(2)
         self.scale_spin.set_hexpand(True)
-        self.scale_spin.connect('value-changed', self.on_setting_changed)
+        self.last_scale = display.scale
+        self.scale_spin.connect('value-changed', self.on_scale_changed)
         self.scale_input_box.append(self.scale_spin)
         
         self.settings_box.append(self.scale_input_box)
@@ -402,6 +511,10 @@ class MonitorRow(Gtk.Box):
         self.y_spin.set_digits(0)
         self.y_spin.set_hexpand(True)
         
+        # Typed positions are edits too; set_position() moves the row without them
+        self.position_handlers = [spin.connect('value-changed', self.on_position_edited)
+                                  for spin in (self.x_spin, self.y_spin)]
+        
         pos_box.append(self.x_spin)
         pos_box.append(self.y_spin)
         advanced_content.append(pos_box)
@@ -514,11 +627,45 @@ class MonitorRow(Gtk.Box):
 
     def on_res_changed(self, combo):
         self.update_rates_for_current_res()
+        # Current scale may not give an integer logical size at the new resolution
+        self.scale_spin.set_value(self.snap_scale(self.scale_spin.get_value()))
         self.on_change()
+    
+    def snap_scale(self, scale, previous=None):
+        """Scale Hyprland accepts for the selected resolution, see snap_to_scales"""
+        resolution = self.res_combo.get_active_text()
+        scales = self.scale_table.get(resolution)
+        if scales is None:
+            scales = valid_scales(self.display.width, self.display.height)
+        return snap_to_scales(scales, scale, previous)
+    
+    def on_scale_changed(self, spin):
+        """Snap the scale to a valid value, then treat it as a setting change"""
+        scale = spin.get_value()
+        # Snap in the direction of the edit, so "+" moves on to the next valid scale
+        snapped = self.snap_scale(scale, self.last_scale)
+        if abs(snapped - scale) > 1e-6:
+            # Re-enters this handler with the valid value
+            spin.set_value(snapped)
+            return
+        self.last_scale = scale
+        self.on_setting_changed(spin)
 
     def on_rate_changed(self, combo):
         self.on_change()
     
+    def on_position_edited(self, spin):
+        self.on_change()
+    
+    def set_position(self, x, y):
+        """Move the row without reporting it as an edit (the caller reports the change)"""
+        for spin, value, handler in zip((self.x_spin, self.y_spin), (x, y), self.position_handlers):
+            spin.handler_block(handler)
+            try:
+                spin.set_value(value)
+            finally:
+                spin.handler_unblock(handler)
+    
     def on_setting_changed(self, widget):
         """Called when scale, rotation, or enabled state changes"""
         # When any monitor size changes (due to rotation/scale), adjust connected monitors
@@ -526,6 +673,39 @@ class MonitorRow(Gtk.Box):
             self.on_monitor_size_changed(self)
         self.on_change()
     
+    def get_config(self):
+        """Current settings as a profile entry (same keys the daemon applies)"""
+        resolution = self.res_combo.get_active_text()
+        rate_text = self.rate_combo.get_active_text()
+        
+        if not resolution:
+            resolution = f"{self.display.width}x{self.display.height}"
+            
+        if rate_text:
+            refresh = float(rate_text.replace("Hz", ""))
+        else:
+            refresh = self.display.refresh_rate
+        
+        config = {
+            'resolution': resolution,
+            'refresh_rate': refresh,
+            'x': int(self.x_spin.get_value()),
+            'y': int(self.y_spin.get_value()),
+            'scale': self.scale_spin.get_value(),
+            'transform': self.transform_combo.get_active(),
+            'disabled': not self.enabled_check.get_active(),
+            'focused': self.display.focused,
+            'width': self.display.width,
+            'height': self.display.height,
+            'hdr': self.hdr_check.get_active(),
+            'vrr': self.vrr_check.get_active()
+        }
+        
+        mirror_source = self.mirror_combo.get_active_id()
+        if mirror_source and mirror_source != "extend":
+            config['mirror'] = mirror_source
+        return config
+    
     def get_config_line(self):
         """Generate Hyprland config line for this monitor"""
         if not self.enabled_check.get_active():
@@ -1123,6 +1303,10 @@ class DisplayCanvas(Gtk.DrawingArea):
             self.cur_drag_y = snap_y if snap_y is not None else raw_y
             
         self.queue_draw()
+        
+        # Let live preview follow the monitor while it is dragged
+        if hasattr(self, 'on_drag_moved_callback') and self.on_drag_moved_callback:
+            self.on_drag_moved_callback(self.dragging_monitor, self.cur_drag_x, self.cur_drag_y)
 
     def find_magnetic_snap(self, monitor, x, y, width, height, all_monitors):
         """Find a magnetic snap position if close to an edge, otherwise return None"""
@@ -1233,9 +1417,8 @@ class DisplayCanvas(Gtk.DrawingArea):
                 monitor, final_x, final_y, w, h, monitor_data
             )
             
-            # Update the actual widgets, which will trigger the layout update
-            monitor.x_spin.set_value(int(round(valid_x)))
-            monitor.y_spin.set_value(int(round(valid_y)))
+            # Update the actual widgets; on_position_changed below reports the edit
+            monitor.set_position(int(round(valid_x)), int(round(valid_y)))
             
         self.dragging_monitor = None
         self.queue_draw()
@@ -1247,6 +1430,172 @@ class DisplayCanvas(Gtk.DrawingArea):
         # Notify change
         self.on_position_changed()
 
+class ProfileBrowser(Adw.Window):
+    """Searchable list of saved profiles with bulk delete and export
+    
+    The list view only creates widgets for the rows on screen and the model
+    holds nothing but profile keys, so thousands of profiles stay cheap.
+    """
+    def __init__(self, parent, config_manager):
+        super().__init__(transient_for=parent, modal=True, title="Saved Profiles")
+        self.set_default_size(640, 520)
+        self.config_manager = config_manager
+        self.index = ProfileSearchIndex()
+        self.profiles = {}
+        
+        box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL)
+        self.set_content(box)
+        
+        header = Adw.HeaderBar()
+        box.append(header)
+        
+        self.delete_btn = Gtk.Button(label="Delete")
+        self.delete_btn.add_css_class("destructive-action")
+        self.delete_btn.connect('clicked', lambda _: self.confirm_delete())
+        header.pack_end(self.delete_btn)
+        
+        self.export_btn = Gtk.Button(label="Export…")
+        self.export_btn.connect('clicked', lambda _: self.choose_export_file())
+        header.pack_end(self.export_btn)
+        
+        # Pinned profiles are kept when old ones are evicted
+        self.pin_btn = Gtk.Button(label="Pin")
+        self.pin_btn.connect('clicked', lambda _: self.toggle_pinned())
+        header.pack_end(self.pin_btn)
+        
+        self.search_entry = Gtk.SearchEntry(placeholder_text="Search by make, model, serial, connector or date")
+        self.search_entry.set_margin_top(6)
+        self.search_entry.set_margin_bottom(6)
+        self.search_entry.set_margin_start(6)
+        self.search_entry.set_margin_end(6)
+        self.search_entry.connect('search-changed', lambda _: self.refilter())
+        box.append(self.search_entry)
+        
+        # Keys only; row widgets are built and recycled by the factory
+        self.model = Gtk.StringList()
+        self.selection = Gtk.MultiSelection.new(self.model)
+        self.selection.connect('selection-changed', lambda *_: self.update_buttons())
+        
+        factory = Gtk.SignalListItemFactory()
+        factory.connect('setup', self.on_setup_row)
+        factory.connect('bind', self.on_bind_row)
+        
+        list_view = Gtk.ListView(model=self.selection, factory=factory)
+        scrolled = Gtk.ScrolledWindow()
+        scrolled.set_vexpand(True)
+        scrolled.set_child(list_view)
+        box.append(scrolled)
+        
+        self.count_label = Gtk.Label(xalign=0)
+        self.count_label.set_margin_top(6)
+        self.count_label.set_margin_bottom(6)
+        self.count_label.set_margin_start(12)
+        box.append(self.count_label)
+        
+        self.reload()
+    
+    def reload(self):
+        """Re-read the profiles and rebuild the search index"""
+        self.profiles = self.config_manager.get_profiles()
+        self.index.rebuild(self.profiles)
+        self.refilter()
+    
+    def refilter(self):
+        keys = self.index.search(self.search_entry.get_text())
+        self.model.splice(0, self.model.get_n_items(), keys)
+        self.count_label.set_text(f"{len(keys)} of {len(self.profiles)} profile(s)")
+        self.update_buttons()
+    
+    def on_setup_row(self, factory, list_item):
+        row = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=2)
+        row.set_margin_top(6)
+        row.set_margin_bottom(6)
+        row.set_margin_start(12)
+        row.set_margin_end(12)
+        row.title_label = Gtk.Label(xalign=0, wrap=True)
+        row.title_label.add_css_class("heading")
+        row.subtitle_label = Gtk.Label(xalign=0)
+        row.subtitle_label.add_css_class("dim-label")
+        row.append(row.title_label)
+        row.append(row.subtitle_label)
+        list_item.set_child(row)
+    
+    def on_bind_row(self, factory, list_item):
+        key = list_item.get_item().get_string()
+        entry = self.profiles.get(key, {})
+        row = list_item.get_child()
+        
+        monitors = []
+        for info in entry.get('monitors_info', []):
+            details = " ".join(part for part in (info.get('make'), info.get('model')) if part)
+            monitors.append(f"{details} ({info.get('name')})" if details else str(info.get('name')))
+        row.title_label.set_text(", ".join(monitors) or ", ".join(entry.get('monitors', {})) or key)
+        
+        used_at = (last_used(entry) or 'unknown')[:16].replace('T', ' ')
+        source = " • system profile" if self.config_manager.profile_index.is_system(key) else ""
+        pinned = " • pinned" if entry.get('pinned') else ""
+        row.subtitle_label.set_text(f"Last used {used_at} • {key}{pinned}{source}")
+    
+    def selected_keys(self):
+        selected = self.selection.get_selection()
+        return [self.model.get_string(selected.get_nth(i)) for i in range(selected.get_size())]
+    
+    def update_buttons(self):
+        keys = self.selected_keys()
+        self.delete_btn.set_sensitive(bool(keys))
+        self.export_btn.set_sensitive(bool(keys))
+        self.pin_btn.set_sensitive(bool(keys))
+        all_pinned = bool(keys) and all(self.profiles.get(key, {}).get('pinned') for key in keys)
+        self.pin_btn.set_label("Unpin" if all_pinned else "Pin")
+    
+    def toggle_pinned(self):
+        keys = self.selected_keys()
+        pin = not all(self.profiles.get(key, {}).get('pinned') for key in keys)
+        self.config_manager.set_pinned(keys, pin)
+        self.reload()
+    
+    def confirm_delete(self):
+        keys = self.selected_keys()
+        system = [key for key in keys if self.config_manager.profile_index.is_system(key)]
+        
+        dialog = Adw.MessageDialog.new(self)
+        dialog.set_heading(f"Delete {len(keys)} profile(s)?")
+        body = "These monitor setups will no longer be restored automatically."
+        if system:
+            body += f"\n{len(system)} system profile(s) are read-only and will be kept."
+        dialog.set_body(body)
+        dialog.add_response("cancel", "Cancel")
+        dialog.add_response("delete", "Delete")
+        dialog.set_response_appearance("delete", Adw.ResponseAppearance.DESTRUCTIVE)
+        dialog.set_default_response("cancel")
+        dialog.set_close_response("cancel")
+        
+        def on_response(dialog, response):
+            if response == "delete":
+                self.config_manager.delete_profiles(keys)
+                self.reload()
+        
+        dialog.connect("response", on_response)
+        dialog.present()
+    
+    def choose_export_file(self):
+        keys = self.selected_keys()
+        dialog = Gtk.FileDialog(title="Export Profiles", initial_name="hyprdisplays-profiles.json")
+        
+        def on_chosen(dialog, result):
+            try:
+                path = dialog.save_finish(result).get_path()
+            except GLib.Error:
+                return  # Cancelled
+            try:
+                export_profiles(path, self.profiles, keys)
+                self.count_label.set_text(f"Exported {len(keys)} profile(s) to {path}")
+            except Exception as e:
+                print(f"Error exporting profiles: {e}")
+                self.count_label.set_text(f"Error exporting profiles: {e}")
+        
+        dialog.save(self, None, on_chosen)
+
 class HyprDisplaysWindow(Adw.ApplicationWindow):
     def __init__(self, app):
         super().__init__(application=app, title="Hyprland Display Manager")
@@ -1255,9 +1604,20 @@ class HyprDisplaysWindow(Adw.ApplicationWindow):
         # Initialize configuration manager
         self.config_manager = ConfigurationManager()
         
+        # Kernel connector source, used to fill in identities from EDID
+        self.drm_source = DrmConnectorSource()
+        self.config_tree = ConfigTree()
+        
         # Track last monitor setup for auto-detection
         self.last_monitor_fingerprint = None
         
+        # Compositor state captured before the last apply, for revert
+        self.revert_snapshot = None
+        
+        # Live preview: throttled applier while active, and its pending timer
+        self.live_applier = None
+        self.live_timer = None
+        
         # Main box
         main_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL)
         self.set_content(main_box)
@@ -1276,12 +1636,28 @@ class HyprDisplaysWindow(Adw.ApplicationWindow):
         identify_btn.connect('clicked', lambda _: self.show_display_identifiers())
         header.pack_start(identify_btn)
         
+        # Live preview: push edits to Hyprland while arranging
+        self.live_preview_btn = Gtk.ToggleButton(label="Live Preview")
+        self.live_preview_btn.set_tooltip_text("Apply changes as you edit; turning it off asks to keep or revert")
+        self.live_preview_btn.connect('toggled', self.on_live_preview_toggled)
+        header.pack_start(self.live_preview_btn)
+        
+        # Saved profiles browser
+        profiles_btn = Gtk.Button(label="Profiles")
+        profiles_btn.connect('clicked', lambda _: ProfileBrowser(self, self.config_manager).present())
+        header.pack_start(profiles_btn)
+        
         # Apply and Save button (combined)
         apply_btn = Gtk.Button(label="Apply & Save")
         apply_btn.add_css_class("suggested-action")
-        apply_btn.connect('clicked', lambda _: self.save_to_config())
+        apply_btn.connect('clicked', lambda _: self.check_layout_and_save())
         header.pack_end(apply_btn)
         
+        # Opt-in: record which monitor each workspace is on with the profile
+        self.workspaces_check = Gtk.CheckButton(label="Save Workspaces")
+        self.workspaces_check.set_tooltip_text("Move workspaces back to these monitors when this setup is applied")
+        header.pack_end(self.workspaces_check)
+        
         # Create paned view: canvas on left, settings on right
         paned = Gtk.Paned(orientation=Gtk.Orientation.HORIZONTAL)
         paned.set_vexpand(True)
@@ -1315,6 +1691,26 @@ class HyprDisplaysWindow(Adw.ApplicationWindow):
         reset_btn.connect('clicked', lambda _: self.reset_canvas_view())
         toolbar.append(reset_btn)
         
+        # Undo/redo of layout edits (local only, nothing is sent to Hyprland)
+        self.history = LayoutHistory()
+        self.undo_btn = Gtk.Button(icon_name="edit-undo-symbolic", tooltip_text="Undo (Ctrl+Z)")
+        self.undo_btn.connect('clicked', lambda _: self.undo_layout())
+        toolbar.append(self.undo_btn)
+        self.redo_btn = Gtk.Button(icon_name="edit-redo-symbolic", tooltip_text="Redo (Ctrl+Shift+Z)")
+        self.redo_btn.connect('clicked', lambda _: self.redo_layout())
+        toolbar.append(self.redo_btn)
+        
+        shortcuts = Gtk.ShortcutController()
+        shortcuts.set_scope(Gtk.ShortcutScope.GLOBAL)
+        for trigger, callback in (("<Control>z", self.undo_layout),
+                                  ("<Control><Shift>z", self.redo_layout),
+                                  ("<Control>y", self.redo_layout)):
+            shortcuts.add_shortcut(Gtk.Shortcut(
+                trigger=Gtk.ShortcutTrigger.parse_string(trigger),
+                action=Gtk.CallbackAction.new(lambda *_, cb=callback: cb() or True)
+            ))
+        self.add_controller(shortcuts)
+        
         canvas_box.append(toolbar)
         
         self.canvas = DisplayCanvas(
@@ -1322,6 +1718,7 @@ class HyprDisplaysWindow(Adw.ApplicationWindow):
             self.on_config_changed
         )
         self.canvas.on_monitor_selected_callback = self.on_monitor_selected
+        self.canvas.on_drag_moved_callback = self.on_canvas_drag_moved
         canvas_box.append(self.canvas)
         paned.set_start_child(canvas_box)
         
@@ -1355,9 +1752,7 @@ class HyprDisplaysWindow(Adw.ApplicationWindow):
         """Check if monitors have been connected/disconnected"""
         try:
             # Use 'all' to see disabled monitors too, so hiding a monitor doesn't trigger a setup change event
-            result = subprocess.run(['hyprctl', 'monitors', 'all', '-j'], 
-                                    capture_output=True, text=True, check=True)
-            displays_data = json.loads(result.stdout)
+            displays_data = hyprctl_monitors()
             
             # Extract monitor info with details for fingerprinting
             monitors_info = []
@@ -1368,6 +1763,7 @@ class HyprDisplaysWindow(Adw.ApplicationWindow):
                     'model': d.get('model', ''),
                     'serial': d.get('serial', '')
                 })
+            self.drm_source.enrich(monitors_info)
             
             # Get current fingerprint
             current_fingerprint = self.config_manager.get_monitor_fingerprint(monitors_info)
@@ -1375,13 +1771,17 @@ class HyprDisplaysWindow(Adw.ApplicationWindow):
             # Check if setup has changed
             if current_fingerprint != self.last_monitor_fingerprint:
                 print(f"Monitor setup changed: {self.last_monitor_fingerprint} -> {current_fingerprint}")
+                if self.live_applier:
+                    # The edited layout belongs to the old monitor set
+                    self.stop_live_preview(confirm=False)
                 self.last_monitor_fingerprint = current_fingerprint
                 
                 # Try to load saved configuration for this setup
                 saved_config = self.config_manager.load_configuration(monitors_info)
                 if saved_config:
                     print("Applying saved configuration for this monitor setup...")
-                    self.apply_saved_configuration(saved_config, displays_data)
+                    self.apply_saved_configuration(saved_config, displays_data,
+                                                   self.config_manager.load_workspaces(monitors_info))
                     self.status_label.set_text(f"Auto-applied saved config for {len(monitors_info)} monitor(s)")
                 else:
                     print("No saved configuration found, keeping current")
@@ -1391,36 +1791,41 @@ class HyprDisplaysWindow(Adw.ApplicationWindow):
         
         return True  # Continue checking
     
-    def apply_saved_configuration(self, saved_config, displays_data):
-        """Apply a saved configuration to the displays"""
+    def apply_saved_configuration(self, saved_config, displays_data, workspaces=None):
+        """Apply a saved configuration to the displays
+        
+        Saved workspace bindings go out in the same batch as the last monitor.
+        """
         try:
-            # Apply via hyprctl first
-            for monitor_name, config in saved_config.items():
-                # Build monitor config line
-                if config.get('disabled'):
-                    cmd = f"{monitor_name},disabled"
+            # Swap modes the monitors no longer offer before sending anything
+            saved_config, substitutions = validate_modes(saved_config, displays_data)
+            for sub in substitutions:
+                print(f"{sub['field'].capitalize()} {sub['requested']} not supported on {sub['monitor']}, using {sub['substituted']}")
+            for problem in describe_layout_problems(validate_layout(profile_rects(saved_config, displays_data))):
+                print(f"Layout problem in saved profile: {problem}")
+            
+            workspace_moves = []
+            if workspaces:
+                workspace_moves = workspace_commands(workspaces, saved_config, hyprctl_workspaces())
+            
+            # Apply via hyprctl first, in an order that avoids transient overlaps
+            plan = plan_apply(saved_config, displays_data)
+            for index, step in enumerate(plan):
+                print(f"Applying saved config ({step['phase']}): monitor={step['command']}")
+                if index == len(plan) - 1:
+                    hyprctl_batch([f"keyword monitor {step['command']}"] + workspace_moves)
+                    workspace_moves = []
                 else:
-                    resolution = config.get('resolution', f"{config.get('width')}x{config.get('height')}")
-                    refresh = config.get('refresh_rate', 60)
-                    x = config.get('x', 0)
-                    y = config.get('y', 0)
-                    scale = config.get('scale', 1.0)
-                    transform = config.get('transform', 0)
-                    
-                    cmd = f"{monitor_name},{resolution}@{refresh},{x}x{y},{scale},transform,{transform}"
-                    
-                    if config.get('hdr') or config.get('bitdepth') == 10:
-                        cmd += ",bitdepth,10"
-                        
-                    if config.get('vrr') == 1:
-                        cmd += ",vrr,1"
-                
-                print(f"Applying saved config: monitor={cmd}")
-                subprocess.run(['hyprctl', 'keyword', 'monitor', cmd], 
-                             capture_output=True, text=True, check=False)
+                    hyprctl_keyword_monitor(step['command'])
+            if workspace_moves:
+                hyprctl_batch(workspace_moves)
             
-            # Reload display to update UI
-            GLib.timeout_add(500, lambda: self.load_displays())
+            # Wait for the state to land (retrying outputs that didn't), then update UI
+            def on_verified(_, failed):
+                for name, changes in failed.items():
+                    print(f"Warning: {name} did not reach the saved state ({', '.join(changes)})")
+                self.load_displays()
+            self.verify_async(ApplyVerifier(saved_config), on_verified)
             
         except Exception as e:
             print(f"Error applying saved configuration: {e}")
@@ -1430,9 +1835,7 @@ class HyprDisplaysWindow(Adw.ApplicationWindow):
         """Load current display configuration from Hyprland"""
         try:
             # Use 'all' to include disabled monitors
-            result = subprocess.run(['hyprctl', 'monitors', 'all', '-j'], 
-                                    capture_output=True, text=True, check=True)
-            displays_data = json.loads(result.stdout)
+            displays_data = hyprctl_monitors()
             
             # Extract monitor info with details for fingerprinting
             monitors_info = []
@@ -1443,10 +1846,14 @@ class HyprDisplaysWindow(Adw.ApplicationWindow):
                     'model': d.get('model', ''),
                     'serial': d.get('serial', '')
                 })
+            self.drm_source.enrich(monitors_info)
             
             # Update fingerprint
             self.last_monitor_fingerprint = self.config_manager.get_monitor_fingerprint(monitors_info)
             
+            # Keep saving workspaces for a setup that already has them
+            self.workspaces_check.set_active(bool(self.config_manager.load_workspaces(monitors_info)))
+            
             # Clear existing
             while self.content_box.get_first_child():
                 self.content_box.remove(self.content_box.get_first_child())
@@ -1482,7 +1889,7 @@ class HyprDisplaysWindow(Adw.ApplicationWindow):
             self.canvas.queue_draw()
             
             # Check if we have a saved config for this setup
-            saved_config = self.config_manager.load_configuration(monitors_info)
+            saved_config = self.config_manager.load_configuration(monitors_info, record_use=False)
             if saved_config:
                 status_msg = f"Loaded {len(displays_data)} display(s) - Saved config available"
                 
@@ -1500,6 +1907,10 @@ class HyprDisplaysWindow(Adw.ApplicationWindow):
             else:
                 status_msg = f"Loaded {len(displays_data)} display(s)"
             self.status_label.set_text(status_msg)
+            
+            # Fresh layout from Hyprland: history starts over
+            self.history.reset(self.monitor_rows)
+            self.update_history_buttons()
         except Exception as e:
             self.status_label.set_text(f"Error loading displays: {e}")
 
@@ -1530,6 +1941,10 @@ class HyprDisplaysWindow(Adw.ApplicationWindow):
         changed_row.prev_width = new_width
         changed_row.prev_height = new_height
         
+        # Undo/redo restores neighbour positions itself
+        if self.history.applying:
+            return
+        
         changed_x = int(changed_row.x_spin.get_value())
         changed_y = int(changed_row.y_spin.get_value())
         
@@ -1537,127 +1952,31 @@ class HyprDisplaysWindow(Adw.ApplicationWindow):
         print(f"  New size: {new_width}x{new_height}")
         print(f"  Position: {changed_x}x{changed_y}")
         
-        # Calculate the change in size
-        width_delta = new_width - old_width
-        height_delta = new_height - old_height
-        
-        if abs(width_delta) < 1 and abs(height_delta) < 1:
+        if abs(new_width - old_width) < 1 and abs(new_height - old_height) < 1:
             print("  No significant size change, skipping adjustment")
             return
         
-        # Adjust all monitors that are positioned relative to the changed monitor
+        # Layout as it was before the change, enabled monitors only
+        rects = {changed_row.display.name: (changed_x, changed_y, old_width, old_height)}
+        rows_by_name = {changed_row.display.name: changed_row}
         for row in self.monitor_rows:
             if row == changed_row or not row.enabled_check.get_active():
                 continue
-            
-            # Don't move the primary monitor (it stays at 0x0)
-            if row.display.focused:
-                continue
-            
-            current_x = int(row.x_spin.get_value())
-            current_y = int(row.y_spin.get_value())
-            
-            # Check if this monitor was adjacent to the changed one
-            # Right edge: monitor's X equals changed monitor's old right edge
-            old_right_edge = changed_x + old_width
-            was_at_right = abs(current_x - old_right_edge) < 5  # Allow small tolerance
-            
-            # Bottom edge: monitor's Y equals changed monitor's old bottom edge
-            old_bottom_edge = changed_y + old_height
-            was_at_bottom = abs(current_y - old_bottom_edge) < 5
-            
-            new_x = current_x
-            new_y = current_y
-            
-            if was_at_right and abs(width_delta) > 1:
-                # Monitor was to the right, adjust X position
-                new_x = int(changed_x + new_width)
-                print(f"  Adjusting {row.display.name} X: {current_x} -> {new_x} (maintaining right edge connection)")
-            
-            if was_at_bottom and abs(height_delta) > 1:
-                # Monitor was below, adjust Y position
-                new_y = int(changed_y + new_height)
-                print(f"  Adjusting {row.display.name} Y: {current_y} -> {new_y} (maintaining bottom edge connection)")
-            
-            if new_x != current_x or new_y != current_y:
-                row.x_spin.set_value(new_x)
-                row.y_spin.set_value(new_y)
-        
-        # Update canvas
-        self.canvas.queue_draw()
-    
-    def on_primary_size_changed(self):
-        """Called when primary monitor size/rotation/enabled changes - reposition other monitors"""
-        print("=== PRIMARY MONITOR SIZE CHANGED ===")
-        
-        # Find the primary monitor
-        primary_row = None
-        for row in self.monitor_rows:
-            if row.display.focused:
-                primary_row = row
-                break
-        
-        if not primary_row:
-            return
-        
-        # Calculate primary monitor's current size
-        primary_scale = primary_row.scale_spin.get_value()
-        primary_transform = primary_row.transform_combo.get_active()
-        primary_enabled = primary_row.enabled_check.get_active()
-        
-        primary_width = primary_row.display.width / primary_scale
-        primary_height = primary_row.display.height / primary_scale
-        
-        # Swap dimensions for 90/270 rotation
-        if primary_transform in [1, 3]:
-            primary_width, primary_height = primary_height, primary_width
+            width = row.display.width / row.scale_spin.get_value()
+            height = row.display.height / row.scale_spin.get_value()
+            if row.transform_combo.get_active() in [1, 3]:
+                width, height = height, width
+            rects[row.display.name] = (int(row.x_spin.get_value()), int(row.y_spin.get_value()), width, height)
+            rows_by_name[row.display.name] = row
         
-        # If primary is disabled, treat it as having no size
-        if not primary_enabled:
-            primary_width = 0
-            primary_height = 0
+        # The primary's side of the layout stays put, the rest follows the edge it hangs from
+        primary = next((row.display.name for row in self.monitor_rows if row.display.focused), None)
+        moves = propagate_resize(rects, changed_row.display.name, (new_width, new_height), root=primary)
         
-        print(f"Primary monitor: {primary_row.display.name}, size: {primary_width}x{primary_height}, enabled: {primary_enabled}")
-        
-        # Primary is always at 0x0, so reposition other monitors relative to it
-        for row in self.monitor_rows:
-            if row == primary_row:
-                # Primary always stays at 0x0
-                row.x_spin.set_value(0)
-                row.y_spin.set_value(0)
-                continue
-            
-            # Get current position
-            current_x = int(row.x_spin.get_value())
-            current_y = int(row.y_spin.get_value())
-            
-            # Calculate this monitor's size
-            scale = row.scale_spin.get_value()
-            transform = row.transform_combo.get_active()
-            width = row.display.width / scale
-            height = row.display.height / scale
-            
-            if transform in [1, 3]:
-                width, height = height, width
-            
-            print(f"Monitor {row.display.name}: current pos {current_x}x{current_y}, size {width}x{height}")
-            
-            # Check if this monitor overlaps with primary
-            # Primary is at 0,0 with size primary_width x primary_height
-            overlaps = not (current_x + width <= 0 or 
-                          current_x >= primary_width or
-                          current_y + height <= 0 or
-                          current_y >= primary_height)
-            
-            if overlaps or primary_width == 0:
-                # Need to reposition - place it to the right of primary
-                new_x = int(primary_width)
-                new_y = 0
-                
-                print(f"  Repositioning to {new_x}x{new_y} (was overlapping or primary disabled)")
-                
-                row.x_spin.set_value(new_x)
-                row.y_spin.set_value(new_y)
+        for name, (new_x, new_y) in moves.items():
+            row = rows_by_name[name]
+            print(f"  Adjusting {name}: {int(row.x_spin.get_value())}x{int(row.y_spin.get_value())} -> {new_x}x{new_y}")
+            row.set_position(new_x, new_y)
         
         # Update canvas
         self.canvas.queue_draw()
@@ -1683,22 +2002,140 @@ class HyprDisplaysWindow(Adw.ApplicationWindow):
         self.on_config_changed()
     
     def on_config_changed(self):
+        if self.history.record(self.monitor_rows):
+            self.update_history_buttons()
         self.status_label.set_text("Configuration changed (not applied)")
+        self.schedule_live_preview()
+    
+    def on_live_preview_toggled(self, button):
+        if button.get_active():
+            self.start_live_preview()
+        elif self.live_applier:
+            self.stop_live_preview()
+    
+    def start_live_preview(self):
+        """Send layout edits to Hyprland as they happen, at a bounded rate"""
+        try:
+            displays_data = hyprctl_monitors()
+        except Exception as e:
+            self.status_label.set_text(f"Error starting live preview: {e}")
+            self.live_preview_btn.set_active(False)
+            return
+        
+        # Taken once, so revert goes back to where live editing started
+        self.revert_snapshot = serialize_snapshot(snapshot_monitors(displays_data))
+        self.live_applier = CoalescingApplier(displays_data)
+        self.status_label.set_text("Live preview on - changes are applied as you edit")
+        self.schedule_live_preview()
+    
+    def stop_live_preview(self, confirm=True):
+        """Leave live preview; with confirm, ask to keep or revert what was sent"""
+        applier, self.live_applier = self.live_applier, None
+        if self.live_timer is not None:
+            GLib.source_remove(self.live_timer)
+            self.live_timer = None
+        self.live_preview_btn.set_active(False)
+        if not applier or not confirm:
+            return
+        
+        applier.flush()
+        if applier.sent:
+            self.status_label.set_text("Live preview off - Confirm to keep changes")
+            self.show_revert_dialog()
+        else:
+            self.status_label.set_text("Live preview off")
+    
+    def schedule_live_preview(self, target_config=None):
+        """Queue the layout for live preview; bursts collapse into one send"""
+        if not self.live_applier:
+            return
+        delay = self.live_applier.submit(target_config or self.get_target_config())
+        if self.live_timer is None:
+            self.live_timer = GLib.timeout_add(int(delay * 1000), self.flush_live_preview)
+    
+    def flush_live_preview(self):
+        self.live_timer = None
+        if self.live_applier:
+            sent = self.live_applier.flush()
+            if sent:
+                self.status_label.set_text(f"Live preview: updated {', '.join(sent)}")
+        return False
+    
+    def on_canvas_drag_moved(self, row, x, y):
+        """Live-preview the dragged monitor at its current drag position"""
+        if not self.live_applier:
+            return
+        target_config = self.get_target_config()
+        target_config[row.display.name] = dict(target_config[row.display.name],
+                                               x=int(round(x)), y=int(round(y)))
+        self.schedule_live_preview(target_config)
+    
+    def update_history_buttons(self):
+        self.undo_btn.set_sensitive(self.history.can_undo())
+        self.redo_btn.set_sensitive(self.history.can_redo())
+    
+    def undo_layout(self):
+        """Step the layout back one edit without touching the compositor"""
+        if self.history.undo(self.monitor_rows):
+            self.canvas.queue_draw()
+            self.status_label.set_text("Undid layout change (not applied)")
+        self.update_history_buttons()
+    
+    def redo_layout(self):
+        """Re-apply the last undone layout edit"""
+        if self.history.redo(self.monitor_rows):
+            self.canvas.queue_draw()
+            self.status_label.set_text("Redid layout change (not applied)")
+        self.update_history_buttons()
+    
+    def send_planned(self, target_config):
+        """Send target_config in plan_apply order, skipping outputs that already match
+        
+        Disables go first and the primary last, so there are no transient overlaps.
+        Raises if Hyprland rejects a rule.
+        """
+        for step in plan_apply(target_config, hyprctl_monitors()):
+            print(f"Applying ({step['phase']}): monitor={step['command']}")
+            if not hyprctl_keyword_monitor(step['command']):
+                raise Exception(f"hyprctl rejected monitor={step['command']}")
     
     def apply_config(self):
         """Apply configuration immediately via hyprctl"""
         try:
-            for row in self.monitor_rows:
-                config_line = row.get_config_line()
-                # Extract the monitor config part
-                cmd = config_line.replace("monitor=", "")
-                subprocess.run(['hyprctl', 'keyword', 'monitor', cmd], check=True)
+            self.send_planned(self.get_target_config())
             
-            self.status_label.set_text("Configuration applied successfully!")
-            GLib.timeout_add_seconds(2, lambda: self.load_displays())
+            def on_verified(_, failed):
+                self.load_displays()
+                if failed:
+                    self.status_label.set_text(f"Applied, but not accepted by Hyprland: {', '.join(failed)}")
+                else:
+                    self.status_label.set_text("Configuration applied successfully!")
+            self.verify_async(ApplyVerifier(self.get_target_config()), on_verified)
         except Exception as e:
             self.status_label.set_text(f"Error applying config: {e}")
     
+    def verify_async(self, verifier, on_done, poll_interval_ms=50):
+        """Run an ApplyVerifier from the main loop, then call on_done(displays_data, failed)
+
+        Keeps the window responsive while Hyprland applies the rules.
+        """
+        def poll():
+            try:
+                result = verifier.poll()
+            except Exception as e:
+                print(f"Error reading monitor state back: {e}")
+                self.status_label.set_text(f"Error verifying config: {e}")
+                return False
+            if result is None:
+                return True  # Keep polling
+            on_done(*result)
+            return False
+        GLib.timeout_add(poll_interval_ms, poll)
+    
+    def get_target_config(self):
+        """Profile-style config of every row, keyed by monitor name"""
+        return {row.display.name: row.get_config() for row in self.monitor_rows}
+    
     def show_revert_dialog(self, countdown=15):
         """Show a dialog asking if the user wants to keep the changes"""
         dialog = Adw.MessageDialog.new(self)
@@ -1749,9 +2186,7 @@ class HyprDisplaysWindow(Adw.ApplicationWindow):
         
         try:
             # Get current monitor details from Hyprland (including disabled)
-            result = subprocess.run(['hyprctl', 'monitors', 'all', '-j'], 
-                                  capture_output=True, text=True, check=True)
-            displays_data = json.loads(result.stdout)
+            displays_data = hyprctl_monitors()
             
             # Extract monitor info with details for fingerprinting
             monitors_info = []
@@ -1760,8 +2195,10 @@ class HyprDisplaysWindow(Adw.ApplicationWindow):
                     'name': d.get('name'),
                     'make': d.get('make', ''),
                     'model': d.get('model', ''),
-                    'serial': d.get('serial', '')
+                    'serial': d.get('serial', ''),
+                    'description': d.get('description', '')
                 })
+            self.drm_source.enrich(monitors_info)
             
             # Generate monitor lines and configuration data
             monitor_lines = []
@@ -1772,37 +2209,33 @@ class HyprDisplaysWindow(Adw.ApplicationWindow):
                 monitor_lines.append(config_line + '\n')
                 
                 # Store configuration data for profile
-                resolution = row.res_combo.get_active_text()
-                rate_text = row.rate_combo.get_active_text()
-                
-                if not resolution:
-                    resolution = f"{row.display.width}x{row.display.height}"
-                    
-                if rate_text:
-                    refresh = float(rate_text.replace("Hz", ""))
-                else:
-                    refresh = row.display.refresh_rate
-                
-                monitor_configs[row.display.name] = {
-                    'resolution': resolution,
-                    'refresh_rate': refresh,
-                    'x': int(row.x_spin.get_value()),
-                    'y': int(row.y_spin.get_value()),
-                    'scale': row.scale_spin.get_value(),
-                    'transform': row.transform_combo.get_active(),
-                    'disabled': not row.enabled_check.get_active(),
-                    'focused': row.display.focused,
-                    'width': row.display.width,
-                    'height': row.display.height,
-                    'hdr': row.hdr_check.get_active(),
-                    'vrr': row.vrr_check.get_active()
-                }
+                monitor_configs[row.display.name] = row.get_config()
                 
                 # Debug: print what we're saving
                 print(f"Saving: {config_line}")
             
             # Save to profile system with monitor details
-            fingerprint = self.config_manager.save_configuration(monitors_info, monitor_configs)
+            workspaces = None
+            if self.workspaces_check.get_active():
+                try:
+                    workspaces = workspace_bindings(hyprctl_workspaces())
+                except Exception as e:
+                    print(f"Could not read workspaces: {e}")
+            fingerprint = self.config_manager.save_configuration(monitors_info, monitor_configs, workspaces)
+            
+            # Every profile compiled into desc: rules, so Hyprland can lay out any
+            # known monitor itself at login; connector-keyed lines remain only for
+            # current monitors without a usable description
+            desc_rules, ambiguous = compile_monitor_rules(self.config_manager.get_profiles(), fingerprint,
+                                                          monitors_info)
+            current_descs = {m['name']: monitor_description(m) for m in monitors_info}
+            monitor_lines = [line for row, line in zip(self.monitor_rows, monitor_lines)
+                             if current_descs.get(row.display.name) not in desc_rules]
+            for description in ambiguous:
+                if description in desc_rules:
+                    print(f"Profiles disagree on {description}, the daemon will handle the other layouts")
+                else:
+                    print(f"Several outputs are {description}, keeping connector rules for them")
             
             # Strategy: Save to monitors.conf which is typically sourced last
             # This ensures our settings override any earlier monitor configs
@@ -1811,140 +2244,193 @@ class HyprDisplaysWindow(Adw.ApplicationWindow):
                 "# Monitor configuration - Generated by HyprDisplays\n",
                 "# This file is automatically managed by HyprDisplays.\n",
                 "# Manual changes may be overwritten.\n",
-                f"# Profile: {fingerprint[:60]}...\n",  # Truncate long fingerprints
+                f"# Profile: {fingerprint}\n",
                 f"# Saved: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n",
                 "\n"
-            ] + monitor_lines
+            ] + monitor_lines + [f"monitor={rule}\n" for rule in desc_rules.values()]
             
-            # Write to monitors.conf
-            with open(monitors_conf_path, 'w') as f:
-                f.writelines(monitors_content)
+            # Listen before writing so the reload our writes trigger is not missed
+            events = open_event_socket() if autoreload_enabled() else None
+            written = []
             
-            print(f"Config saved to {monitors_conf_path}")
+            # Write to monitors.conf (the timestamp alone is not a change)
+            if write_if_changed(monitors_conf_path, ''.join(monitors_content), ignore_prefixes=('# Saved:',)):
+                written.append(monitors_conf_path)
+                print(f"Config saved to {monitors_conf_path}")
+            else:
+                print(f"{monitors_conf_path} unchanged")
             
-            # Also clean up monitor lines from main config and sourced files
-            # to avoid conflicts
-            files_to_clean = [
-                config_path,
-                hypr_dir / "hyprland" / "general.conf",
-                hypr_dir / "custom" / "general.conf"
-            ]
+            # Remove monitor rules from every other file Hyprland reads (source=
+            # includes followed, globs expanded) so they can't override ours
+            edits = self.config_tree.lines_to_clean(monitors_conf_path)
+            needs_source = not self.config_tree.includes(monitors_conf_path) and config_path.exists()
+            if needs_source:
+                edits.setdefault(config_path, set())
             
-            for file_path in files_to_clean:
-                if not file_path.exists():
-                    continue
-                
+            for path, number, text in self.config_tree.monitor_lines():
+                if number in edits.get(path, ()):
+                    print(f"Conflicting rule {path}:{number}: {text}")
+            
+            for file_path, line_numbers in edits.items():
                 try:
-                    with open(file_path, 'r') as f:
-                        lines = f.readlines()
-                    
-                    # Remove monitor lines and HyprDisplays headers, but keep commented lines
-                    # Also keep the "source=monitors.conf" line if present
-                    new_lines = []
-                    for line in lines:
-                        stripped = line.strip()
-                        # Keep the line if:
-                        # - It's not a monitor= line (or is commented)
-                        # - It's not an old HyprDisplays header
-                        # - It's a source=monitors.conf line (we need this!)
-                        if (not stripped.startswith('monitor=') or stripped.startswith('#')) and \
-                           '# Monitor configuration - Generated by HyprDisplays' not in line and \
-                           'This file is automatically managed by HyprDisplays' not in line:
-                            new_lines.append(line)
-                        elif 'source=monitors.conf' in line or 'source = monitors.conf' in line:
-                            # Keep the source line
-                            new_lines.append(line)
+                    content = remove_lines(file_path.read_text(), line_numbers)
+                    if file_path == config_path and needs_source:
+                        content += '\n# Monitor configuration\nsource=monitors.conf\n'
+                        print("Added source=monitors.conf to hyprland.conf")
                     
-                    # Write back
-                    with open(file_path, 'w') as f:
-                        f.writelines(new_lines)
-                    
-                    print(f"Cleaned monitor lines from {file_path}")
+                    if write_if_changed(file_path, content):
+                        written.append(file_path)
+                        print(f"Cleaned monitor lines from {file_path}")
                 except Exception as e:
                     print(f"Warning: Could not clean {file_path}: {e}")
             
-            # Ensure main config sources monitors.conf
-            # Check if it already has the source line
-            if config_path.exists():
-                with open(config_path, 'r') as f:
-                    content = f.read()
-                
-                if 'source=monitors.conf' not in content and 'source = monitors.conf' not in content:
-                    # Add source line
-                    with open(config_path, 'a') as f:
-                        f.write('\n# Monitor configuration\nsource=monitors.conf\n')
-                    print("Added source=monitors.conf to hyprland.conf")
-            
-            # Re-apply the configuration to ensure it takes effect
-            # This ensures the saved config matches what's currently displayed
-            for row in self.monitor_rows:
-                config_line = row.get_config_line()
-                cmd = config_line.replace("monitor=", "")
-                result = subprocess.run(['hyprctl', 'keyword', 'monitor', cmd], 
-                                      capture_output=True, text=True, check=False)
-                if result.returncode != 0:
-                    print(f"Warning: Failed to apply monitor config: {result.stderr}")
-            
-            self.status_label.set_text(f"Config saved for {len(monitors_info)} monitor(s) - Will auto-load on reconnect!")
+            # Every rule was already sent by save_to_config. Re-send only if files
+            # changed and Hyprland did not reload them on its own
+            target_config = self.get_target_config()
+            def on_reload(reloaded):
+                if reloaded:
+                    print("Hyprland reloaded the saved config")
+                else:
+                    try:
+                        self.send_planned(target_config)
+                    except Exception as e:
+                        print(f"Warning: Failed to apply monitor config: {e}")
+                self.status_label.set_text(f"Config saved for {len(monitors_info)} monitor(s) - Will auto-load on reconnect!")
+            
+            if not written:
+                print("Config files unchanged, nothing to reload")
+                if events:
+                    events.close()
+                self.status_label.set_text(f"Config saved for {len(monitors_info)} monitor(s) - Will auto-load on reconnect!")
+            elif events:
+                self.status_label.set_text("Config saved - waiting for Hyprland to reload...")
+                self.wait_for_event_async(events, 'configreloaded', 2.0, on_reload)
+            else:
+                on_reload(False)
         except Exception as e:
             import traceback
             traceback.print_exc()
             self.status_label.set_text(f"Error saving config: {e}")
     
+    def wait_for_event_async(self, events, event, timeout, on_done):
+        """Watch a HyprlandEvents socket from the main loop
+        
+        Calls on_done(True) once the event arrives, or on_done(False) on
+        timeout or if the socket closes, then closes the socket.
+        """
+        state = {'done': False, 'watch': None, 'timer': None}
+        
+        def finish(seen):
+            if state['done']:
+                return
+            state['done'] = True
+            for source in (state['watch'], state['timer']):
+                if source is not None:
+                    GLib.source_remove(source)
+            events.close()
+            on_done(seen)
+        
+        def on_readable(_fd, _condition):
+            try:
+                seen = events.poll(event)
+            except OSError as e:
+                print(f"Hyprland event socket failed: {e}")
+                seen = None
+            if seen is False:
+                return True  # Keep watching
+            state['watch'] = None
+            finish(bool(seen))
+            return False
+        
+        def on_timeout():
+            state['timer'] = None
+            finish(False)
+            return False
+        
+        state['watch'] = GLib.io_add_watch(events.fileno(), GLib.PRIORITY_DEFAULT,
+                                           GLib.IOCondition.IN | GLib.IOCondition.HUP, on_readable)
+        state['timer'] = GLib.timeout_add(int(timeout * 1000), on_timeout)
+    
     def revert_config(self):
-        """Revert to previous configuration"""
+        """Revert to the compositor state captured before the last apply"""
         print("=== REVERTING CONFIGURATION ===")
         try:
-            for row in self.monitor_rows:
-                if not hasattr(row.display, 'old_config_line'):
-                    print(f"ERROR: No old_config_line for {row.display.name}")
-                    self.status_label.set_text("Error: Cannot revert - no saved configuration")
-                    return
-                
-                config_line = row.display.old_config_line
-                cmd = config_line.replace("monitor=", "")
-                print(f"Reverting {row.display.name}: {cmd}")
-                result = subprocess.run(['hyprctl', 'keyword', 'monitor', cmd], 
-                                      capture_output=True, text=True, check=False)
-                if result.returncode != 0:
-                    print(f"ERROR reverting {row.display.name}: {result.stderr}")
-                else:
-                    print(f"✓ Reverted {row.display.name}")
+            if not self.revert_snapshot:
+                print("ERROR: No snapshot to revert to")
+                self.status_label.set_text("Error: Cannot revert - no saved configuration")
+                return
             
-            self.status_label.set_text("Configuration reverted")
-            print("Reloading displays...")
-            GLib.timeout_add_seconds(1, lambda: self.load_displays())
+            # One batched request restores every output at once
+            snapshot = restore_snapshot(self.revert_snapshot)
+            self.status_label.set_text("Reverting configuration...")
+            
+            def on_verified(_, failed):
+                for name, changes in failed.items():
+                    print(f"ERROR reverting {name}: {', '.join(changes)} still differ")
+                self.status_label.set_text("Configuration reverted")
+                print("Reloading displays...")
+                self.load_displays()
+            self.verify_async(ApplyVerifier(snapshot, retries=0), on_verified)
         except Exception as e:
             import traceback
             traceback.print_exc()
             self.status_label.set_text(f"Error reverting config: {e}")
     
+    def check_layout_and_save(self):
+        """Validate the layout and ask before applying one with overlaps or gaps"""
+        report = validate_layout(profile_rects(self.get_target_config()))
+        problems = describe_layout_problems(report)
+        if not problems:
+            self.save_to_config()
+            return
+        
+        for problem in problems:
+            print(f"Layout problem: {problem}")
+        self.status_label.set_text(f"Layout problem: {problems[0]}")
+        
+        dialog = Adw.MessageDialog.new(self)
+        dialog.set_heading("Layout has problems")
+        dialog.set_body("\n".join(problems))
+        dialog.add_response("cancel", "Keep Editing")
+        dialog.add_response("apply", "Apply Anyway")
+        dialog.set_response_appearance("apply", Adw.ResponseAppearance.DESTRUCTIVE)
+        dialog.set_default_response("cancel")
+        dialog.set_close_response("cancel")
+        
+        def on_response(dialog, response):
+            if response == "apply":
+                self.save_to_config()
+        
+        dialog.connect("response", on_response)
+        dialog.present()
+    
     def save_to_config(self):
         """Apply configuration and ask user to confirm or revert"""
         try:
-            # Save current config for potential revert
-            print("=== SAVING OLD CONFIG FOR REVERT ===")
-            for row in self.monitor_rows:
-                old_line = f"monitor={row.display.name},{row.display.width}x{row.display.height}@{row.display.refresh_rate:.2f},{row.display.x}x{row.display.y},{row.display.scale},transform,{row.display.transform}"
-                row.display.old_config_line = old_line
-                print(f"Old config for {row.display.name}: {old_line}")
+            if self.live_applier:
+                # The snapshot taken when live preview started still applies
+                self.stop_live_preview(confirm=False)
+            else:
+                # Snapshot the full compositor state for potential revert
+                print("=== SAVING OLD CONFIG FOR REVERT ===")
+                self.revert_snapshot = serialize_snapshot(snapshot_monitors(hyprctl_monitors()))
+            print(f"Revert snapshot: {self.revert_snapshot}")
             
             # Apply new config
             print("=== APPLYING NEW CONFIG ===")
-            for row in self.monitor_rows:
-                config_line = row.get_config_line()
-                cmd = config_line.replace("monitor=", "")
-                print(f"Applying: {cmd}")
-                result = subprocess.run(['hyprctl', 'keyword', 'monitor', cmd], 
-                                      capture_output=True, text=True, check=False)
-                if result.returncode != 0:
-                    print(f"ERROR: {result.stderr}")
-                    raise Exception(f"Failed to apply config: {result.stderr}")
+            self.send_planned(self.get_target_config())
             
-            self.status_label.set_text("Configuration applied - Confirm to keep changes")
+            # Read the state back and re-send only outputs that did not land
+            self.status_label.set_text("Applying configuration...")
             
-            # Show revert dialog
-            self.show_revert_dialog()
+            def on_verified(_, failed):
+                if failed:
+                    self.status_label.set_text(f"Applied, but not accepted by Hyprland: {', '.join(failed)} - Confirm or revert")
+                else:
+                    self.status_label.set_text("Configuration applied - Confirm to keep changes")
+                # Show revert dialog
+                self.show_revert_dialog()
+            self.verify_async(ApplyVerifier(self.get_target_config()), on_verified)
         except Exception as e:
             import traceback
             traceback.print_exc()
@@ -2092,5 +2578,12 @@ class HyprDisplaysApp(Adw.Application):
         win.present()
 
 if __name__ == '__main__':
+    # HYPRDISPLAYS_TRACE=path records hyprctl calls and socket events for debugging
+    trace_path = os.environ.get('HYPRDISPLAYS_TRACE')
+    recorder = TraceRecorder(trace_path, 'gui') if trace_path else None
+    if recorder:
+        recorder.install()
     app = HyprDisplaysApp()
     app.run(None)
+    if recorder:
+        recorder.close()
@@ -0,0 +1,652 @@
+#!/usr/bin/env python3
+"""
+HyprDisplays apply planner - Turn a saved profile into ordered hyprctl steps
+
+Applying monitors in dict order makes Hyprland relayout more than needed:
+a monitor can be moved onto a spot another one still occupies, or the
+primary can be modeset while the rest are still in their old places. The
+planner skips outputs that already match, then orders the rest in three
+phases: disable outputs going away, move/resize the ones that stay, and
+enable new ones last. Shared by the GUI and the daemon.
+"""
+
+import json
+import subprocess
+import time
+from functools import lru_cache
+
+PHASES = ('disable', 'reconfigure', 'enable')
+
+def build_monitor_command(monitor_name, config):
+    """Build the `hyprctl keyword monitor` argument for one saved monitor"""
+    if config.get('disabled'):
+        return f"{monitor_name},disabled"
+    if config.get('mirror'):
+        return f"{monitor_name},preferred,auto,1,mirror,{config['mirror']}"
+    if config.get('preferred'):
+        return f"{monitor_name},preferred,auto,1"
+
+    resolution = config.get('resolution', f"{config.get('width')}x{config.get('height')}")
+    refresh = config.get('refresh_rate', 60)
+    x = config.get('x', 0)
+    y = config.get('y', 0)
+    scale = config.get('scale', 1.0)
+    transform = config.get('transform', 0)
+
+    cmd = f"{monitor_name},{resolution}@{refresh},{x}x{y},{scale},transform,{transform}"
+
+    if config.get('hdr') or config.get('bitdepth') == 10:
+        cmd += ",bitdepth,10"
+
+    if config.get('vrr') == 1:
+        cmd += ",vrr,1"
+    return cmd
+
+def parse_mode(mode):
+    """Parse a Hyprland mode string like "2560x1440@143.97Hz"
+
+    Returns:
+        (width, height, refresh) tuple, or None if mode is malformed
+    """
+    try:
+        res, _, refresh = str(mode).replace('Hz', '').partition('@')
+        width, height = (int(v) for v in res.split('x'))
+        return width, height, float(refresh) if refresh else 60.0
+    except ValueError:
+        return None
+
+class ModeTable:
+    """Modes a monitor currently supports, indexed by resolution"""
+    def __init__(self, available_modes):
+        self.rates = {}
+        for mode in available_modes:
+            parsed = parse_mode(mode)
+            if parsed:
+                self.rates.setdefault(parsed[:2], []).append(parsed[2])
+
+    def closest(self, width, height, refresh):
+        """Closest supported (width, height, refresh) to the requested mode
+
+        An exact resolution wins; otherwise prefer the same aspect ratio,
+        then the nearest pixel count. The refresh rate is matched last.
+        """
+        if (width, height) in self.rates:
+            resolution = (width, height)
+        else:
+            aspect = width / height if height else 0
+            def distance(res):
+                same_aspect = abs(res[0] / res[1] - aspect) < 0.01
+                return (not same_aspect, abs(res[0] * res[1] - width * height))
+            resolution = min(self.rates, key=distance)
+        rate = min(self.rates[resolution], key=lambda r: abs(r - refresh))
+        return resolution[0], resolution[1], rate
+
+@lru_cache(maxsize=64)
+def get_mode_table(available_modes):
+    """Cached ModeTable for a tuple of availableModes strings"""
+    return ModeTable(available_modes)
+
+# Hyprland rounds scales to 1/120 steps (wp-fractional-scale-v1)
+SCALE_STEPS = 120
+
+@lru_cache(maxsize=256)
+def valid_scales(width, height, lower=0.5, upper=3.0):
+    """Scales Hyprland accepts for a mode without picking another one itself
+
+    A scale is valid when it is a multiple of 1/120 and divides both
+    dimensions into an integer logical size.
+
+    Returns:
+        Sorted tuple of valid scales between lower and upper
+    """
+    pixels_w, pixels_h = width * SCALE_STEPS, height * SCALE_STEPS
+    first = int(lower * SCALE_STEPS + 0.5)
+    last = int(upper * SCALE_STEPS + 0.5)
+    return tuple(n / SCALE_STEPS for n in range(max(first, 1), last + 1)
+                 if pixels_w % n == 0 and pixels_h % n == 0)
+
+def snap_to_scales(scales, scale, previous=None):
+    """Snap scale onto one of scales (scale itself if there are none)
+
+    Without previous the nearest one is picked. With previous, the value
+    before an edit, the snap follows the edit: the first valid scale at or
+    above the new value when it went up, at or below it when it went down.
+    Stepping a spin button therefore reaches the next valid scale instead
+    of snapping back to where it started.
+    """
+    if not scales:
+        return scale
+    if previous is not None and abs(scale - previous) > 1e-6:
+        if scale > previous:
+            above = [s for s in scales if s >= scale - 1e-6]
+            return above[0] if above else max(scales)
+        below = [s for s in scales if s <= scale + 1e-6]
+        return below[-1] if below else min(scales)
+    return min(scales, key=lambda s: abs(s - scale))
+
+def snap_scale(scale, width, height, previous=None):
+    """Valid scale for a width x height mode, see snap_to_scales"""
+    return snap_to_scales(valid_scales(width, height), scale, previous)
+
+def validate_modes(saved_config, displays_data):
+    """Map every saved mode and scale to the closest one the monitor supports now
+
+    Firmware or cable changes can drop modes, and scales that don't give an
+    integer logical size are silently replaced by Hyprland. Sending either
+    makes Hyprland fall back on its own, with extra modesets.
+
+    Args:
+        saved_config: Dict mapping monitor names to saved configurations
+        displays_data: Current state from `hyprctl monitors all -j`
+
+    Returns:
+        (validated_config, substitutions) where substitutions is a list of
+        dicts with keys: monitor, field ('mode' or 'scale'), requested, substituted
+    """
+    current = {d.get('name'): d for d in displays_data}
+    validated = {}
+    substitutions = []
+
+    for name, config in saved_config.items():
+        validated[name] = config
+        if config.get('disabled') or config.get('preferred'):
+            continue
+
+        resolution = config.get('resolution', f"{config.get('width')}x{config.get('height')}")
+        requested_text = f"{resolution}@{config.get('refresh_rate', 60)}"
+        requested = parse_mode(requested_text)
+        display = current.get(name)
+        table = get_mode_table(tuple(display.get('availableModes') or [])) if display else None
+
+        if table and table.rates:
+            if requested is None:
+                # Malformed saved mode: fall back to the monitor's first listed mode
+                width, height = next(iter(table.rates))
+                rate = table.rates[(width, height)][0]
+            else:
+                width, height, rate = table.closest(*requested)
+
+            config = validated[name] = dict(config, resolution=f"{width}x{height}", refresh_rate=rate)
+            if requested is None or (width, height) != requested[:2] or abs(rate - requested[2]) > 0.05:
+                substitutions.append({
+                    'monitor': name,
+                    'field': 'mode',
+                    'requested': requested_text,
+                    'substituted': f"{width}x{height}@{rate}"
+                })
+        elif requested is None:
+            continue
+        else:
+            width, height = requested[:2]
+
+        scale = float(config.get('scale', 1.0))
+        snapped = snap_scale(scale, width, height)
+        if abs(snapped - scale) > 1e-6:
+            validated[name] = dict(config, scale=snapped)
+            substitutions.append({
+                'monitor': name,
+                'field': 'scale',
+                'requested': f"{scale:g}",
+                'substituted': f"{snapped:g}"
+            })
+    return validated, substitutions
+
+def mirror_of(display):
+    """Name of the output a monitor entry mirrors, or None"""
+    mirror = display.get('mirrorOf')
+    return None if mirror in (None, '', 'none') else str(mirror)
+
+def changed_fields(config, display):
+    """List what a live Hyprland monitor would change to reach its saved config
+
+    Args:
+        config: Target configuration (saved profile entry)
+        display: Monitor entry from `hyprctl monitors all -j`
+
+    Returns:
+        List of changed aspects: 'enabled', 'mirror', 'mode', 'position',
+        'scale', 'transform', 'vrr', 'bitdepth' (empty if the monitor
+        already matches)
+    """
+    if config.get('disabled'):
+        return [] if display.get('disabled', False) else ['enabled']
+    if display.get('disabled', False):
+        return ['enabled']
+
+    changes = []
+    if (config.get('mirror') or None) != mirror_of(display):
+        changes.append('mirror')
+    if config.get('preferred') or config.get('mirror'):
+        # Geometry is chosen by Hyprland; only enabled and mirror state are checkable
+        return changes
+
+    resolution = config.get('resolution', f"{config.get('width')}x{config.get('height')}")
+    if resolution != f"{display.get('width')}x{display.get('height')}" or \
+       abs(float(config.get('refresh_rate', 60)) - display.get('refreshRate', 0)) > 0.5:
+        changes.append('mode')
+    if (config.get('x', 0), config.get('y', 0)) != (display.get('x'), display.get('y')):
+        changes.append('position')
+    if abs(float(config.get('scale', 1.0)) - display.get('scale', 1.0)) > 0.01:
+        changes.append('scale')
+    if config.get('transform', 0) != display.get('transform', 0):
+        changes.append('transform')
+    if 'vrr' in display and bool(config.get('vrr')) != bool(display['vrr']):
+        changes.append('vrr')
+    if 'currentFormat' in display:
+        want_10bit = bool(config.get('hdr') or config.get('bitdepth') == 10)
+        if want_10bit != ('2101010' in display['currentFormat']):
+            changes.append('bitdepth')
+    return changes
+
+def monitor_differs(config, display):
+    """Check whether a live Hyprland monitor deviates from its target config"""
+    return bool(changed_fields(config, display))
+
+def logical_size(width, height, scale, transform):
+    """Size in layout coordinates after scale and rotation"""
+    scale = scale or 1.0
+    w, h = width / scale, height / scale
+    if transform % 2 == 1:
+        w, h = h, w
+    return w, h
+
+def display_rect(display):
+    """Current (x, y, w, h) of a Hyprland monitor entry"""
+    w, h = logical_size(display.get('width', 0), display.get('height', 0),
+                        display.get('scale', 1.0), display.get('transform', 0))
+    return (display.get('x', 0), display.get('y', 0), w, h)
+
+def config_rect(config, display=None):
+    """Target (x, y, w, h) of a saved monitor config, or None if unknown"""
+    resolution = config.get('resolution', f"{config.get('width')}x{config.get('height')}")
+    try:
+        width, height = (int(v) for v in str(resolution).split('x'))
+    except ValueError:
+        if display is None:
+            return None
+        width, height = display.get('width', 0), display.get('height', 0)
+    w, h = logical_size(width, height, float(config.get('scale', 1.0)), config.get('transform', 0))
+    return (config.get('x', 0), config.get('y', 0), w, h)
+
+def overlap_area(a, b):
+    """Area shared by two (x, y, w, h) rectangles"""
+    dx = min(a[0] + a[2], b[0] + b[2]) - max(a[0], b[0])
+    dy = min(a[1] + a[3], b[1] + b[3]) - max(a[1], b[1])
+    return dx * dy if dx > 0 and dy > 0 else 0
+
+def plan_apply(saved_config, displays_data):
+    """Order the monitor commands of a profile to avoid transient relayouts
+
+    Args:
+        saved_config: Dict mapping monitor names to saved configurations
+        displays_data: Current state from `hyprctl monitors all -j`
+
+    Returns:
+        List of step dicts with keys: monitor, command, phase, changes.
+        Monitors that already match their config are left out.
+    """
+    current = {d.get('name'): d for d in displays_data}
+    disable, reconfigure, enable = [], [], []
+
+    for index, (name, config) in enumerate(saved_config.items()):
+        display = current.get(name)
+        if display is None:
+            # Not connected: the rule is still registered for when it appears
+            changes = ['enabled']
+        else:
+            changes = changed_fields(config, display)
+            if not changes:
+                continue
+
+        step = {
+            'monitor': name,
+            'command': build_monitor_command(name, config),
+            'changes': changes,
+            'index': index
+        }
+        if config.get('disabled'):
+            step['phase'] = 'disable'
+            disable.append(step)
+        elif display is None or display.get('disabled', False):
+            step['phase'] = 'enable'
+            step['rect'] = config_rect(config, display)
+            enable.append(step)
+        else:
+            step['phase'] = 'reconfigure'
+            step['rect'] = config_rect(config, display)
+            step['primary'] = display.get('focused', False)
+            reconfigure.append(step)
+
+    # Layout as it evolves while the plan runs: disabled outputs free their space first
+    going_away = {step['monitor'] for step in disable}
+    rects = {name: display_rect(d) for name, d in current.items()
+             if not d.get('disabled', False) and name not in going_away}
+
+    # Greedily pick the move that lands on the least occupied space; among free
+    # moves, plain repositioning goes before modesets and the primary goes last
+    ordered = []
+    pending = list(reconfigure)
+    while pending:
+        def cost(step):
+            target = step['rect']
+            occupied = sum(overlap_area(target, rect) for other, rect in rects.items()
+                           if other != step['monitor']) if target else 0
+            modeset = any(c in step['changes'] for c in ('mode', 'scale', 'transform'))
+            return (occupied, modeset, step['primary'], step['index'])
+        step = min(pending, key=cost)
+        pending.remove(step)
+        ordered.append(step)
+        if step['rect']:
+            rects[step['monitor']] = step['rect']
+
+    # New outputs appear left to right, top to bottom
+    enable.sort(key=lambda s: (s['rect'] is None, s['rect'] or (0, 0), s['index']))
+
+    plan = disable + ordered + enable
+    for step in plan:
+        for key in ('index', 'rect', 'primary'):
+            step.pop(key, None)
+    return plan
+
+def format_plan(plan):
+    """Human readable plan for dry runs and logs"""
+    if not plan:
+        return "  Nothing to apply - all monitors already match"
+    lines = []
+    for number, step in enumerate(plan, 1):
+        lines.append(f"  {number}. [{step['phase']}] monitor={step['command']}")
+        lines.append(f"     changes: {', '.join(step['changes'])}")
+    return "\n".join(lines)
+
+# Stands in for the hyprctl process when set (trace recording and replay);
+# called with the argument list, returns (exit code, output)
+hyprctl_hook = None
+
+def spawn_hyprctl(args):
+    """Run the real hyprctl, returning (exit code, output)"""
+    result = subprocess.run(['hyprctl', *args], capture_output=True, text=True, check=False)
+    return result.returncode, result.stdout or result.stderr
+
+def run_hyprctl(args):
+    """Run hyprctl (or the installed hook), returning (exit code, output)"""
+    if hyprctl_hook is not None:
+        return hyprctl_hook(args)
+    return spawn_hyprctl(args)
+
+def hyprctl_query(args):
+    """JSON output of a hyprctl query, raising CalledProcessError on failure"""
+    code, output = run_hyprctl([*args, '-j'])
+    if code != 0:
+        raise subprocess.CalledProcessError(code, ['hyprctl', *args, '-j'], output)
+    return json.loads(output)
+
+def hyprctl_monitors():
+    """Current state from `hyprctl monitors all -j`
+
+    Hyprland reports mirrorOf as the mirrored output's id; it is replaced
+    by the name, which is what monitor rules and saved profiles use.
+    """
+    displays_data = hyprctl_query(['monitors', 'all'])
+    names = {str(d.get('id')): d.get('name') for d in displays_data}
+    for d in displays_data:
+        if mirror_of(d) in names:
+            d['mirrorOf'] = names[mirror_of(d)]
+    return displays_data
+
+def hyprctl_keyword_monitor(command):
+    """Send one `hyprctl keyword monitor` rule, returning True on success"""
+    code, _ = run_hyprctl(['keyword', 'monitor', command])
+    return code == 0
+
+def hyprctl_batch(commands):
+    """Send several hyprctl commands in one `hyprctl --batch` round trip"""
+    code, _ = run_hyprctl(['--batch', ' ; '.join(commands)])
+    return code == 0
+
+def hyprctl_workspaces():
+    """Current workspaces from `hyprctl workspaces -j`"""
+    return hyprctl_query(['workspaces'])
+
+def workspace_selector(workspace):
+    """Dispatcher argument for a workspace: its number, or name:NAME"""
+    name = str(workspace.get('name', ''))
+    if not name or name == str(workspace.get('id')):
+        return str(workspace.get('id'))
+    return f"name:{name}"
+
+def workspace_bindings(workspaces_data):
+    """Map workspace selectors to the monitor each workspace is on
+
+    Special (scratchpad) workspaces follow the focused monitor and are left out.
+    """
+    return {workspace_selector(ws): ws.get('monitor') for ws in workspaces_data
+            if not str(ws.get('name', '')).startswith('special')}
+
+def workspace_commands(bindings, saved_config, workspaces_data=None):
+    """`dispatch moveworkspacetomonitor` commands restoring saved bindings
+
+    Workspaces bound to a monitor the profile disables are skipped. With
+    workspaces_data, workspaces that don't exist or are already in place
+    are skipped too.
+    """
+    enabled = {name for name, config in saved_config.items() if not config.get('disabled')}
+    current = workspace_bindings(workspaces_data) if workspaces_data is not None else None
+    commands = []
+    for selector, monitor in bindings.items():
+        if monitor not in enabled:
+            continue
+        if current is not None and current.get(selector, monitor) == monitor:
+            continue
+        commands.append(f"dispatch moveworkspacetomonitor {selector} {monitor}")
+    return commands
+
+# Live preview: most applies per second while the layout is being edited
+LIVE_PREVIEW_RATE = 4
+
+class CoalescingApplier:
+    """Push a stream of layouts to Hyprland at a bounded rate
+
+    Each submit() replaces the pending layout, so a burst of edits (a drag)
+    collapses into whichever state is current when the next send is due.
+    Only outputs whose rule differs from what Hyprland already has are sent,
+    all of them in one batch.
+
+    Args:
+        displays_data: Compositor state when editing started, the baseline
+            for outputs that have not been sent yet
+        max_rate: Most batches sent per second
+        send: Callable sending a list of hyprctl commands
+    """
+    def __init__(self, displays_data, max_rate=LIVE_PREVIEW_RATE, send=hyprctl_batch, clock=time.monotonic):
+        self.baseline = {d.get('name'): d for d in displays_data}
+        self.interval = 1.0 / max_rate
+        self.send = send
+        self.clock = clock
+        self.sent = {}  # monitor name -> rule last sent
+        self.pending = None
+        self.last_sent_at = None
+
+    def submit(self, target_config):
+        """Queue a layout, replacing any that was not sent yet
+
+        Returns:
+            Seconds until flush() may send it
+        """
+        self.pending = target_config
+        if self.last_sent_at is None:
+            return 0.0
+        return max(0.0, self.last_sent_at + self.interval - self.clock())
+
+    def changed_commands(self, target_config):
+        """Rules for the outputs of target_config that Hyprland doesn't have yet"""
+        commands = {}
+        for name, config in target_config.items():
+            command = build_monitor_command(name, config)
+            if name in self.sent:
+                if self.sent[name] == command:
+                    continue
+            elif name in self.baseline and not monitor_differs(config, self.baseline[name]):
+                continue
+            commands[name] = command
+        return commands
+
+    def flush(self):
+        """Send the pending layout's changed outputs
+
+        A failed send is not recorded and the layout stays pending, so
+        the next flush tries it again.
+
+        Returns:
+            Names of the outputs that were sent
+        """
+        target_config, self.pending = self.pending, None
+        if not target_config:
+            return []
+        commands = self.changed_commands(target_config)
+        if not commands:
+            return []
+        if not self.send([f"keyword monitor {command}" for command in commands.values()]):
+            self.pending = target_config
+            return []
+        self.sent.update(commands)
+        self.last_sent_at = self.clock()
+        return list(commands)
+
+def snapshot_monitors(displays_data):
+    """Capture the restorable state of every output
+
+    Unlike a config line rebuilt from the GUI, this keeps disabled,
+    mirrored, 10-bit and VRR state as the compositor reports it.
+
+    Returns:
+        Dict mapping monitor names to profile-style configs
+    """
+    snapshot = {}
+    for d in displays_data:
+        name = d.get('name')
+        if d.get('disabled', False):
+            snapshot[name] = {'disabled': True}
+            continue
+        config = {
+            'resolution': f"{d.get('width')}x{d.get('height')}",
+            'refresh_rate': round(d.get('refreshRate', 60.0), 3),
+            'x': d.get('x', 0),
+            'y': d.get('y', 0),
+            'scale': d.get('scale', 1.0),
+            'transform': d.get('transform', 0)
+        }
+        if mirror_of(d):
+            config['mirror'] = mirror_of(d)
+        if '2101010' in d.get('currentFormat', ''):
+            config['bitdepth'] = 10
+        if d.get('vrr'):
+            config['vrr'] = 1
+        snapshot[name] = config
+    return snapshot
+
+def serialize_snapshot(snapshot):
+    """Compact single-line form of a snapshot"""
+    return json.dumps(snapshot, separators=(',', ':'), sort_keys=True)
+
+def restore_snapshot(serialized, read_state=hyprctl_monitors):
+    """Restore a serialized snapshot in one batched hyprctl request
+
+    Only outputs that differ from the snapshot are sent, in planner order.
+
+    Returns:
+        The restored snapshot (dict), for verification
+    """
+    snapshot = json.loads(serialized)
+    try:
+        plan = plan_apply(snapshot, read_state())
+    except Exception as e:
+        # Can't read the current state - restore everything
+        print(f"Could not read monitor state before restore: {e}")
+        plan = [{'command': build_monitor_command(name, config)} for name, config in snapshot.items()]
+    if plan:
+        hyprctl_batch([f"keyword monitor {step['command']}" for step in plan])
+    return snapshot
+
+def drifted_outputs(target_config, displays_data):
+    """Map monitor names to the fields that still differ from target_config"""
+    current = {d.get('name'): d for d in displays_data}
+    drifted = {}
+    for name, config in target_config.items():
+        if name in current:
+            changes = changed_fields(config, current[name])
+            if changes:
+                drifted[name] = changes
+    return drifted
+
+class ApplyVerifier:
+    """Check that an apply landed and re-send only the outputs that didn't
+
+    Hyprland applies monitor rules on its next frame, so the state is read
+    back in short steps instead of after a fixed sleep. poll() does one
+    step and never sleeps, so an event loop can drive it from a timer;
+    verify_applied() drives it with sleeps.
+
+    Args:
+        target_config: Dict mapping monitor names to the configs just sent
+        read_state: Callable returning `hyprctl monitors all -j` data
+        send_command: Callable sending one monitor rule
+        retries: How many targeted re-sends to attempt
+        timeout: Seconds to wait for each attempt to land
+    """
+    def __init__(self, target_config, read_state=hyprctl_monitors, send_command=hyprctl_keyword_monitor,
+                 retries=1, timeout=2.0, clock=time.monotonic):
+        self.target_config = target_config
+        self.read_state = read_state
+        self.send_command = send_command
+        self.retries = retries
+        self.timeout = timeout
+        self.clock = clock
+        self.attempt = 0
+        self.deadline = clock() + timeout
+
+    def poll(self):
+        """Read the state back once
+
+        Returns:
+            None while still waiting, else (displays_data, failed) where
+            failed maps monitor names to the fields that still differ
+            after the retries
+        """
+        displays_data = self.read_state()
+        drifted = drifted_outputs(self.target_config, displays_data)
+        if not drifted:
+            return displays_data, {}
+        if self.clock() < self.deadline:
+            return None
+        if self.attempt >= self.retries:
+            return displays_data, drifted
+        self.attempt += 1
+        for name in drifted:
+            print(f"Retrying {name}: {', '.join(drifted[name])} did not apply")
+            self.send_command(build_monitor_command(name, self.target_config[name]))
+        self.deadline = self.clock() + self.timeout
+        return None
+
+def wait_until_applied(target_config, read_state=hyprctl_monitors, timeout=2.0, poll_interval=0.05):
+    """Short-poll the compositor until every output matches its target config
+
+    Returns:
+        (displays_data, drifted) where drifted maps monitor names to the
+        fields that still differ (empty when everything landed)
+    """
+    return verify_applied(target_config, read_state, retries=0, timeout=timeout, poll_interval=poll_interval)
+
+def verify_applied(target_config, read_state=hyprctl_monitors, send_command=hyprctl_keyword_monitor,
+                   retries=1, timeout=2.0, poll_interval=0.05):
+    """Blocking ApplyVerifier run, for callers without an event loop
+
+    Returns:
+        (displays_data, failed) where failed maps monitor names to the
+        fields that still differ after the retries
+    """
+    verifier = ApplyVerifier(target_config, read_state, send_command, retries, timeout)
+    while True:
+        result = verifier.poll()
+        if result is not None:
+            return result
+        time.sleep(poll_interval)
@@ -0,0 +1,393 @@
+#!/usr/bin/env python3
+"""
+HyprDisplays config writer - Touch Hyprland config files only when needed
+
+Hyprland reloads its config whenever a file it sourced changes, and every
+reload re-applies the monitor rules. Files are therefore compared by hash
+before writing and left alone when nothing changed, and the Hyprland event
+socket tells whether a reload already applied the saved rules so they do
+not have to be sent again. The config tree is followed through source=
+includes to find every monitor= rule, and saved profiles are compiled into
+desc: rules so Hyprland lays monitors out itself at login. Used by the
+GUI's save pipeline.
+"""
+
+import glob
+import hashlib
+import os
+import socket
+import tempfile
+import time
+from pathlib import Path
+
+from hyprdisplays_apply import build_monitor_command, hyprctl_query
+
+def content_digest(text, ignore_prefixes=()):
+    """SHA-256 of text, skipping lines that start with any of ignore_prefixes
+
+    Used to leave out lines that change on every save (timestamps) but
+    carry no configuration.
+    """
+    digest = hashlib.sha256()
+    for line in text.splitlines(keepends=True):
+        if ignore_prefixes and line.startswith(tuple(ignore_prefixes)):
+            continue
+        digest.update(line.encode())
+    return digest.hexdigest()
+
+def write_text_atomic(path, text):
+    """Replace a file's content via temp file + rename, keeping its mode
+
+    Symlinked configs (dotfile managers) are written through to their target.
+    """
+    path = Path(path).resolve()
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=path.parent)
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        try:
+            os.chmod(tmp_path, path.stat().st_mode & 0o7777)
+        except OSError:
+            pass
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+def write_if_changed(path, text, ignore_prefixes=()):
+    """Write text to path unless the file already holds the same content
+
+    Returns:
+        True if the file was written
+    """
+    path = Path(path)
+    try:
+        current = path.read_text()
+    except OSError:
+        current = None
+    if current is not None and content_digest(current, ignore_prefixes) == content_digest(text, ignore_prefixes):
+        return False
+    write_text_atomic(path, text)
+    return True
+
+def autoreload_enabled():
+    """Whether Hyprland reloads on its own when a config file changes"""
+    try:
+        return not hyprctl_query(['getoption', 'misc:disable_autoreload']).get('int', 0)
+    except Exception:
+        return False
+
+def event_socket_path():
+    """Path of Hyprland's event socket (socket2), or None outside Hyprland"""
+    signature = os.environ.get('HYPRLAND_INSTANCE_SIGNATURE')
+    if not signature:
+        return None
+    runtime_dir = os.environ.get('XDG_RUNTIME_DIR')
+    candidates = [Path(runtime_dir) / "hypr" / signature] if runtime_dir else []
+    # Hyprland before 0.40 kept its sockets in /tmp
+    candidates.append(Path("/tmp/hypr") / signature)
+    for directory in candidates:
+        path = directory / ".socket2.sock"
+        if path.exists():
+            return path
+    return None
+
+# Called with every line read from the event socket when set (trace recording)
+event_hook = None
+
+class HyprlandEvents:
+    """Line reader for Hyprland's event socket
+
+    Open it before changing anything, so events caused by the change are
+    not missed.
+    """
+    def __init__(self, path):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(str(path))
+        self.buffer = b""
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    def scan(self, prefix):
+        """Consume buffered lines up to the first one starting with prefix"""
+        while b"\n" in self.buffer:
+            line, self.buffer = self.buffer.split(b"\n", 1)
+            if event_hook is not None:
+                event_hook(line.decode(errors='replace'))
+            if line.startswith(prefix):
+                return True
+        return False
+
+    def wait_for(self, event, timeout):
+        """Wait until an `event>>data` line arrives
+
+        Returns:
+            True if the event was seen before the timeout
+        """
+        deadline = time.monotonic() + timeout
+        prefix = event.encode() + b">>"
+        while True:
+            if self.scan(prefix):
+                return True
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            self.sock.settimeout(remaining)
+            try:
+                data = self.sock.recv(4096)
+            except socket.timeout:
+                return False
+            if not data:
+                return False
+            self.buffer += data
+
+    def poll(self, event):
+        """Read whatever has arrived without blocking, for main loop watches
+
+        Returns:
+            True once an `event>>data` line arrived, False if not yet,
+            None if Hyprland closed the socket
+        """
+        prefix = event.encode() + b">>"
+        self.sock.setblocking(False)
+        while True:
+            if self.scan(prefix):
+                return True
+            try:
+                data = self.sock.recv(4096)
+            except BlockingIOError:
+                return False
+            if not data:
+                return None
+            self.buffer += data
+
+    def close(self):
+        self.sock.close()
+
+def open_event_socket():
+    """Connect to Hyprland's event socket, or return None if unavailable"""
+    path = event_socket_path()
+    if path is None:
+        return None
+    try:
+        return HyprlandEvents(path)
+    except OSError as e:
+        print(f"Hyprland event socket unavailable: {e}")
+        return None
+
+HYPR_CONFIG = Path.home() / ".config" / "hypr" / "hyprland.conf"
+
+# Header lines older versions wrote into whichever file they edited
+MANAGED_HEADERS = (
+    '# Monitor configuration - Generated by HyprDisplays',
+    'This file is automatically managed by HyprDisplays'
+)
+
+def _strip_comment(line):
+    """Drop a trailing # comment (## is an escaped literal #)"""
+    out = []
+    i = 0
+    while i < len(line):
+        if line[i] == '#':
+            if line[i + 1:i + 2] == '#':
+                out.append('#')
+                i += 2
+                continue
+            break
+        out.append(line[i])
+        i += 1
+    return ''.join(out).strip()
+
+def parse_config_file(text):
+    """Find source= includes and monitor= lines in one config file
+
+    Returns:
+        (sources, monitors, headers): sources as (line number, raw path),
+        monitors as (line number, line text), headers as line numbers of
+        old HyprDisplays headers. Line numbers start at 1.
+    """
+    sources, monitors, headers = [], [], []
+    for number, line in enumerate(text.splitlines(), 1):
+        if any(header in line for header in MANAGED_HEADERS):
+            headers.append(number)
+            continue
+        stripped = _strip_comment(line)
+        key, sep, value = stripped.partition('=')
+        if not sep:
+            continue
+        key = key.strip()
+        if key == 'source':
+            sources.append((number, value.strip()))
+        elif key == 'monitor':
+            monitors.append((number, line.strip()))
+    return sources, monitors, headers
+
+class ConfigTree:
+    """Hyprland config files reachable from hyprland.conf through source= lines
+
+    Each file's parse is cached by mtime and size, so walking a large tree
+    again after a save only re-reads the files that changed.
+    """
+    def __init__(self, root=HYPR_CONFIG):
+        self.root = Path(root)
+        self.cache = {}  # path -> ((mtime, size), parse result)
+
+    def parse(self, path):
+        """Cached parse_config_file() of path, or None if it can't be read"""
+        try:
+            st = path.stat()
+        except OSError:
+            self.cache.pop(path, None)
+            return None
+        stamp = (st.st_mtime_ns, st.st_size)
+        cached = self.cache.get(path)
+        if cached and cached[0] == stamp:
+            return cached[1]
+        try:
+            result = parse_config_file(path.read_text())
+        except (OSError, UnicodeDecodeError):
+            return None
+        self.cache[path] = (stamp, result)
+        return result
+
+    def resolve_source(self, raw, including_file):
+        """Expand one source= value to the files it names (globs allowed)"""
+        pattern = os.path.expanduser(raw)
+        if not os.path.isabs(pattern):
+            # Relative includes are resolved against the including file's directory
+            pattern = str(including_file.parent / pattern)
+        if glob.has_magic(pattern):
+            return [Path(p) for p in sorted(glob.glob(pattern))]
+        return [Path(pattern)]
+
+    def files(self):
+        """Every file of the tree in the order Hyprland reads them"""
+        order = []
+        seen = set()
+
+        def visit(path):
+            key = path.resolve()
+            if key in seen:
+                return
+            seen.add(key)
+            parsed = self.parse(path)
+            if parsed is None:
+                return
+            order.append(path)
+            for _, raw in parsed[0]:
+                for included in self.resolve_source(raw, path):
+                    visit(included)
+
+        visit(self.root)
+        return order
+
+    def includes(self, path):
+        """Whether path is part of the tree"""
+        target = Path(path).resolve()
+        return any(f.resolve() == target for f in self.files())
+
+    def monitor_lines(self):
+        """Every monitor= rule as (file, line number, text), in read order"""
+        lines = []
+        for path in self.files():
+            _, monitors, _ = self.parse(path)
+            lines.extend((path, number, text) for number, text in monitors)
+        return lines
+
+    def lines_to_clean(self, managed_path):
+        """monitor= rules and stale headers outside the managed file
+
+        Returns:
+            Dict mapping file paths to sets of line numbers
+        """
+        managed = Path(managed_path).resolve()
+        edits = {}
+        for path in self.files():
+            if path.resolve() == managed:
+                continue
+            _, monitors, headers = self.parse(path)
+            numbers = {number for number, _ in monitors} | set(headers)
+            if numbers:
+                edits[path] = numbers
+        return edits
+
+def remove_lines(text, line_numbers):
+    """text without the given (1-based) lines, keeping every other byte as is"""
+    lines = text.splitlines(keepends=True)
+    return ''.join(line for number, line in enumerate(lines, 1) if number not in line_numbers)
+
+def monitor_description(info):
+    """Description Hyprland matches desc: rules against, or '' if unknown
+
+    Profiles saved by older versions have no description; it is rebuilt
+    from make, model and serial the way Hyprland composes it.
+    """
+    description = (info.get('description') or '').strip()
+    # Older Hyprland versions append the connector: "Make Model (DP-1)"
+    connector = f" ({info.get('name')})"
+    if description.endswith(connector):
+        description = description[:-len(connector)]
+    if not description:
+        make = (info.get('make') or '').strip()
+        model = (info.get('model') or '').strip()
+        serial = (info.get('serial') or '').strip()
+        if make or model:
+            description = ' '.join(part for part in (make, model, serial) if part)
+    # A comma would end the rule's first field
+    return '' if ',' in description else description
+
+def compile_monitor_rules(profiles, preferred_key=None, current_infos=()):
+    """Compile saved profiles into monitor=desc:... rules
+
+    Hyprland matches desc: rules itself on its first modeset, so a monitor
+    whose settings are the same in every profile it appears in gets its
+    layout at login without the daemon. Where profiles disagree, a single
+    rule can't express all of them: the rule comes from preferred_key's
+    profile (else the newest one) and the daemon corrects the rest.
+    A description shared by two outputs of one profile, or of the live
+    set in current_infos (identical panels without serials), can't tell
+    them apart and gets no rule at all; those outputs keep their
+    connector-name rules.
+
+    Returns:
+        (rules, ambiguous) where rules maps descriptions to rule values
+        (without "monitor=") and ambiguous lists descriptions whose
+        profiles disagree or that match more than one output
+    """
+    shared = set()
+    for infos in [entry.get('monitors_info', []) for entry in profiles.values()] + [list(current_infos)]:
+        counts = {}
+        for info in infos:
+            description = monitor_description(info)
+            if description:
+                counts[description] = counts.get(description, 0) + 1
+        shared.update(description for description, count in counts.items() if count > 1)
+
+    candidates = {}  # description -> {profile key: (saved_at, rule)}
+    for key, entry in profiles.items():
+        infos = {info.get('name'): info for info in entry.get('monitors_info', [])}
+        for name, config in entry.get('monitors', {}).items():
+            description = monitor_description(infos.get(name, {}))
+            if description and description not in shared:
+                rule = build_monitor_command(f"desc:{description}", config)
+                candidates.setdefault(description, {})[key] = (entry.get('saved_at', ''), rule)
+
+    rules = {}
+    ambiguous = sorted(shared)
+    for description, by_profile in sorted(candidates.items()):
+        distinct = {rule for _, rule in by_profile.values()}
+        if len(distinct) == 1:
+            rules[description] = distinct.pop()
+            continue
+        ambiguous.append(description)
+        if preferred_key in by_profile:
+            rules[description] = by_profile[preferred_key][1]
+        else:
+            rules[description] = max(by_profile.values())[1]
+    return rules, ambiguous
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+HyprDisplays DRM source - Kernel connector state and EDID identities
+
+Reads connector status and EDID straight from sysfs and listens for DRM
+uevents over netlink. This sees hotplugs before Hyprland has finished
+probing them, and gives a stable serial for monitors where Hyprland
+reports an empty one. Shared by the GUI and the daemon.
+"""
+
+import hashlib
+import socket
+import struct
+from pathlib import Path
+
+SYSFS_DRM = Path("/sys/class/drm")
+
+# linux/netlink.h
+NETLINK_KOBJECT_UEVENT = 15
+UEVENT_KERNEL_GROUP = 1
+
+EDID_HEADER = b"\x00\xff\xff\xff\xff\xff\xff\x00"
+
+# Display descriptor tags (EDID 1.4, section 3.10.3)
+DESCRIPTOR_SERIAL = 0xFF
+DESCRIPTOR_NAME = 0xFC
+
+def _descriptor_text(block):
+    """Decode the 13 byte text payload of a display descriptor"""
+    text = block[5:18].split(b"\n", 1)[0]
+    return text.decode('cp437', errors='replace').strip()
+
+def parse_edid(data):
+    """Parse the identity and geometry fields of an EDID base block
+
+    Args:
+        data: Raw EDID bytes as read from sysfs (128 bytes or more)
+
+    Returns:
+        Dict with manufacturer, product_code, serial, model, width_mm,
+        height_mm and preferred_mode, or None if data is not a valid EDID
+    """
+    if len(data) < 128 or data[:8] != EDID_HEADER:
+        return None
+
+    # Manufacturer ID: three 5-bit letters, big endian
+    mfg = struct.unpack(">H", data[8:10])[0]
+    manufacturer = "".join(chr(((mfg >> shift) & 0x1F) + ord('A') - 1) for shift in (10, 5, 0))
+    product_code, serial_number = struct.unpack("<HI", data[10:16])
+
+    # Screen size in cm, refined below from the first detailed timing (mm)
+    width_mm = data[21] * 10
+    height_mm = data[22] * 10
+
+    serial_text = ''
+    model = ''
+    preferred_mode = None
+
+    for offset in (54, 72, 90, 108):
+        block = data[offset:offset + 18]
+        pixel_clock = struct.unpack("<H", block[0:2])[0]
+
+        if pixel_clock:
+            # Detailed timing descriptor - the first one is the preferred mode
+            if preferred_mode is not None:
+                continue
+            h_active = block[2] | ((block[4] & 0xF0) << 4)
+            h_blank = block[3] | ((block[4] & 0x0F) << 8)
+            v_active = block[5] | ((block[7] & 0xF0) << 4)
+            v_blank = block[6] | ((block[7] & 0x0F) << 8)
+            h_total = h_active + h_blank
+            v_total = v_active + v_blank
+            refresh = pixel_clock * 10000 / (h_total * v_total) if h_total and v_total else 0.0
+            preferred_mode = {
+                'width': h_active,
+                'height': v_active,
+                'refresh': round(refresh, 3)
+            }
+            image_w = block[12] | ((block[14] & 0xF0) << 4)
+            image_h = block[13] | ((block[14] & 0x0F) << 8)
+            if image_w and image_h:
+                width_mm, height_mm = image_w, image_h
+        elif block[3] == DESCRIPTOR_SERIAL:
+            serial_text = _descriptor_text(block)
+        elif block[3] == DESCRIPTOR_NAME:
+            model = _descriptor_text(block)
+
+    # Prefer the text serial (what Hyprland shows), fall back to the numeric one
+    serial = serial_text or (str(serial_number) if serial_number else '')
+
+    return {
+        'manufacturer': manufacturer,
+        'product_code': product_code,
+        'serial': serial,
+        'serial_number': serial_number,
+        'model': model,
+        'width_mm': width_mm,
+        'height_mm': height_mm,
+        'preferred_mode': preferred_mode
+    }
+
+class EdidCache:
+    """Parsed EDIDs keyed by a hash of the raw blob"""
+    def __init__(self):
+        self.entries = {}
+
+    def lookup(self, data):
+        """Return parsed EDID for data, parsing it only the first time it is seen"""
+        edid_hash = hashlib.sha1(data).hexdigest()
+        if edid_hash not in self.entries:
+            parsed = parse_edid(data)
+            if parsed is not None:
+                parsed['hash'] = edid_hash
+            self.entries[edid_hash] = parsed
+        return self.entries[edid_hash]
+
+class DrmConnectorSource:
+    """Monitor source backed by /sys/class/drm
+
+    Args:
+        sysfs_root: DRM class directory, overridable to point at a fake tree
+    """
+    def __init__(self, sysfs_root=SYSFS_DRM):
+        self.sysfs_root = Path(sysfs_root)
+        self.edid_cache = EdidCache()
+
+    def scan(self):
+        """Read every connector's status and EDID
+
+        Returns:
+            Dict mapping connector name (e.g. "DP-1") to a dict with keys:
+            name, card, status, edid (parsed EDID or None)
+        """
+        connectors = {}
+        if not self.sysfs_root.is_dir():
+            return connectors
+
+        for entry in sorted(self.sysfs_root.glob("card*-*")):
+            try:
+                status = (entry / "status").read_text().strip()
+            except OSError:
+                continue
+
+            card, name = entry.name.split('-', 1)
+            edid = None
+            if status == 'connected':
+                try:
+                    data = (entry / "edid").read_bytes()
+                except OSError:
+                    data = b''
+                if data:
+                    edid = self.edid_cache.lookup(data)
+
+            connectors[name] = {
+                'name': name,
+                'card': card,
+                'status': status,
+                'edid': edid
+            }
+        return connectors
+
+    def connected_names(self, connectors=None):
+        """Names of connectors the kernel reports as connected"""
+        if connectors is None:
+            connectors = self.scan()
+        return {name for name, c in connectors.items() if c['status'] == 'connected'}
+
+    def enrich(self, monitors_info, connectors=None):
+        """Fill identity gaps in Hyprland monitor info from EDID
+
+        Hyprland often leaves serial (and sometimes make/model) empty. The
+        EDID values are stored under separate edid_* keys so the original
+        Hyprland fields stay untouched.
+        """
+        if connectors is None:
+            connectors = self.scan()
+        for monitor in monitors_info:
+            connector = connectors.get(monitor.get('name'))
+            if not connector or not connector['edid']:
+                continue
+            edid = connector['edid']
+            monitor['edid_make'] = edid['manufacturer']
+            monitor['edid_model'] = edid['model'] or f"{edid['product_code']:04X}"
+            monitor['edid_serial'] = edid['serial']
+        return monitors_info
+
+def parse_uevent(data):
+    """Parse a kernel uevent datagram into a dict of its KEY=VALUE fields"""
+    fields = data.split(b"\0")
+    event = {}
+    if fields and b"@" in fields[0] and b"=" not in fields[0]:
+        action, devpath = fields.pop(0).decode(errors='replace').split("@", 1)
+        event['ACTION'] = action
+        event['DEVPATH'] = devpath
+    for field in fields:
+        if b"=" in field:
+            key, value = field.decode(errors='replace').split("=", 1)
+            event[key] = value
+    return event
+
+class UeventMonitor:
+    """Kernel uevent listener filtered to the drm subsystem
+
+    Use fileno() with select() to wait for hotplugs, then read_events().
+    """
+    def __init__(self):
+        self.sock = socket.socket(socket.AF_NETLINK, socket.SOCK_DGRAM, NETLINK_KOBJECT_UEVENT)
+        self.sock.setblocking(False)
+        # Port 0 lets the kernel pick a unique id for this socket
+        self.sock.bind((0, UEVENT_KERNEL_GROUP))
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    def read_events(self):
+        """Drain pending uevents and return the drm ones"""
+        events = []
+        while True:
+            try:
+                data = self.sock.recv(8192)
+            except (BlockingIOError, InterruptedError):
+                break
+            event = parse_uevent(data)
+            if event.get('SUBSYSTEM') == 'drm':
+                events.append(event)
+        return events
+
+    def close(self):
+        self.sock.close()
+
+def open_uevent_monitor():
+    """Open a UeventMonitor, or return None where netlink is unavailable"""
+    if not hasattr(socket, 'AF_NETLINK'):
+        return None
+    try:
+        return UeventMonitor()
+    except OSError as e:
+        print(f"DRM uevents unavailable, falling back to polling: {e}")
+        return None
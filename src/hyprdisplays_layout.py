@@ -0,0 +1,451 @@
+#!/usr/bin/env python3
+"""
+HyprDisplays layout graph - Edge contacts between monitors
+
+Monitors are plain rectangles keyed by name: {name: (x, y, width, height)}
+in logical pixels. Two monitors are adjacent when an edge of one lies on an
+edge of the other (within a small tolerance) and the edges overlap along
+their length - the same touching rule the canvas uses when snapping a drag.
+Shared by the GUI and the daemon. LayoutHistory, the GUI's undo/redo of
+layout edits, lives here too so it can be used without GTK.
+"""
+
+import heapq
+from collections import deque
+
+from hyprdisplays_apply import config_rect
+
+CONTACT_TOLERANCE = 5
+
+# Side of the first monitor that the second one touches
+OPPOSITE = {'left': 'right', 'right': 'left', 'top': 'bottom', 'bottom': 'top'}
+
+# Axis a side lies on (0 = x, 1 = y) and the direction it faces along it
+SIDE_AXIS = {'left': (0, -1), 'right': (0, 1), 'top': (1, -1), 'bottom': (1, 1)}
+
+def contact_side(a, b, tolerance=CONTACT_TOLERANCE):
+    """Return which side of rect a touches rect b, or None"""
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+
+    # Edges must overlap along their length, a shared corner is not a contact
+    overlap_y = min(ay + ah, by + bh) - max(ay, by)
+    overlap_x = min(ax + aw, bx + bw) - max(ax, bx)
+
+    if overlap_y > 0:
+        if abs(ax + aw - bx) < tolerance:
+            return 'right'
+        if abs(bx + bw - ax) < tolerance:
+            return 'left'
+    if overlap_x > 0:
+        if abs(ay + ah - by) < tolerance:
+            return 'bottom'
+        if abs(by + bh - ay) < tolerance:
+            return 'top'
+    return None
+
+def sweep_pairs(rects, tolerance=0):
+    """Yield pairs of monitors whose horizontal extents meet
+
+    Sweeps a vertical line left to right, keeping only the monitors it
+    currently crosses, so only pairs that can touch or overlap are
+    compared instead of all n^2.
+    """
+    active = []  # heap of (right edge, name)
+    for name in sorted(rects, key=lambda n: rects[n][0]):
+        x, _, width, _ = rects[name]
+        while active and active[0][0] + tolerance <= x:
+            heapq.heappop(active)
+        for _, other in active:
+            yield other, name
+        heapq.heappush(active, (x + width, name))
+
+def build_adjacency(rects, tolerance=CONTACT_TOLERANCE):
+    """Build the contact graph of a layout
+
+    Returns:
+        Dict mapping every name to a list of (neighbour, side) pairs, where
+        side is the side of that monitor the neighbour touches
+    """
+    graph = {name: [] for name in rects}
+    for a, b in sweep_pairs(rects, tolerance):
+        side = contact_side(rects[a], rects[b], tolerance)
+        if side:
+            graph[a].append((b, side))
+            graph[b].append((a, OPPOSITE[side]))
+    return graph
+
+def reachable(graph, start, blocked=()):
+    """Names reachable from start without passing through blocked ones"""
+    seen = {start}
+    queue = deque([start])
+    while queue:
+        for neighbour, _ in graph[queue.popleft()]:
+            if neighbour not in seen and neighbour not in blocked:
+                seen.add(neighbour)
+                queue.append(neighbour)
+    return seen
+
+def propagate_resize(rects, changed, new_size, root=None, tolerance=CONTACT_TOLERANCE):
+    """Work out where monitors go when one of them changes size
+
+    The part of the layout holding root (normally the primary) stays where
+    it is, and the resized monitor keeps its contact with it. Everything
+    that only hangs off the resized monitor moves with the edge it touches,
+    however long the chain. The width change only enters through left and
+    right contacts and the height change through top and bottom ones; a
+    monitor pushed by several neighbours takes the largest move on each
+    axis, so a grid stays a grid whichever neighbour is reached first.
+
+    Args:
+        rects: {name: (x, y, width, height)} with the OLD size of changed
+        changed: Name of the resized monitor
+        new_size: (width, height) of changed after the resize
+        root: Name of the monitor that must not move (defaults to changed)
+
+    Returns:
+        Dict {name: (x, y)} of new positions, only for monitors that move
+    """
+    if changed not in rects:
+        return {}
+
+    old_w, old_h = rects[changed][2:]
+    new_w, new_h = new_size
+    dx = new_w - old_w
+    dy = new_h - old_h
+    graph = build_adjacency(rects, tolerance)
+
+    # Monitors still connected to root once the resized one is taken out
+    anchored = set()
+    if root is not None and root != changed and root in rects:
+        anchored = reachable(graph, root, blocked={changed})
+
+    # Grow away from the anchored side: if root's part of the layout holds
+    # the right (bottom) edge, that edge stays put and the left (top) one moves
+    anchored_sides = {side for neighbour, side in graph[changed] if neighbour in anchored}
+    shift_x = -dx if 'right' in anchored_sides and 'left' not in anchored_sides else 0
+    shift_y = -dy if 'bottom' in anchored_sides and 'top' not in anchored_sides else 0
+
+    # How far each edge of the resized monitor moves
+    edge_offset = {
+        'left': (shift_x, shift_y),
+        'right': (shift_x + dx, shift_y),
+        'top': (shift_x, shift_y),
+        'bottom': (shift_x, shift_y + dy),
+    }
+
+    # Breadth first from the resized monitor, one (offset, direction) per axis:
+    # its direct neighbours take the offset of the edge they touch, monitors
+    # further out the offsets of the moved neighbours they touch. Across a
+    # left/right contact the x offset only travels onward (never back towards
+    # the resized monitor), the y offset along with it; likewise for y across
+    # top/bottom contacts. Several pushes merge per axis, the largest wins, and
+    # a monitor is revisited only when one of its offsets grows
+    moved = {changed: ((shift_x, 0), (shift_y, 0))}
+    fixed = anchored | {changed}
+    queue = deque()
+
+    def carried(name, side):
+        axis, direction = SIDE_AXIS[side]
+        if name == changed:
+            values = edge_offset[side]
+            return tuple((values[a], direction if a == axis else 0) for a in (0, 1))
+        carry = []
+        for a, state in enumerate(moved[name]):
+            if a != axis or state is None:
+                carry.append(state)
+            else:
+                offset, travel = state
+                carry.append((offset, direction) if travel in (0, direction) else None)
+        return tuple(carry)
+
+    def push(name, incoming):
+        current = moved.get(name, (None, None))
+        merged = tuple(new if new is not None and (old is None or abs(new[0]) > abs(old[0])) else old
+                       for old, new in zip(current, incoming))
+        if merged != current:
+            moved[name] = merged
+            queue.append(name)
+
+    for neighbour, side in graph[changed]:
+        if neighbour not in fixed:
+            push(neighbour, carried(changed, side))
+    while queue:
+        name = queue.popleft()
+        for other, side in graph[name]:
+            if other not in fixed:
+                push(other, carried(name, side))
+
+    offsets = {name: tuple(axis[0] if axis else 0 for axis in state) for name, state in moved.items()}
+    moves = {}
+    for name, (ox, oy) in offsets.items():
+        if abs(ox) < 1 and abs(oy) < 1:
+            continue
+        rx, ry = rects[name][:2]
+        moves[name] = (int(round(rx + ox)), int(round(ry + oy)))
+    return moves
+
+LAYOUT_GOALS = ('connector', 'bottom', 'center')
+
+def connector_order(names):
+    """Sort connector names naturally (DP-2 before DP-10)"""
+    def key(name):
+        prefix, _, index = name.rpartition('-')
+        return (prefix, int(index)) if index.isdigit() else (name, 0)
+    return sorted(names, key=key)
+
+def solve_layout(sizes, goal='connector', primary=None):
+    """Arrange monitors into a gap-free, non-overlapping row
+
+    Goals:
+        connector: left to right by connector order, tops aligned
+        bottom:    left to right by connector order, bottoms aligned
+        center:    primary in the middle, the rest alternating right and
+                   left of it in connector order, vertically centred
+
+    Every monitor touches its neighbour along a shared edge, so the result
+    passes the same touching rule as a drag on the canvas.
+
+    Alignment is in logical (scaled) pixels, not physical size: 'bottom'
+    lines up the bottoms of the layout rectangles. With mixed DPI the same
+    logical height is a different physical height on each panel, so the
+    pointer crosses a shared edge at a different physical height than it
+    left; the EDID sizes can't fix that without knowing how high each
+    panel stands.
+
+    Args:
+        sizes: {name: (width, height)} logical sizes
+        goal: One of LAYOUT_GOALS
+        primary: Monitor to put at 0x0 (defaults to the leftmost one)
+
+    Returns:
+        Dict {name: (x, y)} of integer positions
+    """
+    if goal not in LAYOUT_GOALS:
+        raise ValueError(f"Unknown layout goal: {goal}")
+    if not sizes:
+        return {}
+
+    sizes = {name: (int(round(w)), int(round(h))) for name, (w, h) in sizes.items()}
+    order = connector_order(sizes)
+    if primary not in sizes:
+        primary = None
+
+    if goal == 'center' and primary:
+        others = [name for name in order if name != primary]
+        # Alternate right, left, right... outwards from the primary
+        right = others[0::2]
+        left = others[1::2]
+        order = left[::-1] + [primary] + right
+
+    tallest = max(h for _, h in sizes.values())
+    positions = {}
+    x = 0
+    for name in order:
+        width, height = sizes[name]
+        if goal == 'connector':
+            y = 0
+        elif goal == 'bottom':
+            y = tallest - height
+        else:
+            y = (tallest - height) // 2
+        positions[name] = (x, y)
+        x += width
+
+    # Hyprland and the GUI expect the primary at the origin
+    origin = positions[primary] if primary else positions[order[0]]
+    min_y = min(y for _, y in positions.values())
+    if not primary:
+        origin = (origin[0], min_y)
+    return {name: (x - origin[0], y - origin[1]) for name, (x, y) in positions.items()}
+
+class UnionFind:
+    """Disjoint sets of monitor names with path halving and union by size"""
+    def __init__(self, items):
+        self.parent = {item: item for item in items}
+        self.size = {item: 1 for item in self.parent}
+
+    def find(self, item):
+        parent = self.parent
+        while parent[item] != item:
+            parent[item] = parent[parent[item]]
+            item = parent[item]
+        return item
+
+    def union(self, a, b):
+        a, b = self.find(a), self.find(b)
+        if a == b:
+            return
+        if self.size[a] < self.size[b]:
+            a, b = b, a
+        self.parent[b] = a
+        self.size[a] += self.size[b]
+
+    def groups(self):
+        groups = {}
+        for item in self.parent:
+            groups.setdefault(self.find(item), []).append(item)
+        return list(groups.values())
+
+def profile_rects(profile, displays_data=None):
+    """Layout rectangles of the monitors a profile places
+
+    Disabled, mirrored and preferred/auto entries have no fixed position
+    and are left out.
+    """
+    current = {d.get('name'): d for d in displays_data or []}
+    rects = {}
+    for name, config in profile.items():
+        if config.get('disabled') or config.get('mirror') or config.get('preferred'):
+            continue
+        rect = config_rect(config, current.get(name))
+        if rect is not None:
+            rects[name] = rect
+    return rects
+
+def validate_layout(rects, tolerance=CONTACT_TOLERANCE):
+    """Find overlapping monitors and islands that touch nothing else
+
+    Overlaps come from the sweep line; contacts found on the same sweep
+    feed a union-find, so the whole check is O(n log n + k) for k
+    candidate pairs.
+
+    Returns:
+        Dict with 'overlaps' (list of (a, b) name pairs) and 'islands'
+        (list of name lists, empty when the layout is one connected piece)
+    """
+    overlaps = []
+    contacts = UnionFind(rects)
+    for a, b in sweep_pairs(rects, tolerance):
+        ax, ay, aw, ah = rects[a]
+        bx, by, bw, bh = rects[b]
+        # Ignore sub-pixel overlap from fractional logical sizes
+        dx = min(ax + aw, bx + bw) - max(ax, bx)
+        dy = min(ay + ah, by + bh) - max(ay, by)
+        if dx > 1 and dy > 1:
+            overlaps.append((a, b))
+            contacts.union(a, b)
+        elif contact_side(rects[a], rects[b], tolerance):
+            contacts.union(a, b)
+
+    groups = contacts.groups()
+    islands = sorted((sorted(g) for g in groups), key=len, reverse=True) if len(groups) > 1 else []
+    return {'overlaps': overlaps, 'islands': islands}
+
+def describe_layout_problems(report):
+    """Human readable lines for a validate_layout report"""
+    problems = [f"{a} overlaps {b}" for a, b in report['overlaps']]
+    if report['islands']:
+        # The largest group is the main layout, the rest are cut off from it
+        for island in report['islands'][1:]:
+            problems.append(f"{', '.join(island)} not touching the rest of the layout")
+    return problems
+
+class LayoutHistory:
+    """Undo/redo stack of compact per-monitor layout deltas
+
+    Each entry holds only the fields that changed, as
+    (monitor, field, old, new) tuples. The total number of stored field
+    changes is capped at max_changes; the oldest entries are dropped first.
+    """
+    FIELDS = ('x', 'y', 'scale', 'transform', 'enabled')
+
+    def __init__(self, max_changes=2000):
+        self.max_changes = max_changes
+        self.undo_stack = deque()
+        self.redo_stack = []
+        self.size = 0
+        self.state = {}
+        self.applying = False  # True while undo/redo writes to the widgets
+
+    @staticmethod
+    def capture(rows):
+        """Current tracked fields of every row, keyed by monitor name"""
+        return {
+            row.display.name: (
+                int(row.x_spin.get_value()),
+                int(row.y_spin.get_value()),
+                round(row.scale_spin.get_value(), 6),
+                row.transform_combo.get_active(),
+                row.enabled_check.get_active()
+            )
+            for row in rows
+        }
+
+    def reset(self, rows):
+        """Forget all history and start from the current layout"""
+        self.undo_stack.clear()
+        self.redo_stack.clear()
+        self.size = 0
+        self.state = self.capture(rows)
+
+    def record(self, rows):
+        """Push the difference since the last recorded layout, if any"""
+        if self.applying:
+            return False
+
+        new_state = self.capture(rows)
+        delta = tuple(
+            (name, field, old[field], new[field])
+            for name, new in new_state.items()
+            for old in [self.state.get(name)] if old
+            for field in range(len(self.FIELDS)) if old[field] != new[field]
+        )
+        self.state = new_state
+        if not delta:
+            return False
+
+        self.size -= sum(len(d) for d in self.redo_stack)
+        self.redo_stack.clear()
+        self.undo_stack.append(delta)
+        self.size += len(delta)
+        while self.size > self.max_changes and len(self.undo_stack) > 1:
+            self.size -= len(self.undo_stack.popleft())
+        return True
+
+    def can_undo(self):
+        return bool(self.undo_stack)
+
+    def can_redo(self):
+        return bool(self.redo_stack)
+
+    def undo(self, rows):
+        if not self.undo_stack:
+            return False
+        delta = self.undo_stack.pop()
+        self.apply(rows, delta, use_new=False)
+        self.redo_stack.append(delta)
+        return True
+
+    def redo(self, rows):
+        if not self.redo_stack:
+            return False
+        delta = self.redo_stack.pop()
+        self.apply(rows, delta, use_new=True)
+        self.undo_stack.append(delta)
+        return True
+
+    def apply(self, rows, delta, use_new):
+        """Write one side of a delta back into the row widgets"""
+        by_name = {row.display.name: row for row in rows}
+        self.applying = True
+        try:
+            # Size fields first, positions last so nothing shifts them afterwards
+            for name, field, old, new in sorted(delta, key=lambda c: c[1] < 2):
+                row = by_name.get(name)
+                if row is None:
+                    continue
+                value = new if use_new else old
+                if field == 0:
+                    row.x_spin.set_value(value)
+                elif field == 1:
+                    row.y_spin.set_value(value)
+                elif field == 2:
+                    row.scale_spin.set_value(value)
+                elif field == 3:
+                    row.transform_combo.set_active(value)
+                else:
+                    row.enabled_check.set_active(value)
+        finally:
+            self.applying = False
+        self.state = self.capture(rows)
@@ -0,0 +1,495 @@
+#!/usr/bin/env python3
+"""
+HyprDisplays profile keys - Compact hashed keys for saved profiles
+
+A profile is identified by the canonical identity of its monitor set
+("name|make|model|serial" per monitor, sorted, joined with ";;"). That
+string grows with every monitor, so profiles are keyed by a short digest
+of it instead and the identity is stored once, inside the profile. Keys
+are checked against the stored identity, so a digest collision gets the
+next free slot rather than overwriting another profile. Shared by the GUI
+and the daemon.
+"""
+
+import fcntl
+from bisect import bisect_left
+import hashlib
+import json
+import os
+import tempfile
+from collections import deque
+from datetime import datetime, timedelta
+from pathlib import Path
+
+KEY_DIGEST_SIZE = 8  # bytes, 16 hex characters
+
+# Saved configurations kept in the profile history
+HISTORY_LIMIT = 50
+
+# Read-only profiles shipped by the administrator, one or more files in the
+# same format as the user's hyprdisplays_profiles.json
+SYSTEM_PROFILES_DIR = Path("/etc/xdg/hyprdisplays/profiles.d")
+
+# Limits of the user profile store; a "retention" object in the profile file
+# overrides them (null switches a limit off)
+RETENTION_DEFAULTS = {
+    "max_profiles": 200,
+    "max_age_days": None,
+    "max_bytes": 1024 * 1024
+}
+
+# last_used only orders profiles for eviction, so it is rewritten at most this often
+LAST_USED_RESOLUTION = timedelta(hours=1)
+
+def monitor_identity(monitors_info, use_edid=True):
+    """Canonical identity string of a monitor set
+
+    Args:
+        monitors_info: List of dicts with keys: name, make, model, serial
+            (plus optional edid_make, edid_model, edid_serial)
+        use_edid: Fill empty make/model/serial from the EDID values
+
+    Returns:
+        String that uniquely identifies this monitor setup
+    """
+    monitor_ids = []
+    for monitor in monitors_info:
+        # Use make, model, serial to uniquely identify the physical monitor
+        make = monitor.get('make', '').strip()
+        model = monitor.get('model', '').strip()
+        serial = monitor.get('serial', '').strip()
+        name = monitor.get('name', 'unknown')
+
+        # Hyprland often reports an empty serial, which makes identical
+        # monitors indistinguishable - fill the gaps from the EDID
+        if use_edid:
+            make = make or monitor.get('edid_make', '')
+            model = model or monitor.get('edid_model', '')
+            serial = serial or monitor.get('edid_serial', '')
+
+        # Fall back to just the connector name for monitors without details
+        if make or model or serial:
+            monitor_ids.append(f"{name}|{make}|{model}|{serial}")
+        else:
+            monitor_ids.append(name)
+
+    # Sort to ensure consistency regardless of detection order
+    return ";;".join(sorted(monitor_ids))
+
+def identity_key(identity):
+    """Fixed-length digest of an identity, used as the profile key"""
+    return hashlib.blake2b(identity.encode(), digest_size=KEY_DIGEST_SIZE).hexdigest()
+
+def _probe_keys(identity):
+    """Candidate keys for an identity: the digest, then digest-1, digest-2..."""
+    key = identity_key(identity)
+    yield key
+    n = 1
+    while True:
+        yield f"{key}-{n}"
+        n += 1
+
+def _highest_suffix(profiles, key):
+    """Largest n with a profile stored under key-n (0 if there is none)"""
+    prefix = f"{key}-"
+    return max((int(k[len(prefix):]) for k in profiles
+                if k.startswith(prefix) and k[len(prefix):].isdigit()), default=0)
+
+def find_profile_key(profiles, identity):
+    """Key of the stored profile for identity, or None
+
+    Deleting a profile leaves a gap in its collision chain, so probing goes
+    on past empty slots up to the highest suffix in use for the digest.
+    """
+    highest = None
+    for n, key in enumerate(_probe_keys(identity)):
+        entry = profiles.get(key)
+        if entry is None:
+            if highest is None:
+                highest = _highest_suffix(profiles, identity_key(identity))
+            if n >= highest:
+                return None
+        elif entry.get('identity') == identity:
+            return key
+
+def profile_key_for(profiles, identity):
+    """Key to store identity's profile under (existing one or first free slot)"""
+    key = find_profile_key(profiles, identity)
+    if key is not None:
+        return key
+    for key in _probe_keys(identity):
+        if key not in profiles:
+            return key
+
+def migrate_profiles(data):
+    """Re-key legacy profiles in place
+
+    Old files key every profile by its full identity and repeat it (plus the
+    monitor list) in each history entry. Profiles move to hashed keys with
+    the identity stored inside them, and history entries keep only the key.
+
+    Returns:
+        True if anything changed (the caller should write the file back)
+    """
+    profiles = data.setdefault('profiles', {})
+    renamed = {}
+    for old_key in [k for k, entry in profiles.items() if 'identity' not in entry]:
+        entry = profiles.pop(old_key)
+        entry['identity'] = old_key
+        new_key = profile_key_for(profiles, old_key)
+        profiles[new_key] = entry
+        renamed[old_key] = new_key
+
+    history = data.setdefault('history', [])
+    changed = bool(renamed)
+    for item in history:
+        fingerprint = item.get('fingerprint')
+        if fingerprint in renamed:
+            item['fingerprint'] = renamed[fingerprint]
+            changed = True
+        if 'monitors_info' in item:
+            # Already stored once in the profile itself
+            del item['monitors_info']
+            changed = True
+    return changed
+
+def _stat_key(path):
+    """(mtime, size) of a file, or None if it does not exist"""
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+class ProfileIndex:
+    """Merged view of the system profile layer and the user profiles
+
+    System files are applied in name order, later files overriding earlier
+    ones, and user profiles override all of them. The merge is done once
+    and kept until a layer changes on disk, so a lookup is a single dict
+    access however many layers there are.
+
+    The system directory is only listed again when its mtime changes, so a
+    lookup costs two stats. Files there are expected to be installed or
+    replaced by rename (package managers, most editors); an in-place edit
+    shows up with the next change to the directory.
+
+    Args:
+        user_path: The user's hyprdisplays_profiles.json
+        system_dir: Directory of read-only *.json profile files
+    """
+    def __init__(self, user_path, system_dir=SYSTEM_PROFILES_DIR):
+        self.user_path = Path(user_path)
+        self.system_dir = Path(system_dir)
+        self.system_profiles = {}
+        self.profiles = {}
+        self.signature = None
+        self.system_dir_key = None
+        self.system_files = ()
+
+    def layer_signature(self):
+        """(system files with their mtimes and sizes, user file mtime and size)"""
+        dir_key = _stat_key(self.system_dir)
+        if dir_key != self.system_dir_key:
+            files = sorted(self.system_dir.glob("*.json")) if dir_key else []
+            self.system_files = tuple((f.name, _stat_key(f)) for f in files)
+            self.system_dir_key = dir_key
+        return (self.system_files, _stat_key(self.user_path))
+
+    def user_changed(self, signature):
+        """True if the user file changed on disk since the last rebuild"""
+        return self.signature is not None and signature[1] != self.signature[1]
+
+    def load_system_profiles(self, signature):
+        profiles = {}
+        for name, _ in signature[0]:
+            try:
+                with open(self.system_dir / name, 'r') as f:
+                    data = json.load(f)
+                migrate_profiles(data)
+                profiles.update(data.get("profiles", {}))
+            except Exception as e:
+                print(f"Error loading system profiles {self.system_dir / name}: {e}")
+        return profiles
+
+    def rebuild(self, user_data, signature):
+        """Merge the layers again, re-reading system files only if they changed"""
+        if self.signature is None or signature[0] != self.signature[0]:
+            self.system_profiles = self.load_system_profiles(signature)
+        self.profiles = {**self.system_profiles, **user_data.get("profiles", {})}
+        self.signature = signature
+
+    def is_system(self, key):
+        """True if key comes from the system layer and the user has not overridden it"""
+        return key in self.system_profiles and self.profiles.get(key) is self.system_profiles[key]
+
+def write_json_atomic(path, data):
+    """Replace path with data without readers ever seeing a partial file
+
+    The JSON goes to a temporary file in the same directory, is flushed to
+    disk, and then renamed over the target, which is atomic on POSIX.
+    """
+    path = Path(path)
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=path.parent)
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+    # Make the rename itself durable
+    try:
+        dir_fd = os.open(path.parent, os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+    except OSError:
+        pass
+
+def merge_profiles(disk, ours, changed_keys=(), deleted_keys=()):
+    """Combine a profile file that changed on disk with our edits to it
+
+    Profiles we saved or deleted since loading win; everything else is
+    taken from disk. Histories are merged and kept newest first.
+    """
+    merged = dict(disk)
+    profiles = dict(disk.get("profiles", {}))
+    for key in changed_keys:
+        if key in ours.get("profiles", {}):
+            profiles[key] = ours["profiles"][key]
+    for key in deleted_keys:
+        profiles.pop(key, None)
+    merged["profiles"] = profiles
+
+    seen = set()
+    history = []
+    for item in disk.get("history", []) + ours.get("history", []):
+        marker = (item.get("fingerprint"), item.get("saved_at"))
+        if item.get("fingerprint") in deleted_keys:
+            continue
+        if marker not in seen:
+            seen.add(marker)
+            history.append(item)
+    history.sort(key=lambda item: item.get("saved_at") or "", reverse=True)
+    merged["history"] = history[:HISTORY_LIMIT]
+    return merged
+
+def last_used(entry):
+    """When a profile was last applied (or saved, for profiles never applied)"""
+    return entry.get("last_used") or entry.get("saved_at") or ""
+
+def retention_policy(data):
+    """Retention limits of a profile file, RETENTION_DEFAULTS for any field not set validly
+
+    A limit is a non-negative number or null; anything else (a string, a
+    negative number, a non-object "retention") is ignored.
+    """
+    overrides = data.get("retention")
+    if not isinstance(overrides, dict):
+        overrides = {}
+    policy = dict(RETENTION_DEFAULTS)
+    for field in policy:
+        if field not in overrides:
+            continue
+        value = overrides[field]
+        if value is None or (isinstance(value, (int, float)) and not isinstance(value, bool) and value >= 0):
+            policy[field] = value
+        else:
+            print(f"Ignoring invalid retention setting {field}={value!r}")
+    return policy
+
+def evict_profiles(data, now=None):
+    """Drop the least recently used profiles beyond the retention limits
+
+    Profiles older than max_age_days go first, then the least recently used
+    until both max_profiles and max_bytes (approximate JSON size of the
+    profiles) are met. Pinned profiles are never evicted, but still count
+    towards the limits.
+
+    Returns:
+        Keys of the evicted profiles
+    """
+    policy = retention_policy(data)
+    profiles = data.get("profiles", {})
+    candidates = deque(sorted((key for key, entry in profiles.items() if not entry.get("pinned")),
+                              key=lambda key: last_used(profiles[key])))
+    evicted = []
+
+    if policy["max_age_days"] is not None:
+        cutoff = ((now or datetime.now()) - timedelta(days=policy["max_age_days"])).isoformat()
+        while candidates and last_used(profiles[candidates[0]]) < cutoff:
+            evicted.append(candidates.popleft())
+
+    sizes = {key: len(json.dumps(entry)) for key, entry in profiles.items()}
+    count = len(profiles) - len(evicted)
+    total = sum(sizes.values()) - sum(sizes[key] for key in evicted)
+    max_profiles = policy["max_profiles"]
+    max_bytes = policy["max_bytes"]
+    while candidates and ((max_profiles is not None and count > max_profiles) or
+                          (max_bytes is not None and total > max_bytes)):
+        key = candidates.popleft()
+        evicted.append(key)
+        count -= 1
+        total -= sizes[key]
+
+    for key in evicted:
+        del profiles[key]
+    if evicted:
+        gone = set(evicted)
+        data["history"] = [item for item in data.get("history", []) if item.get("fingerprint") not in gone]
+    return evicted
+
+def save_profiles_file(path, data, base_version, changed_keys=(), deleted_keys=()):
+    """Write the profile file, merging in changes another process saved meanwhile
+
+    Every write bumps data["version"]. If the file on disk no longer has
+    the version data was loaded at, someone else saved in between and
+    their profiles are merged with ours instead of being overwritten.
+    Profiles beyond the retention limits are evicted before writing.
+    Writers serialise on a lock file; readers never wait.
+
+    Args:
+        path: Profile file
+        data: Our full copy of the file
+        base_version: data["version"] when it was loaded
+        changed_keys: Profiles we added or modified since loading
+        deleted_keys: Profiles we removed since loading
+
+    Returns:
+        The data that was written (merged if there was a conflict)
+    """
+    path = Path(path)
+    lock_path = path.with_name(path.name + ".lock")
+    with open(lock_path, 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            disk = None
+            try:
+                with open(path, 'r') as f:
+                    disk = json.load(f)
+            except (OSError, ValueError):
+                pass
+
+            disk_version = disk.get("version", 0) if isinstance(disk, dict) else 0
+            if disk is not None and disk_version != base_version:
+                print(f"Profiles changed on disk (version {base_version} -> {disk_version}), merging")
+                migrate_profiles(disk)
+                data = merge_profiles(disk, data, changed_keys, deleted_keys)
+
+            evicted = evict_profiles(data)
+            if evicted:
+                print(f"Evicted {len(evicted)} least recently used profile(s)")
+            data = dict(data, version=disk_version + 1)
+            write_json_atomic(path, data)
+            return data
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+def mark_profile_used(path, key, when=None):
+    """Record on disk that a profile was just applied
+
+    Only the last_used stamp of that one profile changes, so a process
+    holding an older copy of the file never writes it back. A stamp less
+    than LAST_USED_RESOLUTION old is left as it is, so frequent hotplugs
+    don't rewrite the file each time.
+
+    Returns:
+        True if the profile was found and stamped (or recently enough)
+    """
+    path = Path(path)
+    lock_path = path.with_name(path.name + ".lock")
+    with open(lock_path, 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            try:
+                with open(path, 'r') as f:
+                    disk = json.load(f)
+            except (OSError, ValueError):
+                return False
+            migrate_profiles(disk)
+            entry = disk.get("profiles", {}).get(key)
+            if entry is None:
+                return False
+            when = when or datetime.now().isoformat()
+            try:
+                age = datetime.fromisoformat(when) - datetime.fromisoformat(entry["last_used"])
+                if timedelta(0) <= age < LAST_USED_RESOLUTION:
+                    return True
+            except (KeyError, TypeError, ValueError):
+                pass
+            entry["last_used"] = when
+            evict_profiles(disk)
+            disk["version"] = disk.get("version", 0) + 1
+            write_json_atomic(path, disk)
+            return True
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+def export_profiles(path, profiles, keys):
+    """Write the given profiles to a standalone file in the profile file format
+
+    The file can be dropped into SYSTEM_PROFILES_DIR on another machine or
+    checked with hyprdisplays-audit.
+    """
+    write_json_atomic(path, {"profiles": {key: profiles[key] for key in keys if key in profiles},
+                             "history": []})
+
+# Monitor fields a profile can be searched by
+SEARCH_FIELDS = ('name', 'make', 'model', 'serial', 'edid_make', 'edid_model', 'edid_serial')
+
+class ProfileSearchIndex:
+    """Prefix search over saved profiles by monitor details and save date
+
+    Each profile is split into lowercase tokens once (connector, make,
+    model, serial, key and the saved date). Tokens are kept sorted, so a
+    query term finds every token starting with it by bisection instead of
+    scanning all profiles; the matches of all terms are intersected.
+    """
+    def __init__(self, profiles=None):
+        self.rebuild(profiles or {})
+
+    @staticmethod
+    def profile_tokens(key, entry):
+        tokens = {key}
+        for info in entry.get('monitors_info', []):
+            for field in SEARCH_FIELDS:
+                tokens.update(str(info.get(field) or '').lower().split())
+        # "2026-10-19" is found by "2026", "2026-10" and the full date
+        date = (entry.get('saved_at') or '')[:10]
+        if date:
+            tokens.add(date)
+        return tokens
+
+    def rebuild(self, profiles):
+        postings = {}
+        for key, entry in profiles.items():
+            for token in self.profile_tokens(key, entry):
+                postings.setdefault(token, set()).add(key)
+        self.postings = postings
+        self.tokens = sorted(postings)
+        # Newest first, like the history
+        self.order = sorted(profiles, key=lambda k: profiles[k].get('saved_at') or '', reverse=True)
+
+    def search(self, query):
+        """Keys of profiles matching every term of query, newest first"""
+        terms = query.lower().split()
+        if not terms:
+            return list(self.order)
+        matches = None
+        for term in terms:
+            keys = set()
+            i = bisect_left(self.tokens, term)
+            while i < len(self.tokens) and self.tokens[i].startswith(term):
+                keys |= self.postings[self.tokens[i]]
+                i += 1
+            matches = keys if matches is None else matches & keys
+            if not matches:
+                return []
+        return [key for key in self.order if key in matches]
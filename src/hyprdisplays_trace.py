@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+HyprDisplays traces - Record and replay what the compositor and kernel said
+
+A recording logs every hyprctl call (arguments, exit code, output), every
+DRM connector scan and every event that woke the daemon or arrived on
+Hyprland's event socket, each with its time since the recording started.
+Replaying serves the recorded answers back in place of Hyprland and sysfs,
+at the original or an accelerated pace, so a field issue can be re-run on a
+machine with no monitors attached and apply latency can be compared
+between versions. Used by the daemon; the GUI can record too, but its
+traces have no DRM scans or wake-up events and are for reading only.
+
+Trace format: JSON lines, gzip-compressed if the name ends in .gz. The
+first line is a header object, every further line a list:
+    ["h", t, args, exit code, output]   hyprctl call
+    ["d", t, connectors]                DRM connector scan
+    ["e", t, event, lid state]          daemon wake-up (hotplug/resume/lid/poll)
+    ["s", t, line]                      Hyprland event socket line
+An output or scan equal to the previous one for the same call is stored as
+null, so the periodic polls of an idle session cost a few bytes each.
+"""
+
+import gzip
+import json
+import time
+from datetime import datetime
+
+import hyprdisplays_apply
+import hyprdisplays_config
+from hyprdisplays_drm import DrmConnectorSource
+
+TRACE_VERSION = 1
+
+# hyprctl commands that only read state; everything else is a change that
+# replay logs instead of answering from the trace
+QUERY_COMMANDS = ('monitors', 'workspaces', 'getoption', 'clients', 'activeworkspace', 'version')
+
+def open_trace(path, mode):
+    """Open a trace file for text reading or writing, gzip by extension"""
+    if str(path).endswith('.gz'):
+        return gzip.open(path, mode + 't')
+    return open(path, mode)
+
+class TraceRecorder:
+    """Writes a trace while the real hyprctl and sysfs are used
+
+    Args:
+        path: Trace file to create
+        source: Which program is recording ('daemon' or 'gui')
+        lid: Lid state at the start, if there is a lid
+        profiles: Profile data to store in the header for replay
+    """
+    def __init__(self, path, source, lid=None, profiles=None):
+        self.file = open_trace(path, 'w')
+        self.start = time.monotonic()
+        self.last = {}  # (kind, args) -> last payload, for the null shorthand
+        self.write({'trace': TRACE_VERSION, 'source': source,
+                    'started': datetime.now().isoformat(), 'lid': lid, 'profiles': profiles})
+
+    def write(self, record):
+        self.file.write(json.dumps(record, separators=(',', ':')) + '\n')
+        # Keep the trace usable if the process dies
+        self.file.flush()
+
+    def elapsed(self):
+        return round(time.monotonic() - self.start, 4)
+
+    def dedup(self, key, payload):
+        """payload, or None if it repeats the last one recorded under key"""
+        if self.last.get(key) == payload:
+            return None
+        self.last[key] = payload
+        return payload
+
+    def hyprctl(self, args):
+        """hyprctl_hook: run the real hyprctl and record the exchange"""
+        code, output = hyprdisplays_apply.spawn_hyprctl(args)
+        joined = ' '.join(args)
+        self.write(['h', self.elapsed(), joined, code, self.dedup(('h', joined), output)])
+        return code, output
+
+    def record_scan(self, connectors):
+        self.write(['d', self.elapsed(), self.dedup(('d',), connectors)])
+
+    def record_event(self, event, lid=None):
+        self.write(['e', self.elapsed(), event or 'poll', lid])
+
+    def record_socket(self, line):
+        self.write(['s', self.elapsed(), line])
+
+    def install(self):
+        """Route hyprctl calls and event socket lines through the recorder"""
+        hyprdisplays_apply.hyprctl_hook = self.hyprctl
+        hyprdisplays_config.event_hook = self.record_socket
+
+    def close(self):
+        hyprdisplays_apply.hyprctl_hook = None
+        hyprdisplays_config.event_hook = None
+        self.file.close()
+
+class RecordingConnectorSource(DrmConnectorSource):
+    """DRM connector source that records every scan"""
+    def __init__(self, recorder, sysfs_root):
+        super().__init__(sysfs_root)
+        self.recorder = recorder
+
+    def scan(self):
+        connectors = super().scan()
+        self.recorder.record_scan(connectors)
+        return connectors
+
+class TracePlayer:
+    """Serves a recorded trace in place of Hyprland and the kernel
+
+    The trace is cut into windows at every recorded event. While the
+    replay handles an event, its queries are answered with the responses
+    recorded for that same event, in recorded order (the last one repeats
+    once they run out, the previous window's last one stands in if there
+    were none). Answers therefore never depend on how fast the replaying
+    machine is; speed only paces the events. Changes (keywords, batches,
+    dispatches) are accepted and logged in self.sent.
+
+    Args:
+        path: Trace file to read
+        speed: Replay pace, 1.0 for the original timing
+    """
+    def __init__(self, path, speed=1.0):
+        self.speed = speed
+        self.windows = [{}]  # per event: call -> recorded answers (before the first event: startup)
+        self.events = []  # (t, event, lid state)
+        self.recorded_sent = []  # (t, joined args) changes sent while recording
+        self.sent = []  # (t, joined args) changes sent during replay
+        self.window = 0
+        self.cursors = {}
+        self.start = None
+
+        last = {}
+        with open_trace(path, 'r') as f:
+            self.header = json.loads(f.readline())
+            if self.header.get('trace') != TRACE_VERSION:
+                raise ValueError(f"Unsupported trace version: {self.header.get('trace')}")
+            for line in f:
+                record = json.loads(line)
+                kind, t = record[0], record[1]
+                if kind == 'h':
+                    _, _, joined, code, output = record
+                    output = last.get(joined) if output is None else output
+                    last[joined] = output
+                    if joined.split(' ', 1)[0] in QUERY_COMMANDS:
+                        self.windows[-1].setdefault(joined, []).append((code, output))
+                    else:
+                        self.recorded_sent.append((t, joined))
+                elif kind == 'd':
+                    connectors = last.get('scan') if record[2] is None else record[2]
+                    last['scan'] = connectors
+                    self.windows[-1].setdefault('scan', []).append(connectors)
+                elif kind == 'e':
+                    self.events.append((t, record[2], record[3]))
+                    self.windows.append({})
+
+    def enter(self, window):
+        """Answer from the responses recorded for window (0 = startup, n = event n)"""
+        self.window = window
+        self.cursors = {}
+
+    def answer(self, key):
+        """Next recorded answer for key in the current window, or None"""
+        values = self.windows[self.window].get(key)
+        if values:
+            index = self.cursors.get(key, 0)
+            self.cursors[key] = index + 1
+            return values[min(index, len(values) - 1)]
+        for window in reversed(self.windows[:self.window]):
+            if key in window:
+                return window[key][-1]
+        return None
+
+    def now(self):
+        """Current trace time"""
+        return (time.monotonic() - self.start) * self.speed
+
+    def sleep_until(self, t):
+        remaining = (t - self.now()) / self.speed
+        if remaining > 0:
+            time.sleep(remaining)
+
+    def hyprctl(self, args):
+        """hyprctl_hook: answer queries from the trace, log changes"""
+        joined = ' '.join(args)
+        if args and args[0] in QUERY_COMMANDS:
+            return self.answer(joined) or (1, f"not in trace: {joined}")
+        self.sent.append((round(self.now(), 4), joined))
+        return 0, 'ok'
+
+    def scan(self):
+        return self.answer('scan') or {}
+
+    def begin(self):
+        """Start the trace clock and stand in for hyprctl"""
+        self.start = time.monotonic()
+        self.enter(0)
+        hyprdisplays_apply.hyprctl_hook = self.hyprctl
+
+    def end(self):
+        hyprdisplays_apply.hyprctl_hook = None
+
+class ReplayConnectorSource(DrmConnectorSource):
+    """DRM connector source answering from a trace"""
+    def __init__(self, player):
+        super().__init__()
+        self.player = player
+
+    def scan(self):
+        return self.player.scan()
+
+class ReplayLid:
+    """Lid switch whose state is set from the trace's lid events"""
+    def __init__(self, state):
+        self.state = state
+
+    def changed(self):
+        return False
+
+    @property
+    def closed(self):
+        return self.state == 'closed'
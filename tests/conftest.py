@@ -0,0 +1,115 @@
+import importlib.util
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+SRC = Path(__file__).resolve().parent.parent / "src"
+
+# The shared modules are installed flat next to the scripts; import them from src/
+sys.path.insert(0, str(SRC))
+
+import hyprdisplays_apply
+from hyprdisplays_profiles import monitor_identity, profile_key_for
+
+def load_script(filename, module_name):
+    """Import one of the dash-named scripts in src/ as a module"""
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+    spec = importlib.util.spec_from_file_location(module_name, SRC / filename)
+    module = importlib.util.module_from_spec(spec)
+    # Registered so worker processes can unpickle its functions
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+def monitor(name, width=1920, height=1080, x=0, y=0, scale=1.0, refresh=60.0, monitor_id=0, **extra):
+    """A `hyprctl monitors all -j` entry"""
+    return {'id': monitor_id, 'name': name, 'make': extra.pop('make', 'Make'), 'model': extra.pop('model', name),
+            'serial': extra.pop('serial', f"SN-{name}"), 'description': '', 'width': width, 'height': height,
+            'refreshRate': refresh, 'x': x, 'y': y, 'scale': scale, 'transform': 0, 'disabled': False,
+            'mirrorOf': 'none', 'focused': False,
+            'availableModes': [f"{width}x{height}@{refresh:.2f}Hz"], **extra}
+
+class FakeHyprland:
+    """Stands in for hyprctl: answers queries from self.monitors and applies monitor rules"""
+    def __init__(self, monitors):
+        self.monitors = {m['name']: m for m in monitors}
+        self.workspaces = []
+        self.calls = []  # hyprctl invocations that change something
+        self.sent = []   # their commands, batches split up
+        self.fail = False
+
+    def __call__(self, args):
+        if args[:2] == ['monitors', 'all']:
+            return 0, json.dumps(list(self.monitors.values()))
+        if args[0] == 'workspaces':
+            return 0, json.dumps(self.workspaces)
+        if args[0] == 'getoption':
+            return 0, '{"int": 0}'
+        self.calls.append(args)
+        commands = args[1].split(' ; ') if args[0] == '--batch' else [' '.join(args)]
+        self.sent.extend(commands)
+        if self.fail:
+            return 1, 'error'
+        for command in commands:
+            if command.startswith('keyword monitor '):
+                self.apply(command[len('keyword monitor '):])
+        return 0, 'ok'
+
+    def apply(self, rule):
+        name, *fields = rule.split(',')
+        display = self.monitors.get(name)
+        if display is None:
+            return
+        if fields == ['disabled']:
+            display['disabled'] = True
+            return
+        display['disabled'] = False
+        if fields[0] == 'preferred':
+            display['mirrorOf'] = fields[-1] if 'mirror' in fields else 'none'
+            return
+        resolution, _, refresh = fields[0].partition('@')
+        width, height = (int(v) for v in resolution.split('x'))
+        x, y = (int(v) for v in fields[1].split('x'))
+        display.update(width=width, height=height, refreshRate=float(refresh), x=x, y=y,
+                       scale=float(fields[2]), transform=int(fields[4]), mirrorOf='none')
+
+@pytest.fixture
+def fake_hyprland(monkeypatch):
+    """Install a FakeHyprland as the hyprctl hook; set .monitors before use"""
+    hyprland = FakeHyprland([])
+    monkeypatch.setattr(hyprdisplays_apply, 'hyprctl_hook', hyprland)
+    return hyprland
+
+@pytest.fixture
+def home(tmp_path, monkeypatch):
+    """Empty home directory, so profile files are written under tmp_path"""
+    monkeypatch.setenv('HOME', str(tmp_path))
+    (tmp_path / ".config" / "hypr").mkdir(parents=True)
+    return tmp_path
+
+def monitors_info(displays):
+    return [{'name': d['name'], 'make': d['make'], 'model': d['model'], 'serial': d['serial'],
+             'description': d['description']} for d in displays]
+
+def write_profiles(home, entries, history=()):
+    """Write a profile file with one profile per (displays, monitors config) pair
+
+    Returns:
+        The profile keys, in order
+    """
+    profiles = {}
+    keys = []
+    for index, (displays, monitors) in enumerate(entries):
+        info = monitors_info(displays)
+        identity = monitor_identity(info)
+        key = profile_key_for(profiles, identity)
+        profiles[key] = {'identity': identity, 'monitors_info': info, 'monitors': monitors,
+                         'saved_at': f"2026-01-{index + 1:02d}T00:00:00"}
+        keys.append(key)
+    path = home / ".config" / "hypr" / "hyprdisplays_profiles.json"
+    path.write_text(json.dumps({'version': 1, 'profiles': profiles,
+                                'history': [{'fingerprint': key} for key in history]}))
+    return keys
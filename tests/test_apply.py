@@ -0,0 +1,198 @@
+import hyprdisplays_apply
+from hyprdisplays_apply import (changed_fields, plan_apply, restore_snapshot, serialize_snapshot,
+                                snapshot_monitors, wait_until_applied)
+
+def monitor(name, x=0, mirror='none', monitor_id=0):
+    return {'id': monitor_id, 'name': name, 'width': 1920, 'height': 1080, 'refreshRate': 60.0,
+            'x': x, 'y': 0, 'scale': 1.0, 'transform': 0, 'disabled': False, 'mirrorOf': mirror}
+
+def test_mirror_change_is_a_changed_field():
+    mirrored = {'mirror': 'eDP-1'}
+    assert changed_fields(mirrored, monitor('HDMI-A-1', mirror='eDP-1')) == []
+    assert changed_fields(mirrored, monitor('HDMI-A-1')) == ['mirror']
+    assert changed_fields(mirrored, monitor('HDMI-A-1', mirror='DP-1')) == ['mirror']
+    extended = {'resolution': '1920x1080', 'refresh_rate': 60, 'x': 0, 'y': 0}
+    assert changed_fields(extended, monitor('HDMI-A-1', mirror='eDP-1')) == ['mirror']
+
+def test_saved_mirror_profile_is_applied_to_enabled_output():
+    plan = plan_apply({'HDMI-A-1': {'mirror': 'eDP-1'}},
+                      [monitor('eDP-1'), monitor('HDMI-A-1', x=1920, monitor_id=1)])
+    assert [step['command'] for step in plan] == ['HDMI-A-1,preferred,auto,1,mirror,eDP-1']
+
+def test_revert_restores_mirror_after_extend(monkeypatch):
+    before = [monitor('eDP-1'), monitor('HDMI-A-1', mirror='eDP-1', monitor_id=1)]
+    after = [monitor('eDP-1'), monitor('HDMI-A-1', x=1920, monitor_id=1)]
+    sent = []
+    monkeypatch.setattr(hyprdisplays_apply, 'hyprctl_hook', lambda args: sent.append(args) or (0, 'ok'))
+
+    snapshot = restore_snapshot(serialize_snapshot(snapshot_monitors(before)), read_state=lambda: after)
+    assert sent == [['--batch', 'keyword monitor HDMI-A-1,preferred,auto,1,mirror,eDP-1']]
+
+    _, drifted = wait_until_applied(snapshot, read_state=lambda: after, timeout=0)
+    assert drifted == {'HDMI-A-1': ['mirror']}
+    _, drifted = wait_until_applied(snapshot, read_state=lambda: before, timeout=0)
+    assert drifted == {}
+
+def test_monitors_report_mirror_by_name(monkeypatch):
+    output = ('[{"id": 0, "name": "eDP-1", "mirrorOf": "none"},'
+              ' {"id": 1, "name": "HDMI-A-1", "mirrorOf": "0"}]')
+    monkeypatch.setattr(hyprdisplays_apply, 'hyprctl_hook', lambda args: (0, output))
+    displays_data = hyprdisplays_apply.hyprctl_monitors()
+    assert [d['mirrorOf'] for d in displays_data] == ['none', 'eDP-1']
+
+def test_verifier_polls_without_sleeping_and_retries_drifted_outputs():
+    target = {'DP-1': {'resolution': '1920x1080', 'refresh_rate': 60, 'x': 1920, 'y': 0}}
+    states = iter([[monitor('DP-1')], [monitor('DP-1')], [monitor('DP-1', x=1920)]])
+    sent = []
+    now = [0.0]
+    verifier = hyprdisplays_apply.ApplyVerifier(target, read_state=lambda: next(states),
+                                                send_command=sent.append, timeout=1.0,
+                                                clock=lambda: now[0])
+    assert verifier.poll() is None
+    now[0] = 1.5
+    assert verifier.poll() is None
+    assert sent == ['DP-1,1920x1080@60,1920x0,1.0,transform,0']
+    displays_data, failed = verifier.poll()
+    assert failed == {}
+    assert displays_data[0]['x'] == 1920
+
+def test_valid_scales_give_integer_logical_sizes():
+    assert hyprdisplays_apply.valid_scales(1366, 768) == (0.5, 2 / 3, 1.0, 2.0)
+    scales = hyprdisplays_apply.valid_scales(1920, 1080)
+    assert {1.0, 1.2, 1.25, 1.5, 2.0, 3.0} <= set(scales)
+    for scale in scales:
+        assert abs(1920 / scale - round(1920 / scale)) < 1e-6
+        assert abs(1080 / scale - round(1080 / scale)) < 1e-6
+
+def test_snap_scale_follows_the_edit_direction():
+    snap = hyprdisplays_apply.snap_scale
+    # Spin button "+" and "-" from 1.0 at 1366x768 reach the neighbouring valid scales
+    assert snap(1.1, 1366, 768, previous=1.0) == 2.0
+    assert snap(0.9, 1366, 768, previous=1.0) == 2 / 3
+    # A typed value between valid scales goes the way it was changed
+    assert snap(1.5, 1366, 768, previous=1.0) == 2.0
+    assert snap(1.5, 1366, 768, previous=2.0) == 1.0
+    assert snap(1.1, 1920, 1080, previous=1.0) == 1.2
+    # Past the last valid scale it stays at the end
+    assert snap(2.5, 1366, 768, previous=2.0) == 2.0
+    # Without a previous value the nearest one wins
+    assert snap(1.4, 1366, 768) == 1.0
+    assert snap(1.1, 1366, 768, previous=1.1) == 1.0
+
+def layout(x):
+    return {'DP-1': {'resolution': '1920x1080', 'refresh_rate': 60, 'x': x, 'y': 0, 'scale': 1.0}}
+
+def live_applier(send_result=True):
+    now = [0.0]
+    batches = []
+    def send(commands):
+        batches.append(commands)
+        return send_result
+    applier = hyprdisplays_apply.CoalescingApplier([monitor('DP-1')], max_rate=4, send=send,
+                                                   clock=lambda: now[0])
+    return applier, batches, now
+
+def test_live_preview_coalesces_and_rate_limits():
+    applier, batches, now = live_applier()
+    assert applier.submit(layout(100)) == 0.0
+    assert applier.flush() == ['DP-1']
+    # A burst within the interval collapses into its last layout
+    assert applier.submit(layout(200)) == 0.25
+    now[0] = 0.1
+    assert applier.submit(layout(300)) == 0.15
+    now[0] = 0.25
+    applier.flush()
+    assert batches == [['keyword monitor DP-1,1920x1080@60,100x0,1.0,transform,0'],
+                       ['keyword monitor DP-1,1920x1080@60,300x0,1.0,transform,0']]
+
+def test_live_preview_skips_unchanged_outputs():
+    applier, batches, now = live_applier()
+    # Same as the compositor state when editing started
+    applier.submit(layout(0))
+    assert applier.flush() == []
+    applier.submit(layout(100))
+    applier.flush()
+    now[0] = 1.0
+    applier.submit(layout(100))
+    assert applier.flush() == []
+    assert len(batches) == 1
+
+def test_live_preview_retries_a_failed_send():
+    applier, batches, now = live_applier(send_result=False)
+    applier.submit(layout(100))
+    assert applier.flush() == []
+    assert applier.sent == {} and applier.last_sent_at is None
+    # Not rate limited, and still pending
+    assert applier.submit(applier.pending) == 0.0
+    applier.send = lambda commands: batches.append(commands) or True
+    assert applier.flush() == ['DP-1']
+    assert len(batches) == 2
+
+def test_plan_orders_disable_move_modeset_enable_primary_last():
+    def rule(x, scale=1.0):
+        return {'resolution': '1920x1080', 'refresh_rate': 60.0, 'x': x, 'y': 0, 'scale': scale}
+    primary = dict(monitor('eDP-1'), focused=True)
+    displays = [primary, monitor('DP-1', x=1920, monitor_id=1), monitor('DP-2', x=3840, monitor_id=2),
+                monitor('DP-3', x=5760, monitor_id=3), dict(monitor('HDMI-A-1', monitor_id=4), disabled=True)]
+    target = {'eDP-1': rule(0, 2.0),         # primary modeset
+              'HDMI-A-1': rule(20000),       # enable
+              'DP-3': rule(10000, 2.0),      # modeset
+              'DP-2': rule(15000),           # plain move
+              'DP-1': {'disabled': True}}
+    plan = plan_apply(target, displays)
+    assert [(step['monitor'], step['phase']) for step in plan] == [
+        ('DP-1', 'disable'), ('DP-2', 'reconfigure'), ('DP-3', 'reconfigure'),
+        ('eDP-1', 'reconfigure'), ('HDMI-A-1', 'enable')]
+
+def test_plan_moves_out_of_the_way_first():
+    # DP-2 takes DP-1's place, so DP-1 has to leave first
+    displays = [monitor('DP-1'), monitor('DP-2', x=1920, monitor_id=1)]
+    target = {'DP-2': {'resolution': '1920x1080', 'refresh_rate': 60.0, 'x': 0, 'y': 0, 'scale': 1.0},
+              'DP-1': {'resolution': '1920x1080', 'refresh_rate': 60.0, 'x': 3840, 'y': 0, 'scale': 1.0}}
+    assert [step['monitor'] for step in plan_apply(target, displays)] == ['DP-1', 'DP-2']
+
+def test_plan_skips_outputs_that_match():
+    displays = [monitor('DP-1'), monitor('DP-2', x=1920, monitor_id=1)]
+    target = {'DP-1': {'resolution': '1920x1080', 'refresh_rate': 60.0, 'x': 0, 'y': 0, 'scale': 1.0},
+              'DP-2': {'resolution': '1920x1080', 'refresh_rate': 60.0, 'x': 1920, 'y': 0, 'scale': 1.0}}
+    assert plan_apply(target, displays) == []
+
+def test_mode_table_prefers_exact_then_aspect_then_pixels():
+    table = hyprdisplays_apply.ModeTable(["2560x1440@143.97Hz", "2560x1440@59.95Hz", "1920x1200@60.00Hz",
+                                          "1920x1080@60.00Hz", "1280x1024@75.00Hz", "bogus"])
+    assert table.closest(2560, 1440, 144) == (2560, 1440, 143.97)
+    assert table.closest(2560, 1440, 60) == (2560, 1440, 59.95)
+    # No 3840x2160: same 16:9 aspect beats the closer 1920x1200 pixel count
+    assert table.closest(3840, 2160, 60) == (2560, 1440, 59.95)
+    assert table.closest(1680, 1050, 60) == (1920, 1200, 60.0)
+
+def test_validate_modes_substitutes_unsupported_modes_and_scales():
+    displays = [dict(monitor('DP-1'), availableModes=["2560x1440@59.95Hz", "1920x1080@60.00Hz"])]
+    saved = {'DP-1': {'resolution': '3840x2160', 'refresh_rate': 60.0, 'x': 0, 'y': 0, 'scale': 1.3}}
+    validated, substitutions = hyprdisplays_apply.validate_modes(saved, displays)
+    assert validated['DP-1']['resolution'] == '2560x1440'
+    assert validated['DP-1']['refresh_rate'] == 59.95
+    # 1.3 doesn't divide 2560x1440 into whole pixels
+    assert validated['DP-1']['scale'] == 4 / 3
+    assert [s['field'] for s in substitutions] == ['mode', 'scale']
+    assert saved['DP-1']['resolution'] == '3840x2160'
+
+def test_validate_modes_leaves_supported_and_special_rules_alone():
+    displays = [dict(monitor('DP-1'), availableModes=["1920x1080@60.00Hz"])]
+    saved = {'DP-1': {'resolution': '1920x1080', 'refresh_rate': 60.0, 'x': 0, 'y': 0, 'scale': 1.25},
+             'DP-2': {'disabled': True}, 'DP-3': {'preferred': True}}
+    assert hyprdisplays_apply.validate_modes(saved, displays) == (saved, [])
+
+WORKSPACES = [{'id': 1, 'name': '1', 'monitor': 'eDP-1'}, {'id': 2, 'name': '2', 'monitor': 'eDP-1'},
+              {'id': -98, 'name': 'special:magic', 'monitor': 'eDP-1'}, {'id': 5, 'name': 'web', 'monitor': 'DP-1'}]
+
+def test_workspace_bindings_use_numbers_or_names_and_skip_special():
+    assert hyprdisplays_apply.workspace_bindings(WORKSPACES) == {'1': 'eDP-1', '2': 'eDP-1', 'name:web': 'DP-1'}
+
+def test_workspace_commands_only_move_what_is_misplaced():
+    saved = {'eDP-1': {'x': 0}, 'DP-1': {'x': 1920}, 'HDMI-A-1': {'disabled': True}}
+    bindings = {'1': 'DP-1', '2': 'eDP-1', 'name:web': 'eDP-1', '9': 'DP-1', '3': 'HDMI-A-1'}
+    assert hyprdisplays_apply.workspace_commands(bindings, saved, WORKSPACES) == [
+        'dispatch moveworkspacetomonitor 1 DP-1', 'dispatch moveworkspacetomonitor name:web eDP-1']
+    # Without the live workspaces every binding to an enabled monitor is sent
+    assert len(hyprdisplays_apply.workspace_commands(bindings, saved)) == 4
@@ -0,0 +1,32 @@
+import json
+
+from conftest import load_script
+
+audit = load_script("hyprdisplays-audit.py", "hyprdisplays_audit")
+
+def monitor(**overrides):
+    return {'resolution': '1920x1080', 'refresh_rate': 60, 'x': 0, 'y': 0, 'scale': 1.0,
+            'transform': 0, **overrides}
+
+def write_profiles(path, profiles):
+    path.write_text(json.dumps({'profiles': {key: {'monitors': monitors}
+                                             for key, monitors in profiles.items()}}))
+    return path
+
+def test_wrong_value_types_are_malformed_findings(tmp_path):
+    path = write_profiles(tmp_path / "profiles.json", {
+        'null-transform': {'DP-1': monitor(transform=None)},
+        'string-x': {'DP-1': monitor(), 'DP-2': monitor(x='1920')},
+        'fine': {'DP-1': monitor(), 'DP-2': monitor(x=1920)},
+    })
+    summary = audit.audit_file(path)
+    assert summary['error'] is None
+    assert summary['problems']['malformed'] == 2
+    assert summary['profiles'] == 3
+
+def test_audit_continues_past_malformed_files(tmp_path):
+    write_profiles(tmp_path / "bad.json", {'p': {'DP-1': monitor(transform=None)}})
+    write_profiles(tmp_path / "good.json", {'p': {'DP-1': monitor()}})
+    stats = audit.run_audit([str(tmp_path)], workers=1)
+    assert stats.files == 2
+    assert stats.problems['malformed'] == 1
@@ -0,0 +1,117 @@
+from hyprdisplays_config import ConfigTree, compile_monitor_rules, remove_lines
+
+def dell(name):
+    return {'name': name, 'make': 'Dell Inc.', 'model': 'DELL U2720Q', 'serial': '',
+            'description': 'Dell Inc. DELL U2720Q'}
+
+def test_identical_monitors_get_no_desc_rule():
+    profiles = {
+        'dual': {
+            'saved_at': '2026-01-01T00:00:00',
+            'monitors_info': [dell('DP-1'), dell('DP-2')],
+            'monitors': {
+                'DP-1': {'width': 2560, 'height': 1440, 'x': 0, 'y': 0},
+                'DP-2': {'width': 2560, 'height': 1440, 'x': 2560, 'y': 0},
+            },
+        },
+    }
+    rules, ambiguous = compile_monitor_rules(profiles, 'dual')
+    assert rules == {}
+    assert ambiguous == ['Dell Inc. DELL U2720Q']
+
+def test_identical_live_monitors_block_single_monitor_rule():
+    profiles = {
+        'single': {
+            'saved_at': '2026-01-01T00:00:00',
+            'monitors_info': [dell('DP-1')],
+            'monitors': {'DP-1': {'width': 2560, 'height': 1440, 'x': 0, 'y': 0}},
+        },
+    }
+    rules, _ = compile_monitor_rules(profiles, 'single')
+    assert list(rules) == ['Dell Inc. DELL U2720Q']
+
+    rules, ambiguous = compile_monitor_rules(profiles, 'single', [dell('DP-1'), dell('DP-2')])
+    assert rules == {}
+    assert ambiguous == ['Dell Inc. DELL U2720Q']
+
+def test_distinct_monitors_keep_desc_rules():
+    laptop = {'name': 'eDP-1', 'make': 'BOE', 'model': '0x095F', 'serial': '',
+              'description': 'BOE 0x095F'}
+    profiles = {
+        'docked': {
+            'saved_at': '2026-01-01T00:00:00',
+            'monitors_info': [laptop, dell('DP-1')],
+            'monitors': {
+                'eDP-1': {'width': 1920, 'height': 1080, 'x': 0, 'y': 0},
+                'DP-1': {'width': 2560, 'height': 1440, 'x': 1920, 'y': 0},
+            },
+        },
+    }
+    rules, ambiguous = compile_monitor_rules(profiles)
+    assert set(rules) == {'BOE 0x095F', 'Dell Inc. DELL U2720Q'}
+    assert ambiguous == []
+
+def test_event_poll_does_not_block(tmp_path):
+    import socket
+    from hyprdisplays_config import HyprlandEvents
+
+    path = tmp_path / ".socket2.sock"
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(str(path))
+    server.listen(1)
+    events = HyprlandEvents(path)
+    peer, _ = server.accept()
+    try:
+        assert events.poll('configreloaded') is False
+        peer.sendall(b"monitoradded>>DP-1\nconfigrel")
+        assert events.wait_for('monitoradded', timeout=1.0)
+        assert events.poll('configreloaded') is False
+        peer.sendall(b"oaded>>\n")
+        assert events.poll('configreloaded') is True
+        peer.close()
+        assert events.poll('configreloaded') is None
+    finally:
+        events.close()
+        server.close()
+
+def config_tree(tmp_path):
+    hypr = tmp_path / "hypr"
+    (hypr / "conf.d").mkdir(parents=True)
+    (hypr / "hyprland.conf").write_text(
+        "# Monitor configuration - Generated by HyprDisplays\n"
+        "monitor=DP-1,preferred,auto,1  # laptop dock\n"
+        "source = ./conf.d/*.conf\n"
+        "source=monitors.conf\n"
+        "source=missing.conf\n"
+        "$color = ##ff0000 # monitor=not-a-rule\n")
+    (hypr / "conf.d" / "20-b.conf").write_text("monitor=HDMI-A-1,disabled\nsource=../hyprland.conf\n")
+    (hypr / "conf.d" / "10-a.conf").write_text("# monitor=DP-2,disabled\nmonitor = DP-2,preferred,auto,1\n")
+    (hypr / "monitors.conf").write_text("monitor=DP-3,preferred,auto,1\n")
+    return hypr
+
+def test_tree_follows_sources_globs_in_order_and_stops_at_cycles(tmp_path):
+    hypr = config_tree(tmp_path)
+    tree = ConfigTree(hypr / "hyprland.conf")
+    assert [f.relative_to(hypr).as_posix() for f in tree.files()] == [
+        "hyprland.conf", "conf.d/10-a.conf", "conf.d/20-b.conf", "monitors.conf"]
+    assert [(f.name, number) for f, number, _ in tree.monitor_lines()] == [
+        ("hyprland.conf", 2), ("10-a.conf", 2), ("20-b.conf", 1), ("monitors.conf", 1)]
+    assert tree.includes(hypr / "conf.d" / ".." / "monitors.conf")
+    assert not tree.includes(hypr / "missing.conf")
+
+def test_lines_to_clean_skip_the_managed_file(tmp_path):
+    hypr = config_tree(tmp_path)
+    tree = ConfigTree(hypr / "hyprland.conf")
+    edits = tree.lines_to_clean(hypr / "monitors.conf")
+    assert {path.name: numbers for path, numbers in edits.items()} == {
+        "hyprland.conf": {1, 2}, "10-a.conf": {2}, "20-b.conf": {1}}
+
+    path = hypr / "hyprland.conf"
+    path.write_text(remove_lines(path.read_text(), edits[path]))
+    assert path.read_text().startswith("source = ./conf.d/*.conf\n")
+    # The cached parse is dropped once the file changes
+    assert tree.lines_to_clean(hypr / "monitors.conf").get(path) is None
+
+def test_remove_lines_keeps_other_bytes():
+    assert remove_lines("a\r\nb\nc", {2}) == "a\r\nc"
+    assert remove_lines("a\nb\n", set()) == "a\nb\n"
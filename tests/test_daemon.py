@@ -0,0 +1,357 @@
+import os
+import select
+import shutil
+import socket
+import struct
+import subprocess
+import time
+
+import pytest
+
+from conftest import load_script, monitor, write_profiles
+
+daemon_module = load_script("hyprdisplays-daemon.py", "hyprdisplays_daemon")
+
+def make_daemon(home, lid_state=None, **kwargs):
+    lid_root = home / "lid"
+    if lid_state:
+        (lid_root / "LID0").mkdir(parents=True, exist_ok=True)
+        (lid_root / "LID0" / "state").write_text(f"state:      {lid_state}\n")
+    return daemon_module.MonitorDaemon(sysfs_root=home / "no-drm", lid_root=lid_root, **kwargs)
+
+def set_lid(home, state):
+    (home / "lid" / "LID0" / "state").write_text(f"state:      {state}\n")
+
+# --- Lid switch -------------------------------------------------------------
+
+def test_lid_switch_reads_and_tracks_state(tmp_path):
+    (tmp_path / "LID0").mkdir()
+    state = tmp_path / "LID0" / "state"
+    state.write_text("state:      open\n")
+    lid = daemon_module.LidSwitch(tmp_path)
+    assert lid.state == 'open' and not lid.closed
+    assert not lid.changed()
+    state.write_text("state:      closed\n")
+    assert lid.changed()
+    assert lid.closed
+
+def test_no_lid_reads_none(tmp_path):
+    assert daemon_module.LidSwitch(tmp_path).state is None
+
+def test_lid_overrides_are_opt_in(home, fake_hyprland):
+    names = ['eDP-1', 'DP-1']
+    assert make_daemon(home, 'closed').get_lid_overrides(names, {}) == {}
+
+    daemon = make_daemon(home, 'closed', lid_disables_panel=True)
+    assert daemon.get_lid_overrides(names, {}) == {'eDP-1': {'disabled': True}}
+    # Never switch off the only enabled output
+    assert daemon.get_lid_overrides(names, {'DP-1': {'disabled': True}}) == {}
+    assert daemon.get_lid_overrides(['eDP-1'], {}) == {}
+
+    set_lid(home, 'open')
+    daemon.lid.changed()
+    assert daemon.get_lid_overrides(names, {}) == {}
+
+# --- Repair after resume / lid ----------------------------------------------
+
+def repair_setup(home, fake_hyprland, saved):
+    displays = [monitor('DP-1', scale=1.25)]
+    fake_hyprland.monitors = {d['name']: d for d in displays}
+    write_profiles(home, [(displays, saved)])
+    daemon = make_daemon(home)
+    daemon.check_and_apply()
+    fake_hyprland.sent.clear()
+    return daemon
+
+def test_repair_ignores_substituted_scale(home, fake_hyprland):
+    # 1.27 is not a valid scale at 1920x1080; every apply sends 1.25 instead
+    saved = {'DP-1': {'resolution': '1920x1080', 'refresh_rate': 60.0, 'x': 0, 'y': 0, 'scale': 1.27}}
+    daemon = repair_setup(home, fake_hyprland, saved)
+    repairs = []
+    daemon.apply_configuration = lambda config, *args, **kwargs: repairs.append(config)
+    daemon.verify_and_repair()
+    assert repairs == []
+
+def test_repair_resends_only_drifted_outputs(home, fake_hyprland):
+    saved = {'DP-1': {'resolution': '1920x1080', 'refresh_rate': 60.0, 'x': 0, 'y': 0, 'scale': 1.25}}
+    daemon = repair_setup(home, fake_hyprland, saved)
+    fake_hyprland.monitors['DP-1']['x'] = 500
+    daemon.verify_and_repair()
+    assert fake_hyprland.sent == ['keyword monitor DP-1,1920x1080@60.0,0x0,1.25,transform,0']
+    assert fake_hyprland.monitors['DP-1']['x'] == 0
+
+def test_repair_does_not_record_a_use(home, fake_hyprland):
+    saved = {'DP-1': {'resolution': '1920x1080', 'refresh_rate': 60.0, 'x': 0, 'y': 0, 'scale': 1.25}}
+    daemon = repair_setup(home, fake_hyprland, saved)
+    before = daemon.config_manager.profiles_path.read_text()
+    daemon.verify_and_repair()
+    assert daemon.config_manager.profiles_path.read_text() == before
+
+def test_lid_close_disables_panel_and_open_restores_it(home, fake_hyprland):
+    displays = [monitor('eDP-1'), monitor('DP-1', x=1920, monitor_id=1)]
+    fake_hyprland.monitors = {d['name']: d for d in displays}
+    daemon = make_daemon(home, 'open', lid_disables_panel=True)
+    daemon.check_and_apply()
+
+    set_lid(home, 'closed')
+    assert daemon.wait_for_event(1) == 'lid'
+    daemon.handle_event('lid')
+    assert fake_hyprland.monitors['eDP-1']['disabled']
+
+    set_lid(home, 'open')
+    assert daemon.wait_for_event(1) == 'lid'
+    daemon.handle_event('lid')
+    assert not fake_hyprland.monitors['eDP-1']['disabled']
+
+# --- Suspend/resume on a private bus ----------------------------------------
+
+def _align(buf, n):
+    return buf + b"\0" * (-len(buf) % n)
+
+def _dbus_message(kind, serial, fields, signature="", body=b""):
+    """Marshal a little-endian D-Bus message (header fields are (code, type, value))"""
+    if signature:
+        fields = fields + [(8, 'g', signature)]
+    header = b""
+    for code, type_code, value in fields:
+        header = _align(header, 8) + bytes([code, 1]) + type_code.encode() + b"\0"
+        data = value.encode()
+        if type_code == 'g':
+            header += bytes([len(data)]) + data + b"\0"
+        else:
+            header = _align(header, 4) + struct.pack("<I", len(data)) + data + b"\0"
+    fixed = struct.pack("<cBBBIII", b"l", kind, 0, 1, len(body), serial, len(header))
+    return _align(fixed + header, 8) + body
+
+class FakeLogind:
+    """Owns org.freedesktop.login1 on a bus and emits PrepareForSleep"""
+    def __init__(self, address):
+        params = dict(p.split("=", 1) for p in address.split(":", 1)[1].split(","))
+        self.sock = socket.socket(socket.AF_UNIX)
+        self.sock.connect(params["path"] if "path" in params else "\0" + params["abstract"])
+        self.sock.sendall(b"\0AUTH EXTERNAL " + str(os.getuid()).encode().hex().encode() + b"\r\n")
+        assert self.sock.recv(1024).startswith(b"OK")
+        self.sock.sendall(b"BEGIN\r\n")
+        bus = [(1, 'o', "/org/freedesktop/DBus"), (2, 's', "org.freedesktop.DBus"),
+               (6, 's', "org.freedesktop.DBus")]
+        self.sock.sendall(_dbus_message(1, 1, bus + [(3, 's', "Hello")]))
+        name = b"org.freedesktop.login1"
+        body = _align(struct.pack("<I", len(name)) + name + b"\0", 4) + struct.pack("<I", 4)
+        self.sock.sendall(_dbus_message(1, 2, bus + [(3, 's', "RequestName")], "su", body))
+        self.serial = 2
+
+    def prepare_for_sleep(self, sleeping):
+        self.serial += 1
+        self.sock.sendall(_dbus_message(4, self.serial, [(1, 'o', "/org/freedesktop/login1"),
+                                                         (2, 's', "org.freedesktop.login1.Manager"),
+                                                         (3, 's', "PrepareForSleep")],
+                                        "b", struct.pack("<I", int(sleeping))))
+
+    def close(self):
+        self.sock.close()
+
+@pytest.fixture
+def private_bus():
+    if not shutil.which('dbus-daemon') or not shutil.which('gdbus'):
+        pytest.skip("dbus-daemon and gdbus are needed for a private bus")
+    bus = subprocess.Popen(['dbus-daemon', '--session', '--nofork', '--print-address'],
+                           stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    address = bus.stdout.readline().strip()
+    yield address
+    bus.terminate()
+    bus.wait()
+
+def test_sleep_watcher_sees_resume_on_private_bus(private_bus):
+    logind = FakeLogind(private_bus)
+    watcher = daemon_module.SleepWatcher(private_bus)
+    try:
+        # gdbus subscribes asynchronously; emit until it is listening
+        resumed = False
+        deadline = time.monotonic() + 5
+        while not resumed and time.monotonic() < deadline:
+            logind.prepare_for_sleep(True)
+            logind.prepare_for_sleep(False)
+            readable, _, _ = select.select([watcher], [], [], 0.2)
+            resumed = bool(readable) and watcher.read_resumed()
+        assert resumed
+    finally:
+        watcher.close()
+        logind.close()
+    assert watcher.process.returncode is not None
+
+def test_sleep_watcher_ignores_going_to_sleep(private_bus):
+    logind = FakeLogind(private_bus)
+    watcher = daemon_module.SleepWatcher(private_bus)
+    try:
+        deadline = time.monotonic() + 2
+        while time.monotonic() < deadline:
+            logind.prepare_for_sleep(True)
+            readable, _, _ = select.select([watcher], [], [], 0.2)
+            assert not (readable and watcher.read_resumed())
+    finally:
+        watcher.close()
+        logind.close()
+
+def test_run_closes_the_sleep_watcher(home, fake_hyprland, monkeypatch):
+    closed = []
+
+    class Watcher:
+        closed = False
+        def close(self):
+            closed.append(True)
+
+    monkeypatch.setattr(daemon_module, 'SleepWatcher', lambda bus_address: Watcher())
+    monkeypatch.setattr(daemon_module, 'open_uevent_monitor', lambda: None)
+    daemon = make_daemon(home)
+    def stop(timeout):
+        raise KeyboardInterrupt
+    monkeypatch.setattr(daemon, 'wait_for_event', stop)
+    daemon.run()
+    assert closed == [True]
+
+# --- Prefetching the next monitor set ---------------------------------------
+
+def test_predictor_learns_from_history_and_observations():
+    # History is newest first: laptop -> dock -> laptop -> dock
+    predictor = daemon_module.TransitionPredictor([{'fingerprint': k} for k in ['dock', 'laptop', 'dock', 'laptop']])
+    assert predictor.predict('laptop') == 'dock'
+    assert predictor.predict('dock') == 'laptop'
+    assert predictor.predict('tv') is None
+    for _ in range(3):
+        predictor.observe('laptop', 'tv')
+    assert predictor.predict('laptop') == 'tv'
+    # Re-applying the same set is not a transition
+    predictor.observe('tv', 'tv')
+    assert predictor.predict('tv') is None
+
+LAPTOP = {'eDP-1': {'resolution': '1920x1080', 'refresh_rate': 60.0, 'x': 0, 'y': 0, 'scale': 1.0}}
+DOCKED = {'eDP-1': {'resolution': '1920x1080', 'refresh_rate': 60.0, 'x': 0, 'y': 0, 'scale': 1.0},
+          'DP-1': {'resolution': '2560x1440', 'refresh_rate': 60.0, 'x': 1920, 'y': 0, 'scale': 1.0}}
+
+def docking_setup(home, fake_hyprland):
+    """Daemon started docked, with a history that predicts unplug <-> plug"""
+    panel = monitor('eDP-1')
+    external = monitor('DP-1', 2560, 1440, x=1920, monitor_id=1)
+    laptop, docked = write_profiles(home, [([panel], LAPTOP), ([panel, external], DOCKED)])
+    history = [docked, laptop, docked, laptop]
+    write_profiles(home, [([panel], LAPTOP), ([panel, external], DOCKED)], history)
+    fake_hyprland.monitors = {'eDP-1': panel, 'DP-1': external}
+    daemon = make_daemon(home)
+    daemon.check_and_apply()
+    return daemon, laptop, docked, external
+
+def unplug(daemon, fake_hyprland):
+    external = fake_hyprland.monitors.pop('DP-1')
+    daemon.check_and_apply()
+    return external
+
+def test_prefetch_hit_rebuilds_the_plan_from_live_modes(home, fake_hyprland, capsys):
+    daemon, laptop, docked, external = docking_setup(home, fake_hyprland)
+    unplug(daemon, fake_hyprland)
+    assert daemon.prefetched['fingerprint'] == docked
+
+    # The dock came back offering a different mode than when it was prefetched
+    external.update(width=1920, height=1080, x=0, availableModes=["1920x1080@60.00Hz"])
+    fake_hyprland.monitors['DP-1'] = external
+    fake_hyprland.sent.clear()
+    capsys.readouterr()
+    daemon.check_and_apply()
+    out = capsys.readouterr().out
+    assert "Applying prefetched configuration" in out
+    assert "not supported on DP-1" in out
+    assert fake_hyprland.sent == ['keyword monitor DP-1,1920x1080@60.0,1920x0,1.0,transform,0']
+
+def test_prefetch_miss_takes_the_normal_path(home, fake_hyprland, capsys):
+    daemon, laptop, docked, external = docking_setup(home, fake_hyprland)
+    unplug(daemon, fake_hyprland)
+    # A different monitor than predicted turns up
+    fake_hyprland.monitors['HDMI-A-1'] = monitor('HDMI-A-1', x=1920, monitor_id=2)
+    capsys.readouterr()
+    daemon.check_and_apply()
+    out = capsys.readouterr().out
+    assert "Applying prefetched configuration" not in out
+    assert "No saved configuration for this setup" in out
+
+def test_prefetch_skips_monitors_never_seen(home, fake_hyprland):
+    panel = monitor('eDP-1')
+    external = monitor('DP-1', 2560, 1440, x=1920, monitor_id=1)
+    laptop, docked = write_profiles(home, [([panel], LAPTOP), ([panel, external], DOCKED)])
+    write_profiles(home, [([panel], LAPTOP), ([panel, external], DOCKED)], [docked, laptop])
+    fake_hyprland.monitors = {'eDP-1': panel}
+    daemon = make_daemon(home)
+    daemon.check_and_apply()
+    assert daemon.predictor.predict(laptop) == docked
+    # DP-1's modes are unknown until it has been connected once
+    assert daemon.prefetched is None
+
+def test_failed_prefetch_batch_is_not_recorded_as_a_use(home, fake_hyprland):
+    daemon, laptop, docked, external = docking_setup(home, fake_hyprland)
+    unplug(daemon, fake_hyprland)
+    # Hyprland places a new output at its default position
+    fake_hyprland.monitors['DP-1'] = dict(external, x=0)
+    fake_hyprland.fail = True
+    used = []
+    daemon.config_manager.mark_used = used.append
+    assert not daemon.apply_prefetched(docked)
+    assert used == []
+    fake_hyprland.fail = False
+    daemon.prefetch_next(laptop)
+    assert daemon.apply_prefetched(docked)
+    assert used == [docked]
+
+# --- Cancelling a superseded apply ------------------------------------------
+
+def test_check_superseded_stores_the_newer_state(home, fake_hyprland):
+    fake_hyprland.monitors = {'DP-1': monitor('DP-1')}
+    daemon = make_daemon(home)
+    fingerprint = daemon.config_manager.get_monitor_fingerprint(daemon.get_monitors_info())
+    assert not daemon.check_superseded(fingerprint)
+    assert daemon.pending_monitors_info is None
+
+    fake_hyprland.monitors['HDMI-A-1'] = monitor('HDMI-A-1', monitor_id=1)
+    assert daemon.check_superseded(fingerprint)
+    assert [m['name'] for m in daemon.pending_monitors_info] == ['DP-1', 'HDMI-A-1']
+
+def test_apply_drops_remaining_steps_once_superseded(home, fake_hyprland, monkeypatch):
+    fake_hyprland.monitors = {'DP-1': monitor('DP-1'), 'DP-2': monitor('DP-2', monitor_id=1)}
+    daemon = make_daemon(home)
+    checks = iter([False, True])
+    monkeypatch.setattr(daemon, 'check_superseded', lambda fingerprint: next(checks))
+    target = {'DP-1': {'resolution': '1920x1080', 'refresh_rate': 60.0, 'x': 0, 'y': 1080, 'scale': 1.0},
+              'DP-2': {'resolution': '1920x1080', 'refresh_rate': 60.0, 'x': 1920, 'y': 0, 'scale': 1.0}}
+    assert not daemon.apply_configuration(target, 'fingerprint')
+    assert len(fake_hyprland.sent) == 1
+
+def test_superseded_state_is_applied_straight_away(home, fake_hyprland, monkeypatch):
+    panel = monitor('eDP-1', x=100)
+    external = monitor('DP-1', x=0, monitor_id=1)
+    saved = {'eDP-1': {'resolution': '1920x1080', 'refresh_rate': 60.0, 'x': 0, 'y': 0, 'scale': 1.0},
+             'DP-1': {'resolution': '1920x1080', 'refresh_rate': 60.0, 'x': 1920, 'y': 0, 'scale': 1.0}}
+    write_profiles(home, [([panel, external], saved)])
+    fake_hyprland.monitors = {'eDP-1': panel}
+    daemon = make_daemon(home)
+    # The dock is plugged in while the laptop-only state is being handled
+    plugged = []
+    def superseded(fingerprint):
+        if plugged:
+            return False
+        plugged.append(True)
+        fake_hyprland.monitors['DP-1'] = external
+        daemon.pending_monitors_info = daemon.get_monitors_info()
+        return True
+    monkeypatch.setattr(daemon, 'check_superseded', superseded)
+    daemon.auto_layout = 'connector'
+    daemon.check_and_apply()
+    assert daemon.pending_monitors_info is None
+    assert fake_hyprland.monitors['DP-1']['x'] == 1920
+
+def test_workspace_moves_ride_in_the_last_step(home, fake_hyprland):
+    fake_hyprland.monitors = {'eDP-1': monitor('eDP-1'), 'DP-1': monitor('DP-1', x=1920, monitor_id=1)}
+    fake_hyprland.workspaces = [{'id': 1, 'name': '1', 'monitor': 'eDP-1'}]
+    daemon = make_daemon(home)
+    saved = {'eDP-1': {'resolution': '1920x1080', 'refresh_rate': 60.0, 'x': 0, 'y': 0, 'scale': 1.0},
+             'DP-1': {'resolution': '1920x1080', 'refresh_rate': 60.0, 'x': 1920, 'y': 100, 'scale': 1.0}}
+    assert daemon.apply_configuration(saved, workspaces={'1': 'DP-1', '2': 'DP-1'})
+    # Workspace 2 doesn't exist, and the moves cost no extra round trip
+    assert fake_hyprland.calls == [['--batch', 'keyword monitor DP-1,1920x1080@60.0,1920x100,1.0,transform,0 ; '
+                                    'dispatch moveworkspacetomonitor 1 DP-1']]
@@ -0,0 +1,100 @@
+import socket
+import struct
+
+from hyprdisplays_drm import DrmConnectorSource, UeventMonitor, parse_uevent
+
+def make_edid(manufacturer="DEL", product_code=0xA0F1, model="DELL U2720Q", serial="ABC123"):
+    """Minimal EDID base block: 3840x2160@60 preferred mode, name and serial descriptors"""
+    data = bytearray(128)
+    data[0:8] = b"\x00\xff\xff\xff\xff\xff\xff\x00"
+    letters = [ord(c) - ord('A') + 1 for c in manufacturer]
+    data[8:10] = struct.pack(">H", (letters[0] << 10) | (letters[1] << 5) | letters[2])
+    data[10:16] = struct.pack("<HI", product_code, 0)
+    data[21], data[22] = 60, 34
+
+    # Detailed timing: 3840x2160, blanking 560x90, 594 MHz -> 60 Hz, 597x336 mm
+    timing = bytearray(18)
+    timing[0:2] = struct.pack("<H", 59400)
+    h_active, h_blank, v_active, v_blank = 3840, 560, 2160, 90
+    timing[2], timing[3] = h_active & 0xFF, h_blank & 0xFF
+    timing[4] = ((h_active >> 8) << 4) | (h_blank >> 8)
+    timing[5], timing[6] = v_active & 0xFF, v_blank & 0xFF
+    timing[7] = ((v_active >> 8) << 4) | (v_blank >> 8)
+    timing[12], timing[13] = 597 & 0xFF, 336 & 0xFF
+    timing[14] = ((597 >> 8) << 4) | (336 >> 8)
+    data[54:72] = timing
+
+    for offset, tag, text in ((72, 0xFC, model), (90, 0xFF, serial)):
+        block = bytearray(18)
+        block[3] = tag
+        block[5:18] = (text.encode() + b"\n").ljust(13, b" ")
+        data[offset:offset + 18] = block
+    return bytes(data)
+
+def fake_drm_tree(root):
+    connectors = {
+        "card1-DP-1": ("connected", make_edid()),
+        "card1-DP-2": ("disconnected", b""),
+        "card1-eDP-1": ("connected", b""),
+    }
+    for name, (status, edid) in connectors.items():
+        path = root / name
+        path.mkdir(parents=True)
+        (path / "status").write_text(status + "\n")
+        (path / "edid").write_bytes(edid)
+    # Not a connector
+    (root / "card1").mkdir()
+    return root
+
+def test_scan_reads_status_and_edid(tmp_path):
+    source = DrmConnectorSource(fake_drm_tree(tmp_path / "drm"))
+    connectors = source.scan()
+    assert set(connectors) == {"DP-1", "DP-2", "eDP-1"}
+    assert connectors["DP-1"]["card"] == "card1"
+    assert connectors["DP-2"]["edid"] is None
+    assert connectors["eDP-1"]["edid"] is None
+
+    edid = connectors["DP-1"]["edid"]
+    assert edid["manufacturer"] == "DEL"
+    assert edid["model"] == "DELL U2720Q"
+    assert edid["serial"] == "ABC123"
+    assert (edid["width_mm"], edid["height_mm"]) == (597, 336)
+    assert edid["preferred_mode"] == {"width": 3840, "height": 2160, "refresh": 60.0}
+
+def test_connected_names(tmp_path):
+    source = DrmConnectorSource(fake_drm_tree(tmp_path / "drm"))
+    assert source.connected_names() == {"DP-1", "eDP-1"}
+
+def test_missing_tree_scans_empty(tmp_path):
+    source = DrmConnectorSource(tmp_path / "missing")
+    assert source.scan() == {}
+    assert source.connected_names() == set()
+
+def test_enrich_fills_edid_fields_only(tmp_path):
+    source = DrmConnectorSource(fake_drm_tree(tmp_path / "drm"))
+    monitors_info = [
+        {"name": "DP-1", "make": "Dell Inc.", "model": "DELL U2720Q", "serial": ""},
+        {"name": "eDP-1", "make": "BOE", "model": "", "serial": ""},
+    ]
+    source.enrich(monitors_info)
+    assert monitors_info[0] == {"name": "DP-1", "make": "Dell Inc.", "model": "DELL U2720Q", "serial": "",
+                                "edid_make": "DEL", "edid_model": "DELL U2720Q", "edid_serial": "ABC123"}
+    assert "edid_serial" not in monitors_info[1]
+
+def test_uevents_are_filtered_to_drm():
+    monitor = UeventMonitor.__new__(UeventMonitor)
+    monitor.sock, sender = socket.socketpair(socket.AF_UNIX, socket.SOCK_DGRAM)
+    monitor.sock.setblocking(False)
+    try:
+        sender.send(b"change@/devices/pci0000:00/drm/card1\0ACTION=change\0SUBSYSTEM=drm\0HOTPLUG=1")
+        sender.send(b"add@/devices/usb1/1-1\0ACTION=add\0SUBSYSTEM=usb")
+        events = monitor.read_events()
+        assert [e["DEVPATH"] for e in events] == ["/devices/pci0000:00/drm/card1"]
+        assert events[0]["HOTPLUG"] == "1"
+        assert monitor.read_events() == []
+    finally:
+        monitor.close()
+        sender.close()
+
+def test_parse_uevent_without_header():
+    assert parse_uevent(b"SUBSYSTEM=drm\0HOTPLUG=1") == {"SUBSYSTEM": "drm", "HOTPLUG": "1"}
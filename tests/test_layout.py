@@ -0,0 +1,157 @@
+from types import SimpleNamespace
+
+import pytest
+
+from hyprdisplays_layout import (LayoutHistory, describe_layout_problems, profile_rects, propagate_resize,
+                                 solve_layout, validate_layout)
+
+def test_resize_moves_a_grid_column_together():
+    rects = {
+        'A': (0, 0, 100, 150), 'B': (100, 0, 100, 150),
+        'C': (0, 150, 100, 150), 'D': (100, 150, 100, 150),
+    }
+    assert propagate_resize(rects, 'A', (150, 150)) == {'B': (150, 0), 'D': (150, 150)}
+
+def test_resize_grid_result_does_not_depend_on_names():
+    # Same grid with names that reach the far corner through the other neighbour first
+    rects = {
+        'D': (0, 0, 100, 150), 'A': (100, 0, 100, 150),
+        'B': (0, 150, 100, 150), 'C': (100, 150, 100, 150),
+    }
+    assert propagate_resize(rects, 'D', (150, 150)) == {'A': (150, 0), 'C': (150, 150)}
+
+def test_resize_pushes_a_chain():
+    rects = {'A': (0, 0, 100, 100), 'B': (100, 0, 100, 100), 'C': (200, 0, 100, 100)}
+    assert propagate_resize(rects, 'A', (120, 100)) == {'B': (120, 0), 'C': (220, 0)}
+
+def test_resize_keeps_root_in_place():
+    rects = {'A': (0, 0, 100, 100), 'B': (100, 0, 100, 100)}
+    assert propagate_resize(rects, 'B', (150, 100), root='A') == {}
+    assert propagate_resize(rects, 'A', (150, 100), root='B') == {'A': (-50, 0)}
+
+def test_shrink_pulls_a_chain():
+    rects = {'A': (0, 0, 100, 100), 'B': (100, 0, 100, 100), 'C': (200, 0, 100, 100)}
+    assert propagate_resize(rects, 'A', (80, 100)) == {'B': (80, 0), 'C': (180, 0)}
+
+class Widget:
+    """Stands in for the spin buttons, combo and check box of a MonitorRow"""
+    def __init__(self, value):
+        self.value = value
+
+    def get_value(self):
+        return self.value
+
+    def set_value(self, value):
+        self.value = value
+
+    get_active, set_active = get_value, set_value
+
+def row(name, x=0):
+    return SimpleNamespace(display=SimpleNamespace(name=name), x_spin=Widget(x), y_spin=Widget(0),
+                           scale_spin=Widget(1.0), transform_combo=Widget(0), enabled_check=Widget(True))
+
+def test_history_undoes_and_redoes_deltas():
+    rows = [row('DP-1'), row('DP-2', 1920)]
+    history = LayoutHistory()
+    history.reset(rows)
+    rows[1].x_spin.value = 2000
+    rows[1].scale_spin.value = 1.5
+    assert history.record(rows)
+    assert history.undo_stack[-1] == (('DP-2', 0, 1920, 2000), ('DP-2', 2, 1.0, 1.5))
+    assert not history.record(rows)
+    assert history.undo(rows)
+    assert (rows[1].x_spin.value, rows[1].scale_spin.value) == (1920, 1.0)
+    assert history.redo(rows)
+    assert (rows[1].x_spin.value, rows[1].scale_spin.value) == (2000, 1.5)
+
+def test_history_trims_oldest_entries_to_the_budget():
+    rows = [row('DP-1'), row('DP-2')]
+    history = LayoutHistory(max_changes=5)
+    history.reset(rows)
+    for x in range(1, 5):
+        # Two field changes per edit
+        rows[0].x_spin.value = rows[1].x_spin.value = x
+        history.record(rows)
+    assert history.size == 4 and len(history.undo_stack) == 2
+    assert history.undo_stack[0][0] == ('DP-1', 0, 2, 3)
+    while history.undo(rows):
+        pass
+    assert rows[0].x_spin.value == 2
+
+def test_history_keeps_an_oversized_edit():
+    rows = [row(f"DP-{n}") for n in range(4)]
+    history = LayoutHistory(max_changes=2)
+    history.reset(rows)
+    for r in rows:
+        r.x_spin.value = 100
+    assert history.record(rows)
+    assert len(history.undo_stack) == 1 and history.size == 4
+
+def test_new_edit_drops_redo_from_the_budget():
+    rows = [row('DP-1')]
+    history = LayoutHistory()
+    history.reset(rows)
+    for x in (1, 2, 3):
+        rows[0].x_spin.value = x
+        history.record(rows)
+    history.undo(rows)
+    history.undo(rows)
+    rows[0].x_spin.value = 10
+    history.record(rows)
+    assert not history.can_redo()
+    assert history.size == 2
+
+SIZES = {'DP-10': (1920, 1080), 'DP-2': (2560, 1440), 'eDP-1': (1280, 800)}
+
+def test_solve_connector_tops_aligned_in_natural_order():
+    assert solve_layout(SIZES, 'connector') == {'DP-2': (0, 0), 'DP-10': (2560, 0), 'eDP-1': (4480, 0)}
+
+def test_solve_bottom_aligns_logical_bottoms():
+    positions = solve_layout(SIZES, 'bottom')
+    assert {name: y + SIZES[name][1] for name, (_, y) in positions.items()} == {
+        'DP-2': 1440, 'DP-10': 1440, 'eDP-1': 1440}
+    assert positions['DP-2'] == (0, 0)
+
+def test_solve_center_puts_primary_at_origin_between_the_others():
+    positions = solve_layout(SIZES, 'center', primary='eDP-1')
+    assert positions['eDP-1'] == (0, 0)
+    # First other goes right, the second left
+    assert positions['DP-2'] == (1280, -320)
+    assert positions['DP-10'] == (-1920, -140)
+
+def test_solve_result_is_one_touching_piece():
+    for goal in ('connector', 'bottom', 'center'):
+        positions = solve_layout(SIZES, goal, primary='DP-10')
+        rects = {name: (x, y, *SIZES[name]) for name, (x, y) in positions.items()}
+        assert validate_layout(rects) == {'overlaps': [], 'islands': []}
+        assert positions['DP-10'] == (0, 0)
+
+def test_solve_rejects_unknown_goal():
+    with pytest.raises(ValueError):
+        solve_layout(SIZES, 'diagonal')
+    assert solve_layout({}, 'center') == {}
+
+def test_validate_finds_overlaps():
+    rects = {'DP-1': (0, 0, 1920, 1080), 'DP-2': (1000, 0, 1920, 1080), 'DP-3': (2920, 0, 1920, 1080)}
+    report = validate_layout(rects)
+    assert report['overlaps'] == [('DP-1', 'DP-2')]
+    # Overlapping monitors still count as one piece
+    assert report['islands'] == []
+
+def test_validate_ignores_subpixel_overlap_and_corner_contacts():
+    # 1.5 scale on 2560x1440 rounds to a fractional edge
+    assert validate_layout({'DP-1': (0, 0, 1706.67, 960), 'DP-2': (1706, 0, 1920, 1080)})['overlaps'] == []
+    report = validate_layout({'DP-1': (0, 0, 1920, 1080), 'DP-2': (1920, 1080, 1920, 1080)})
+    assert report['islands'] == [['DP-1'], ['DP-2']]
+
+def test_validate_reports_islands_largest_first():
+    rects = {'DP-1': (0, 0, 1920, 1080), 'DP-2': (1920, 0, 1920, 1080), 'DP-3': (0, 1080, 1920, 1080),
+             'HDMI-A-1': (10000, 0, 1920, 1080)}
+    report = validate_layout(rects)
+    assert report == {'overlaps': [], 'islands': [['DP-1', 'DP-2', 'DP-3'], ['HDMI-A-1']]}
+    assert describe_layout_problems(report) == ["HDMI-A-1 not touching the rest of the layout"]
+
+def test_profile_rects_skip_unplaced_monitors():
+    profile = {'DP-1': {'resolution': '2560x1440', 'x': 0, 'y': 0, 'scale': 2.0},
+               'DP-2': {'disabled': True}, 'DP-3': {'mirror': 'DP-1'}, 'DP-4': {'preferred': True}}
+    assert profile_rects(profile) == {'DP-1': (0, 0, 1280, 720)}
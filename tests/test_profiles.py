@@ -0,0 +1,182 @@
+import json
+import os
+from pathlib import Path
+
+from hyprdisplays_profiles import (RETENTION_DEFAULTS, ProfileIndex, ProfileSearchIndex, evict_profiles,
+                                   find_profile_key, identity_key, mark_profile_used, migrate_profiles,
+                                   profile_key_for, retention_policy, save_profiles_file)
+
+def profiles(count):
+    return {f"key{i}": {"saved_at": f"2026-01-{i + 1:02d}T00:00:00", "monitors": {}} for i in range(count)}
+
+def test_null_or_invalid_retention_uses_defaults():
+    for retention in (None, [], "200"):
+        data = {"profiles": profiles(3), "retention": retention}
+        assert evict_profiles(data) == []
+        assert len(data["profiles"]) == 3
+
+def test_invalid_retention_fields_fall_back_one_by_one():
+    policy = retention_policy({"retention": {"max_age_days": "30", "max_profiles": 2, "max_bytes": -1}})
+    assert policy == dict(RETENTION_DEFAULTS, max_profiles=2)
+    policy = retention_policy({"retention": {"max_profiles": True, "max_bytes": None, "max_age_days": 7.5}})
+    assert policy == dict(RETENTION_DEFAULTS, max_bytes=None, max_age_days=7.5)
+    data = {"profiles": profiles(3), "retention": {"max_age_days": "30", "max_profiles": 2}}
+    assert evict_profiles(data) == ["key0"]
+
+def test_retention_override_evicts_least_recently_used():
+    data = {"profiles": profiles(3), "retention": {"max_profiles": 2}}
+    data["profiles"]["key0"]["last_used"] = "2026-02-01T00:00:00"
+    assert evict_profiles(data) == ["key1"]
+
+IDENTITY = "DP-1|Dell|U2720Q|ABC"
+
+def test_collision_takes_the_next_free_slot():
+    key = identity_key(IDENTITY)
+    # Another identity that happens to have the same digest
+    profiles = {key: {"identity": "other"}}
+    assert find_profile_key(profiles, IDENTITY) is None
+    assert profile_key_for(profiles, IDENTITY) == f"{key}-1"
+    profiles[f"{key}-1"] = {"identity": IDENTITY}
+    assert find_profile_key(profiles, IDENTITY) == f"{key}-1"
+    assert profile_key_for(profiles, IDENTITY) == f"{key}-1"
+
+def test_lookup_probes_past_a_deleted_slot():
+    key = identity_key(IDENTITY)
+    profiles = {key: {"identity": "a"}, f"{key}-1": {"identity": "b"}, f"{key}-2": {"identity": IDENTITY}}
+    del profiles[f"{key}-1"]
+    assert find_profile_key(profiles, IDENTITY) == f"{key}-2"
+    del profiles[key]
+    assert find_profile_key(profiles, IDENTITY) == f"{key}-2"
+    # Saving again keeps the existing key instead of filling the gap with a duplicate
+    assert profile_key_for(profiles, IDENTITY) == f"{key}-2"
+    assert profile_key_for(profiles, "c") == identity_key("c")
+
+def test_migrate_rekeys_legacy_profiles_and_history():
+    data = {"profiles": {IDENTITY: {"monitors": {"DP-1": {}}}},
+            "history": [{"fingerprint": IDENTITY, "monitors_info": [{"name": "DP-1"}]}]}
+    assert migrate_profiles(data)
+    key = identity_key(IDENTITY)
+    assert data["profiles"] == {key: {"monitors": {"DP-1": {}}, "identity": IDENTITY}}
+    assert data["history"] == [{"fingerprint": key}]
+    assert not migrate_profiles(data)
+
+def write_layer(path, profiles):
+    path.write_text(json.dumps({"version": 1, "profiles": {key: {"identity": key, "monitors": value}
+                                                           for key, value in profiles.items()}}))
+
+def test_index_layers_system_files_in_name_order_then_user(tmp_path):
+    system = tmp_path / "profiles.d"
+    system.mkdir()
+    write_layer(system / "20-site.json", {"a": "site", "b": "site"})
+    write_layer(system / "10-vendor.json", {"a": "vendor", "c": "vendor"})
+    index = ProfileIndex(tmp_path / "user.json", system)
+    index.rebuild({"profiles": {"b": {"identity": "b", "monitors": "user"}}}, index.layer_signature())
+    assert {key: entry["monitors"] for key, entry in index.profiles.items()} == {
+        "a": "site", "b": "user", "c": "vendor"}
+    assert index.is_system("a") and index.is_system("c")
+    assert not index.is_system("b")
+
+def test_index_lists_the_system_dir_only_when_it_changes(tmp_path, monkeypatch):
+    system = tmp_path / "profiles.d"
+    system.mkdir()
+    write_layer(system / "10-vendor.json", {"a": "vendor"})
+    index = ProfileIndex(tmp_path / "user.json", system)
+    listings = []
+    glob = Path.glob
+    monkeypatch.setattr(Path, "glob", lambda self, pattern: listings.append(pattern) or glob(self, pattern))
+    signature = index.layer_signature()
+    assert index.layer_signature() == signature
+    assert len(listings) == 1
+
+    write_layer(system / "20-site.json", {"a": "site"})
+    os.utime(system, ns=(1, 1))
+    changed = index.layer_signature()
+    assert changed != signature and len(listings) == 2
+    index.rebuild({}, changed)
+    assert index.profiles["a"]["monitors"] == "site"
+
+def test_index_tracks_the_user_file(tmp_path):
+    index = ProfileIndex(tmp_path / "user.json", tmp_path / "missing")
+    signature = index.layer_signature()
+    index.rebuild({}, signature)
+    assert not index.user_changed(index.layer_signature())
+    write_layer(tmp_path / "user.json", {"a": "user"})
+    assert index.user_changed(index.layer_signature())
+
+def saved(key, day, monitors="ours"):
+    return {"identity": key, "monitors": monitors, "saved_at": f"2026-03-{day:02d}T00:00:00"}
+
+def test_save_without_conflict_bumps_the_version(tmp_path):
+    path = tmp_path / "profiles.json"
+    written = save_profiles_file(path, {"version": 0, "profiles": {"a": saved("a", 1)}, "history": []}, 0, {"a"})
+    assert written["version"] == 1
+    assert json.loads(path.read_text()) == written
+
+def test_save_merges_profiles_another_process_saved(tmp_path):
+    path = tmp_path / "profiles.json"
+    loaded = {"version": 3, "profiles": {"a": saved("a", 1), "b": saved("b", 1), "c": saved("c", 1)},
+              "history": [{"fingerprint": "a", "saved_at": "2026-03-01T00:00:00"}]}
+    # Another process saved d and changed c after we loaded version 3
+    disk = json.loads(json.dumps(loaded))
+    disk["version"] = 4
+    disk["profiles"]["c"] = saved("c", 3, "theirs")
+    disk["profiles"]["d"] = saved("d", 3, "theirs")
+    disk["history"].insert(0, {"fingerprint": "d", "saved_at": "2026-03-03T00:00:00"})
+    path.write_text(json.dumps(disk))
+
+    ours = json.loads(json.dumps(loaded))
+    ours["profiles"]["a"] = saved("a", 2)
+    del ours["profiles"]["b"]
+    ours["history"].insert(0, {"fingerprint": "a", "saved_at": "2026-03-02T00:00:00"})
+    written = save_profiles_file(path, ours, 3, changed_keys={"a"}, deleted_keys={"b"})
+
+    assert written["version"] == 5
+    assert {key: entry["monitors"] for key, entry in written["profiles"].items()} == {
+        "a": "ours", "c": "theirs", "d": "theirs"}
+    assert written["profiles"]["a"]["saved_at"].startswith("2026-03-02")
+    assert [item["saved_at"][:10] for item in written["history"]] == ["2026-03-03", "2026-03-02", "2026-03-01"]
+    assert json.loads(path.read_text()) == written
+
+def search_profiles():
+    def profile(day, *monitors):
+        return {"saved_at": f"2026-{day}T09:00:00",
+                "monitors_info": [{"name": name, "make": make, "model": model, "serial": ""}
+                                  for name, make, model in monitors]}
+    return {
+        "home": profile("03-01", ("eDP-1", "BOE", "0x095F"), ("DP-1", "Dell Inc.", "DELL U2720Q")),
+        "office": profile("10-19", ("eDP-1", "BOE", "0x095F"), ("DP-2", "LG Electronics", "27GL850")),
+        "laptop": profile("01-15", ("eDP-1", "BOE", "0x095F")),
+    }
+
+def test_search_matches_token_prefixes_newest_first():
+    index = ProfileSearchIndex(search_profiles())
+    assert index.search("") == ["office", "home", "laptop"]
+    assert index.search("boe") == ["office", "home", "laptop"]
+    assert index.search("del") == ["home"]
+    assert index.search("Dell U27") == ["home"]
+    assert index.search("edp dp-2") == ["office"]
+    assert index.search("dell lg") == []
+
+def test_search_finds_dates_and_keys():
+    index = ProfileSearchIndex(search_profiles())
+    assert index.search("2026-10") == ["office"]
+    assert index.search("2026-01-15") == ["laptop"]
+    assert index.search("off") == ["office"]
+
+def test_search_rebuild_replaces_the_index():
+    index = ProfileSearchIndex(search_profiles())
+    index.rebuild({})
+    assert index.search("boe") == [] and index.search("") == []
+
+def test_mark_used_skips_rewrites_within_the_resolution(tmp_path):
+    path = tmp_path / "profiles.json"
+    path.write_text(json.dumps({"version": 1, "profiles": {"a": saved("a", 1)}, "history": []}))
+    assert mark_profile_used(path, "a", "2026-03-05T10:00:00")
+    assert json.loads(path.read_text())["version"] == 2
+    stat = path.stat()
+    assert mark_profile_used(path, "a", "2026-03-05T10:30:00")
+    assert path.stat() == stat
+    assert mark_profile_used(path, "a", "2026-03-05T11:00:00")
+    data = json.loads(path.read_text())
+    assert data["profiles"]["a"]["last_used"] == "2026-03-05T11:00:00" and data["version"] == 3
+    assert not mark_profile_used(path, "missing")
@@ -0,0 +1,96 @@
+import json
+
+import pytest
+
+import hyprdisplays_apply
+from conftest import load_script, monitor, write_profiles
+from hyprdisplays_trace import TracePlayer
+
+daemon_module = load_script("hyprdisplays-daemon.py", "hyprdisplays_daemon")
+
+def write_trace(path, records, source='daemon', version=1):
+    header = {'trace': version, 'source': source, 'started': '2026-10-19T09:00:00', 'lid': None,
+              'profiles': {'profiles': {}, 'history': []}}
+    path.write_text('\n'.join(json.dumps(line) for line in [header] + records) + '\n')
+    return path
+
+def test_player_answers_from_each_events_own_window(tmp_path):
+    path = write_trace(tmp_path / "trace.jsonl", [
+        ['h', 0.1, 'monitors all -j', 0, 'startup'],
+        ['d', 0.1, {'card0-DP-1': {'status': 'disconnected'}}],
+        ['e', 1.0, 'hotplug', None],
+        ['h', 1.1, 'monitors all -j', 0, 'first'],
+        ['h', 1.2, 'monitors all -j', 0, 'second'],
+        ['d', 1.1, {'card0-DP-1': {'status': 'connected'}}],
+        ['h', 1.3, 'keyword monitor DP-1,preferred,auto,1', 0, 'ok'],
+        ['e', 2.0, 'poll', None],
+        ['h', 2.1, 'monitors all -j', 0, None],
+    ])
+    player = TracePlayer(path)
+    assert player.events == [(1.0, 'hotplug', None), (2.0, 'poll', None)]
+    assert player.recorded_sent == [(1.3, 'keyword monitor DP-1,preferred,auto,1')]
+
+    player.enter(0)
+    assert player.answer('monitors all -j') == (0, 'startup')
+    player.enter(1)
+    # In recorded order, the last one repeating once they run out
+    assert [player.answer('monitors all -j')[1] for _ in range(3)] == ['first', 'second', 'second']
+    assert player.scan() == {'card0-DP-1': {'status': 'connected'}}
+    player.enter(2)
+    # null repeats the previous output for the same call
+    assert player.answer('monitors all -j') == (0, 'second')
+    assert player.answer('workspaces -j') is None
+
+def test_player_falls_back_to_the_previous_window(tmp_path):
+    path = write_trace(tmp_path / "trace.jsonl", [
+        ['h', 0.1, 'workspaces -j', 0, '[]'],
+        ['e', 1.0, 'poll', None],
+        ['e', 2.0, 'poll', None],
+    ])
+    player = TracePlayer(path)
+    player.enter(2)
+    assert player.answer('workspaces -j') == (0, '[]')
+
+def test_player_rejects_other_versions(tmp_path):
+    with pytest.raises(ValueError):
+        TracePlayer(write_trace(tmp_path / "trace.jsonl", [], version=99))
+
+def record_session(home, fake_hyprland, monkeypatch, path):
+    """Daemon session: laptop only, a poll, the dock plugged in, a poll"""
+    panel = monitor('eDP-1', x=500)
+    external = monitor('DP-1', 2560, 1440, monitor_id=1)
+    saved = {'eDP-1': {'resolution': '1920x1080', 'refresh_rate': 60.0, 'x': 2560, 'y': 0, 'scale': 1.0},
+             'DP-1': {'resolution': '2560x1440', 'refresh_rate': 60.0, 'x': 0, 'y': 0, 'scale': 1.0}}
+    write_profiles(home, [([panel, external], saved)])
+    fake_hyprland.monitors = {'eDP-1': panel}
+    monkeypatch.setattr(hyprdisplays_apply, 'spawn_hyprctl', fake_hyprland)
+    daemon = daemon_module.MonitorDaemon(sysfs_root=home / "no-drm", watch_lid=False, auto_layout='connector')
+    daemon.start_recording(path)
+    try:
+        daemon.check_and_apply()
+        daemon.handle_event(None)
+        fake_hyprland.monitors['DP-1'] = external
+        daemon.handle_event('hotplug')
+        daemon.handle_event(None)
+    finally:
+        daemon.trace.close()
+    return fake_hyprland.calls
+
+def replay(home, path):
+    player = TracePlayer(path, speed=1000)
+    daemon = daemon_module.MonitorDaemon(sysfs_root=home / "no-drm", watch_lid=False, auto_layout='connector')
+    assert daemon.replay(player)
+    return [joined for _, joined in player.sent]
+
+def test_replay_sends_what_the_recording_sent(home, fake_hyprland, monkeypatch):
+    path = home / "trace.jsonl.gz"
+    recorded = record_session(home, fake_hyprland, monkeypatch, path)
+    assert recorded
+    first = replay(home, path)
+    assert first == [' '.join(args) for args in recorded]
+    assert replay(home, path) == first
+
+def test_replay_refuses_gui_traces(home, capsys):
+    daemon = daemon_module.MonitorDaemon(sysfs_root=home / "no-drm", watch_lid=False)
+    assert not daemon.replay(TracePlayer(write_trace(home / "gui.jsonl", [], source='gui')))
+    assert "Cannot replay a gui trace" in capsys.readouterr().out